@@ -9,8 +9,8 @@ class EffectCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Effect)
 class EffectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug', 'category', 'is_active', 'is_premium', 'created_at')
-    list_filter = ('category', 'is_active', 'is_premium', 'created_at')
+    list_display = ('name', 'slug', 'category', 'strategy', 'local_filter', 'is_active', 'is_premium', 'created_at')
+    list_filter = ('category', 'strategy', 'local_filter', 'is_active', 'is_premium', 'created_at')
     search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ('is_active', 'is_premium')
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Cache of rendered effect catalog responses.
+
+Each distinct catalog URL (category filter, page) is cached as its JSON body
+plus an ETag. Cache keys include a catalog version; model signals bump the
+version, so one write invalidates every cached page.
+
+The version is a database row, so every process sees an edit. Each process
+rereads it at most every EFFECT_CATALOG_VERSION_TTL seconds; the process
+that made the edit sees the new version at once.
+"""
+import hashlib
+import json
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from rest_framework.utils.encoders import JSONEncoder
+
+VERSION_ID = 1
+
+# (version, time.monotonic() when read), replaced as a whole
+_known_version = (None, 0.0)
+
+
+def _read_version():
+    from .models import CatalogVersion
+    version = CatalogVersion.objects.filter(pk=VERSION_ID).values_list('version', flat=True).first()
+    return version or ''
+
+
+def get_version():
+    global _known_version
+    version, checked_at = _known_version
+    now = time.monotonic()
+    if version is None or now - checked_at >= getattr(settings, 'EFFECT_CATALOG_VERSION_TTL', 1.0):
+        version = _read_version()
+        _known_version = (version, now)
+    return version
+
+
+def bump_version():
+    from .models import CatalogVersion
+    global _known_version
+    version = uuid.uuid4().hex
+    CatalogVersion.objects.update_or_create(pk=VERSION_ID, defaults={'version': version})
+    _known_version = (version, time.monotonic())
+
+
+def _cache_key(request, kind):
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'effects:catalog:{get_version()}:{kind}:{url}'
+
+
+def _matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+def cached_response(request, kind, build_data, timeout=None):
+    """
+    Serve a catalog response from the cache, building it with build_data()
+    on a miss. Answers 304 when the client's If-None-Match is current.
+    timeout defaults to EFFECT_CATALOG_CACHE_TIMEOUT.
+    """
+    from apps.images import metrics
+    
+    key = _cache_key(request, kind)
+    entry = cache.get(key)
+    if entry is None:
+        metrics.CACHE_REQUESTS.inc(cache='effect_catalog', result='miss')
+        body = json.dumps(build_data(), cls=JSONEncoder).encode('utf-8')
+        entry = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+        if timeout is None:
+            timeout = getattr(settings, 'EFFECT_CATALOG_CACHE_TIMEOUT', 3600)
+        cache.set(key, entry, timeout=timeout)
+    else:
+        metrics.CACHE_REQUESTS.inc(cache='effect_catalog', result='hit')
+    body, etag = entry
+    
+    if _matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, must_revalidate=True,
+                        max_age=getattr(settings, 'EFFECT_CATALOG_MAX_AGE', 60))
+    return response
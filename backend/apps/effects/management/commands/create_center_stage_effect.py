@@ -58,6 +58,7 @@ TECHNICAL REQUIREMENTS:
 - Photorealistic style, not cartoon or artistic interpretation''',
                 'strength': 0.8,
                 'preserve_faces': True,
+                'strategy': 'center-stage',
                 'max_resolution': '2048x2048',
                 'output_format': 'jpeg',
                 'is_premium': True,
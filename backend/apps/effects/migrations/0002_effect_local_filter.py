@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('effects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='effect',
+            name='local_filter',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+def assign_strategies(apps, schema_editor):
+    """Move the hard-coded Center Stage and local filter routing into the data"""
+    Effect = apps.get_model('effects', 'Effect')
+    Effect.objects.filter(slug='center-stage').update(strategy='center-stage')
+    Effect.objects.exclude(local_filter='').update(strategy='local')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('effects', '0002_effect_local_filter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='effect',
+            name='strategy',
+            field=models.CharField(default='standard', max_length=50),
+        ),
+        migrations.RunPython(assign_strategies, migrations.RunPython.noop),
+    ]
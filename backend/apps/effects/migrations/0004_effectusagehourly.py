@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('effects', '0003_effect_strategy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectUsageHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('jobs', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('processing_time_sum', models.FloatField(default=0.0)),
+                ('processing_time_max', models.FloatField(default=0.0)),
+                ('effect', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_usage', to='effects.effect')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='effect_usage_hour_idx')],
+                'unique_together': {('effect', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:20
+
+import apps.effects.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('effects', '0005_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='effect',
+            name='local_filter',
+            field=models.CharField(blank=True, default='', max_length=50, validators=[apps.effects.models.validate_local_filter]),
+        ),
+    ]
@@ -1,7 +1,18 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from apps.images.local_effects import FILTERS
 import uuid
 
+
+def validate_local_filter(value):
+    """Reject names that are not registered in apps.images.local_effects"""
+    if value and value not in FILTERS:
+        raise ValidationError(
+            '%(value)s is not a local filter; choose one of: %(filters)s',
+            params={'value': value, 'filters': ', '.join(sorted(FILTERS))},
+        )
+
 class EffectCategory(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
@@ -25,6 +36,12 @@ class Effect(models.Model):
     preserve_faces = models.BooleanField(default=True)
     max_resolution = models.CharField(max_length=20, default="2048x2048")
     output_format = models.CharField(max_length=10, default="jpeg")
+    # Name of a filter in apps.images.local_effects; when set, the effect is
+    # rendered locally instead of sending hidden_prompt to Gemini
+    local_filter = models.CharField(max_length=50, blank=True, default='', validators=[validate_local_filter])
+    # Name of a processing strategy in apps.images.services.STRATEGIES:
+    # model, working resolution, prompt template, local stages and timeout
+    strategy = models.CharField(max_length=50, default='standard')
     
     is_active = models.BooleanField(default=True)
     is_premium = models.BooleanField(default=False)
@@ -32,4 +49,37 @@ class Effect(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class EffectUsageHourly(models.Model):
+    """Finished jobs per effect per hour, updated as each job finishes"""
+    effect = models.ForeignKey(Effect, on_delete=models.CASCADE, related_name='hourly_usage')
+    hour = models.DateTimeField()  # Start of the hour (UTC)
+    jobs = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    processing_time_sum = models.FloatField(default=0.0)  # seconds
+    processing_time_max = models.FloatField(default=0.0)
+    
+    class Meta:
+        unique_together = ['effect', 'hour']
+        indexes = [
+            # Trending scans a recent window across all effects
+            models.Index(fields=['hour'], name='effect_usage_hour_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.effect_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class CatalogVersion(models.Model):
+    """
+    A single row holding a token that changes on every effect catalog edit.
+    Catalog and registry caches are keyed by it, so an edit in one process
+    invalidates them in all.
+    """
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"catalog {self.version}"
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Effect, EffectCategory
+from . import catalog
+
+
+@receiver(post_save, sender=Effect)
+@receiver(post_delete, sender=Effect)
+@receiver(post_save, sender=EffectCategory)
+@receiver(post_delete, sender=EffectCategory)
+def invalidate_catalog(sender, **kwargs):
+    """Any catalog edit invalidates every cached catalog page"""
+    catalog.bump_version()
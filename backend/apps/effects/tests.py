@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.contrib.auth.models import User
 from .models import EffectCategory, Effect
@@ -59,4 +60,14 @@ class EffectModelTest(TestCase):
         self.assertEqual(effect.max_resolution, "2048x2048")
         self.assertEqual(effect.output_format, "jpeg")
         self.assertEqual(effect.is_active, True)
-        self.assertEqual(effect.is_premium, False)
\ No newline at end of file
+        self.assertEqual(effect.is_premium, False)
+    
+    def test_local_filter_must_be_registered(self):
+        """Test that local_filter only accepts filters from the local effects registry"""
+        self.effect.local_filter = 'sepia'
+        self.effect.full_clean(exclude=['thumbnail'])
+        
+        self.effect.local_filter = 'sepai'
+        with self.assertRaises(ValidationError) as raised:
+            self.effect.full_clean(exclude=['thumbnail'])
+        self.assertIn('local_filter', raised.exception.message_dict)
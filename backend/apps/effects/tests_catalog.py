@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import CatalogVersion, EffectCategory, Effect
+
+
+class EffectCatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        for index in range(3):
+            Effect.objects.create(
+                name=f'Effect {index}',
+                slug=f'effect-{index}',
+                category=self.category,
+                user_description='A test effect',
+                hidden_prompt='A secret prompt'
+            )
+    
+    def test_catalog_is_served_from_cache(self):
+        """Test that a repeat catalog load makes no queries"""
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get('/api/effects/effects/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 3)
+        # select_related keeps the category names in the page query
+        self.assertLessEqual(len(first), 2)
+        
+        with CaptureQueriesContext(connection) as second:
+            cached = self.client.get('/api/effects/effects/')
+        
+        self.assertEqual(len(second), 0)
+        self.assertEqual(cached.content, response.content)
+        self.assertNotIn('hidden_prompt', cached.json()['results'][0])
+        self.assertIn('max-age', cached['Cache-Control'])
+    
+    def test_etag_revalidation(self):
+        """Test that a current If-None-Match gets a 304"""
+        etag = self.client.get('/api/effects/effects/')['ETag']
+        
+        response = self.client.get('/api/effects/effects/', HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+    
+    def test_edits_invalidate_the_catalog(self):
+        """Test that saving an effect or category changes the served catalog"""
+        etag = self.client.get('/api/effects/effects/')['ETag']
+        categories_etag = self.client.get('/api/effects/categories/')['ETag']
+        
+        Effect.objects.filter(slug='effect-0').get().delete()
+        self.category.name = 'Renamed'
+        self.category.save()
+        
+        response = self.client.get('/api/effects/effects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(response.json()['results'][0]['category_name'], 'Renamed')
+        self.assertNotEqual(self.client.get('/api/effects/categories/')['ETag'], categories_etag)
+    
+    @override_settings(EFFECT_CATALOG_VERSION_TTL=0)
+    def test_edits_in_another_process_invalidate_the_catalog(self):
+        """Test that a version bumped by another process invalidates this one's catalog"""
+        etag = self.client.get('/api/effects/effects/')['ETag']
+        
+        # Queryset updates send no signals, as if another process made the edit
+        Effect.objects.filter(slug='effect-0').update(name='Edited elsewhere')
+        CatalogVersion.objects.update(version='elsewhere')
+        
+        response = self.client.get('/api/effects/effects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Edited elsewhere', [effect['name'] for effect in response.json()['results']])
+    
+    def test_category_filter_is_cached_separately(self):
+        """Test that each category filter has its own cache entry"""
+        other = EffectCategory.objects.create(name='Other', slug='other', description='Other')
+        Effect.objects.create(
+            name='Other Effect', slug='other-effect', category=other,
+            user_description='Other', hidden_prompt='Other prompt'
+        )
+        
+        self.assertEqual(self.client.get('/api/effects/effects/').json()['count'], 4)
+        self.assertEqual(self.client.get('/api/effects/effects/?category=other').json()['count'], 1)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import EffectCategory, Effect, EffectUsageHourly
+from . import usage
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=12, TRENDING_WINDOW_HOURS=72, TRENDING_CACHE_TIMEOUT=120)
+class TrendingEffectsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        self.effects = [
+            Effect.objects.create(
+                name=f'Effect {index}', slug=f'effect-{index}', category=category,
+                user_description='A test effect', hidden_prompt='A secret prompt'
+            )
+            for index in range(3)
+        ]
+    
+    def test_jobs_roll_up_by_hour(self):
+        """Test that finished jobs update one row per effect and hour"""
+        now = timezone.now()
+        usage.record_job(self.effects[0].id, True, 2.0, now=now)
+        usage.record_job(self.effects[0].id, True, 5.0, now=now)
+        usage.record_job(self.effects[0].id, False, 1.0, now=now)
+        usage.record_job(self.effects[0].id, True, 1.0, now=now - timedelta(hours=1))
+        
+        row = EffectUsageHourly.objects.get(effect=self.effects[0], hour=usage.current_hour(now))
+        self.assertEqual((row.jobs, row.completed, row.failed), (3, 2, 1))
+        self.assertEqual(row.processing_time_sum, 8.0)
+        self.assertEqual(row.processing_time_max, 5.0)
+        self.assertEqual(EffectUsageHourly.objects.count(), 2)
+    
+    def test_recent_use_outranks_old_use(self):
+        """Test that older completions decay in the ranking"""
+        now = timezone.now()
+        for _ in range(3):
+            usage.record_job(self.effects[0].id, True, 1.0, now=now - timedelta(hours=48))
+        for _ in range(2):
+            usage.record_job(self.effects[1].id, True, 1.0, now=now)
+        usage.record_job(self.effects[2].id, False, 1.0, now=now)
+        
+        ranked = usage.trending(10, now=now)
+        
+        self.assertEqual([effect for effect, _, _ in ranked], [self.effects[1], self.effects[0]])
+    
+    def test_usage_outside_window_is_ignored(self):
+        """Test that rollups older than the window are not ranked"""
+        now = timezone.now()
+        usage.record_job(self.effects[0].id, True, 1.0, now=now - timedelta(hours=100))
+        
+        self.assertEqual(usage.trending(10, now=now), [])
+    
+    def test_trending_endpoint_is_cached(self):
+        """Test that a repeat trending request makes no queries"""
+        usage.record_job(self.effects[2].id, True, 3.0)
+        
+        response = self.client.get('/api/effects/effects/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual([result['slug'] for result in results], ['effect-2'])
+        self.assertEqual(results[0]['avg_processing_time'], 3.0)
+        self.assertNotIn('hidden_prompt', results[0])
+        
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get('/api/effects/effects/trending/')
+        
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cached.content, response.content)
+    
+    def test_trending_limit(self):
+        """Test that ?limit= caps the number of effects returned"""
+        for effect in self.effects:
+            usage.record_job(effect.id, True, 1.0)
+        
+        response = self.client.get('/api/effects/effects/trending/?limit=2')
+        
+        self.assertEqual(len(response.json()['results']), 2)
@@ -0,0 +1,73 @@
+"""
+Hourly per-effect usage rollups and the trending ranking built from them.
+
+Each finished job adds itself to its effect's row for the current hour with
+an F() update, so ranking reads a few hundred rollup rows instead of
+grouping ProcessedImage. An hour's completions count with weight
+0.5 ** (age / TRENDING_HALF_LIFE_HOURS).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Effect, EffectUsageHourly
+
+
+def current_hour(now=None):
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def record_job(effect_id, success, processing_time=0.0, now=None):
+    """Count one finished job in its effect's rollup row for this hour"""
+    processing_time = float(processing_time or 0.0)
+    rows = EffectUsageHourly.objects.filter(effect_id=effect_id, hour=current_hour(now))
+    changes = {
+        'jobs': F('jobs') + 1,
+        'completed': F('completed') + (1 if success else 0),
+        'failed': F('failed') + (0 if success else 1),
+        'processing_time_sum': F('processing_time_sum') + processing_time,
+        'processing_time_max': Greatest(F('processing_time_max'), Value(processing_time)),
+    }
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            EffectUsageHourly.objects.create(
+                effect_id=effect_id, hour=current_hour(now), jobs=1,
+                completed=1 if success else 0, failed=0 if success else 1,
+                processing_time_sum=processing_time, processing_time_max=processing_time
+            )
+    except IntegrityError:
+        # Another job opened this hour's row first
+        rows.update(**changes)
+
+
+def trending(limit, now=None):
+    """
+    Active effects ranked by time-decayed completions over the last
+    TRENDING_WINDOW_HOURS, as [(effect, score, stats), ...]
+    """
+    now = now or timezone.now()
+    window = getattr(settings, 'TRENDING_WINDOW_HOURS', 72)
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 12)
+    rows = EffectUsageHourly.objects.filter(
+        hour__gte=current_hour(now) - timedelta(hours=window), effect__is_active=True
+    ).values_list('effect_id', 'hour', 'jobs', 'completed', 'processing_time_sum')
+
+    scores = defaultdict(float)
+    stats = defaultdict(lambda: {'jobs': 0, 'completed': 0, 'processing_time_sum': 0.0})
+    for effect_id, hour, jobs, completed, processing_time_sum in rows:
+        age_hours = max((now - hour).total_seconds() / 3600, 0.0)
+        scores[effect_id] += completed * 0.5 ** (age_hours / half_life)
+        stats[effect_id]['jobs'] += jobs
+        stats[effect_id]['completed'] += completed
+        stats[effect_id]['processing_time_sum'] += processing_time_sum
+
+    ranked = sorted((effect_id for effect_id in scores if scores[effect_id] > 0),
+                    key=lambda effect_id: -scores[effect_id])[:limit]
+    effects = Effect.objects.select_related('category').in_bulk(ranked)
+    return [(effects[effect_id], scores[effect_id], stats[effect_id])
+            for effect_id in ranked if effect_id in effects]
@@ -1,15 +1,33 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.images.replicas import ReplicaReadsMixin
 from .models import Effect, EffectCategory
 from .serializers import EffectSerializer, EffectCategorySerializer
+from . import catalog
+from . import usage
 
-class EffectCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CachedCatalogMixin:
+    """Serve list responses from the versioned catalog cache"""
+    catalog_kind = None
+    
+    def list(self, request, *args, **kwargs):
+        return catalog.cached_response(
+            request, self.catalog_kind,
+            lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs).data
+        )
+
+class EffectCategoryViewSet(ReplicaReadsMixin, CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     queryset = EffectCategory.objects.all()
     serializer_class = EffectCategorySerializer
+    catalog_kind = 'categories'
 
-class EffectViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Effect.objects.filter(is_active=True)
+class EffectViewSet(ReplicaReadsMixin, CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Effect.objects.filter(is_active=True).select_related('category')
     serializer_class = EffectSerializer
+    catalog_kind = 'effects'
     
     def get_queryset(self):
         """Filter effects by category if specified"""
@@ -19,4 +37,29 @@ class EffectViewSet(viewsets.ReadOnlyModelViewSet):
         if category:
             queryset = queryset.filter(category__slug=category)
         
-        return queryset
\ No newline at end of file
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Effects ranked by recent, time-decayed use, from the hourly usage
+        rollups; cached for TRENDING_CACHE_TIMEOUT seconds
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', settings.TRENDING_LIMIT)), 1), 50)
+        except ValueError:
+            limit = settings.TRENDING_LIMIT
+        
+        def build_data():
+            results = []
+            for effect, score, stats in usage.trending(limit):
+                data = EffectSerializer(effect, context={'request': request}).data
+                data['trending_score'] = round(score, 3)
+                data['jobs'] = stats['jobs']
+                data['avg_processing_time'] = (
+                    round(stats['processing_time_sum'] / stats['jobs'], 3) if stats['jobs'] else 0.0
+                )
+                results.append(data)
+            return {'updated_at': timezone.now(), 'results': results}
+        
+        return catalog.cached_response(request, 'trending', build_data, timeout=settings.TRENDING_CACHE_TIMEOUT)
@@ -1,5 +1,22 @@
 from django.contrib import admin
+from django.utils.html import format_html_join
 from .models import ImageUpload, ProcessedImage, UserUsage
+from .timing import STAGES
+
+
+class SlowestStageFilter(admin.SimpleListFilter):
+    """Filter processed images by the stage that took the longest"""
+    title = 'slowest stage'
+    parameter_name = 'slowest_stage'
+    
+    def lookups(self, request, model_admin):
+        # A fixed list; scanning the JSON field on every changelist load is slow
+        return [(stage, stage) for stage in STAGES]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(processing_params__slowest_stage=self.value())
+        return queryset
 
 @admin.register(ImageUpload)
 class ImageUploadAdmin(admin.ModelAdmin):
@@ -10,10 +27,25 @@ class ImageUploadAdmin(admin.ModelAdmin):
 
 @admin.register(ProcessedImage)
 class ProcessedImageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'original_upload', 'effect_applied', 'user', 'status', 'created_at')
-    list_filter = ('status', 'effect_applied', 'created_at', 'user')
+    list_display = ('id', 'original_upload', 'effect_applied', 'user', 'status', 'is_preview',
+                    'total_ms', 'slowest_stage', 'created_at')
+    list_filter = ('status', 'is_preview', SlowestStageFilter, 'effect_applied', 'created_at', 'user')
     search_fields = ('id', 'original_upload__original_filename')
-    readonly_fields = ('id', 'created_at')
+    readonly_fields = ('id', 'created_at', 'stage_timings')
+    
+    @admin.display(description='Total (ms)')
+    def total_ms(self, obj):
+        return obj.processing_params.get('timings_ms', {}).get('total')
+    
+    @admin.display(description='Slowest stage')
+    def slowest_stage(self, obj):
+        return obj.processing_params.get('slowest_stage', '')
+    
+    @admin.display(description='Stage timings (ms)')
+    def stage_timings(self, obj):
+        timings = obj.processing_params.get('timings_ms', {})
+        rows = sorted(timings.items(), key=lambda item: -item[1])
+        return format_html_join('', '<div>{}: {}</div>', rows) or '-'
 
 @admin.register(UserUsage)
 class UserUsageAdmin(admin.ModelAdmin):
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ImagesConfig(AppConfig):
+    name = 'apps.images'
+    default_auto_field = 'django.db.models.BigAutoField'
+    
+    def ready(self):
+        from .db import configure_sqlite
+        from . import checks  # noqa: F401 (registers the system checks)
+        from . import signals  # noqa: F401
+        connection_created.connect(configure_sqlite, dispatch_uid='images.configure_sqlite')
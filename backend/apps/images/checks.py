@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Idempotency claims and quota counters only work across processes with a shared cache"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint='Set REDIS_URL when running more than one server process. Otherwise an Idempotency-Key '
+             'retry that reaches another process runs the request again, and each process enforces '
+             'the monthly quota on its own.',
+        id='images.W001',
+    )]
@@ -0,0 +1,183 @@
+"""
+SQLite concurrency support for the default database.
+
+- Every SQLite connection gets WAL journaling and a busy timeout, so
+  readers never block the writer and writers wait instead of failing with
+  "database is locked".
+- Background job writes go through one writer thread. It commits queued
+  writes in batches, one transaction per batch, so job threads never fight
+  over the write lock.
+- Write statement time (mostly lock wait under contention), lock errors
+  and writer queue time are exported as metrics.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from . import metrics
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLAC')
+
+
+def _is_locked_error(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def observe_writes(execute, sql, params, many, context):
+    """execute_wrapper that times write statements and counts lock errors"""
+    if sql.lstrip()[:6].upper() not in WRITE_STATEMENTS:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as e:
+        if _is_locked_error(e):
+            metrics.DB_LOCK_ERRORS.inc()
+        raise
+    finally:
+        metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - start)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver: tune each new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA busy_timeout={int(getattr(settings, 'SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+        if getattr(settings, 'SQLITE_WAL', True):
+            cursor.execute('PRAGMA journal_mode=WAL')
+            # WAL is crash safe with NORMAL; FULL would fsync every commit
+            cursor.execute('PRAGMA synchronous=NORMAL')
+    # The wrapper list outlives reconnects; install the wrapper once
+    if observe_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_writes)
+
+
+class SerializedWriter:
+    """
+    A single thread that runs database write callables. Writes that queue up
+    within batch_delay seconds of each other are committed together.
+    """
+
+    def __init__(self, batch_size=None, batch_delay=None):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # Callers hold self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def in_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn):
+        """
+        Queue fn() and return a Future for its result. Once the writer is
+        stopped, fn() runs inline in the caller's thread instead.
+        """
+        future = Future()
+        with self._lock:
+            stopped = self._stopped
+            if not stopped:
+                self._ensure_thread()
+                self._queue.put((fn, future, time.monotonic()))
+        if not stopped:
+            return future
+        try:
+            future.set_result(self._with_retry(lambda: self._run_all([(fn, None, None)])[0]))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _loop(self):
+        batch_size = self.batch_size or getattr(settings, 'DB_WRITER_BATCH_SIZE', 50)
+        batch_delay = self.batch_delay
+        if batch_delay is None:
+            batch_delay = getattr(settings, 'DB_WRITER_BATCH_DELAY_MS', 5) / 1000
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + batch_delay
+            while len(batch) < batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._run_batch(batch)
+                    return
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        now = time.monotonic()
+        for _, _, queued_at in batch:
+            metrics.DB_WRITER_QUEUE_SECONDS.observe(now - queued_at)
+        metrics.DB_WRITER_BATCH_SIZE.observe(len(batch))
+        try:
+            results = self._with_retry(lambda: self._run_all(batch))
+        except Exception:
+            # One failing write must not fail the others: retry them alone
+            for fn, future, _ in batch:
+                try:
+                    future.set_result(self._with_retry(lambda fn=fn: self._run_all([(fn, None, None)])[0]))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_all(self, batch):
+        with transaction.atomic():
+            return [fn() for fn, _, _ in batch]
+
+    def _with_retry(self, fn, attempts=3):
+        for attempt in range(attempts):
+            try:
+                return fn()
+            except OperationalError as e:
+                if not _is_locked_error(e) or attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (2 ** attempt))
+
+    def stop(self, timeout=10):
+        """Finish queued writes and stop the thread; later writes run inline"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+
+db_writer = SerializedWriter()
+atexit.register(db_writer.stop)
+
+
+def serialized_writes_enabled():
+    return getattr(settings, 'SQLITE_SERIALIZED_WRITES', False) and connection.vendor == 'sqlite'
+
+
+def run_write(fn):
+    """
+    Run a database write and return its result. With serialized writes on,
+    the write runs on the writer thread and this call waits for its commit.
+    Writes inside an open transaction stay inline so they remain part of it.
+    Raises concurrent.futures.TimeoutError after DB_WRITER_TIMEOUT seconds.
+    """
+    if not serialized_writes_enabled() or connection.in_atomic_block or db_writer.in_writer_thread():
+        return fn()
+    return db_writer.submit(fn).result(timeout=getattr(settings, 'DB_WRITER_TIMEOUT', 30))
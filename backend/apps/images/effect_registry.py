@@ -0,0 +1,82 @@
+"""
+Process-local registry of active effects with their prompts precompiled.
+
+Submitting a job looks the effect up here instead of in the database. The
+registry reloads when the effect catalog version changes; Effect and
+EffectCategory signals bump that version (see apps.effects.catalog). The
+version is stored in the database, so an edit made in another process is
+picked up within EFFECT_CATALOG_VERSION_TTL seconds.
+"""
+import threading
+import uuid
+from apps.effects import catalog
+from apps.effects.models import Effect
+from .services import compile_prompts
+
+
+class EffectSpec:
+    """Read-only snapshot of an active effect"""
+
+    def __init__(self, effect):
+        # Detached model instance, used as the ProcessedImage foreign key
+        # without another query
+        self.instance = effect
+        self.id = effect.id
+        self.name = effect.name
+        self.slug = effect.slug
+        self.category_id = effect.category_id
+        self.hidden_prompt = effect.hidden_prompt
+        self.strength = effect.strength
+        self.preserve_faces = effect.preserve_faces
+        self.max_resolution = effect.max_resolution
+        self.output_format = effect.output_format
+        self.local_filter = effect.local_filter
+        self.strategy = effect.strategy
+        self.is_premium = effect.is_premium
+        self.version = effect.updated_at.isoformat() if effect.updated_at else ''
+        self.prompt, self.preview_prompt = compile_prompts(effect)
+
+
+class EffectRegistry:
+    def __init__(self):
+        self._effects = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _ensure_current(self):
+        # At most one version read per TTL; only a catalog change triggers a reload
+        version = catalog.get_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            effects = Effect.objects.filter(is_active=True).select_related('category')
+            self._effects = {str(effect.id): EffectSpec(effect) for effect in effects}
+            self._version = version
+
+    def get(self, effect_id):
+        """Return the EffectSpec for an active effect id, or None"""
+        try:
+            key = str(uuid.UUID(str(effect_id)))
+        except ValueError:
+            return None
+        self._ensure_current()
+        return self._effects.get(key)
+
+    def invalidate(self):
+        self._version = None
+
+    @property
+    def version(self):
+        return self._version
+
+
+effect_registry = EffectRegistry()
+
+
+def compiled_prompts(effect, effect_prompt=None):
+    """(full, preview) prompts for an EffectSpec or an Effect instance"""
+    if isinstance(effect, EffectSpec) and effect_prompt in (None, effect.hidden_prompt):
+        return effect.prompt, effect.preview_prompt
+    return compile_prompts(effect, effect_prompt)
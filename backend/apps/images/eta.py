@@ -0,0 +1,117 @@
+"""
+Completion time estimates for effect jobs.
+
+Each process keeps a sliding window of recent job durations per effect (and
+per preview/full render). A new job's estimate is the median duration of its
+effect plus the time the jobs ahead of it in the pool will take. Estimates are
+stored on the ProcessedImage so any process can answer status polls, and
+responses carry Retry-After so clients poll near the expected finish.
+"""
+import math
+import threading
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .jobs import job_runner
+from . import metrics
+
+ALL_EFFECTS = '*'
+
+
+class LatencySketch:
+    """Quantiles over the most recent `size` observations"""
+
+    def __init__(self, size):
+        self._values = deque(maxlen=size)
+
+    def add(self, value):
+        self._values.append(value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def quantile(self, q):
+        values = sorted(self._values)
+        if not values:
+            return None
+        # Linear interpolation between the closest ranks
+        position = (len(values) - 1) * q
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class LatencyModel:
+    def __init__(self):
+        self._sketches = {}
+        self._lock = threading.Lock()
+
+    def _sketch(self, effect_id, preview):
+        # Callers hold self._lock
+        key = (str(effect_id), bool(preview))
+        if key not in self._sketches:
+            self._sketches[key] = LatencySketch(getattr(settings, 'ETA_SAMPLE_WINDOW', 200))
+        return self._sketches[key]
+
+    def observe(self, effect_id, preview, seconds):
+        """Record how long a finished job ran (excluding queue wait)"""
+        with self._lock:
+            for key in (effect_id, ALL_EFFECTS):
+                self._sketch(key, preview).add(seconds)
+
+    def duration(self, effect_id, preview, q=0.5):
+        """The q-quantile job duration for an effect, with fallbacks for cold effects"""
+        min_samples = getattr(settings, 'ETA_MIN_SAMPLES', 5)
+        with self._lock:
+            for key in (effect_id, ALL_EFFECTS):
+                sketch = self._sketch(key, preview)
+                if len(sketch) >= min_samples:
+                    return sketch.quantile(q)
+        return getattr(settings, 'ETA_DEFAULT_SECONDS', 15)
+
+    def queue_wait(self, preview=False):
+        """Expected wait for a worker, from the pool's queued and running jobs"""
+        counts = job_runner.counts()
+        workers = job_runner.max_workers or getattr(settings, 'IMAGE_JOB_WORKERS', 8)
+        ahead = counts['queued'] + counts['running'] - workers + 1
+        if ahead <= 0:
+            return 0.0
+        # Jobs ahead drain through all workers in parallel
+        return ahead / workers * self.duration(ALL_EFFECTS, preview)
+
+    def reset(self):
+        with self._lock:
+            self._sketches.clear()
+
+
+latency_model = LatencyModel()
+
+
+def estimate_completion(effect_id, preview=False, delay=0.0):
+    """Predicted finish time for a job submitted now"""
+    seconds = delay + latency_model.queue_wait(preview) + latency_model.duration(effect_id, preview)
+    return timezone.now() + timedelta(seconds=seconds)
+
+
+def seconds_remaining(processed):
+    """Seconds until a processing job's estimated completion, or None"""
+    if processed.status != 'processing' or processed.estimated_completion_at is None:
+        return None
+    return max(round((processed.estimated_completion_at - timezone.now()).total_seconds(), 1), 0.0)
+
+
+def set_retry_after(response, processed):
+    """Tell pollers when to check again; overdue jobs are polled every second"""
+    remaining = seconds_remaining(processed)
+    if remaining is not None:
+        response['Retry-After'] = str(max(math.ceil(remaining), 1))
+    return response
+
+
+def observe_finished(processed, preview, duration):
+    """Feed a finished job back into the model and record the estimate's error"""
+    latency_model.observe(processed.effect_applied_id, preview, duration)
+    if processed.estimated_completion_at is not None:
+        error = (timezone.now() - processed.estimated_completion_at).total_seconds()
+        metrics.ETA_ERROR_SECONDS.observe(abs(error), direction='late' if error > 0 else 'early')
@@ -0,0 +1,64 @@
+"""
+Streaming ZIP export of processed images.
+
+Entries are stored (ZIP_STORED): the images are already compressed, so
+deflating them again costs CPU for almost no size gain. Each file is copied
+in EXPORT_CHUNK_SIZE reads and every chunk is handed to the response as soon
+as it is written, so memory use does not grow with the archive.
+"""
+import os
+import zipfile
+from django.core.files.storage import default_storage
+
+
+class _StreamBuffer:
+    """Write-only, unseekable file object; zipfile then writes data descriptors"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_name(processed):
+    extension = os.path.splitext(processed.processed_image.name)[1] or '.png'
+    return f'{processed.effect_applied.slug}/{processed.created_at:%Y%m%d-%H%M%S}-{str(processed.id)[:8]}{extension}'
+
+
+def stream_zip(processed_images, chunk_size):
+    """Yield a ZIP archive of the processed images' files, chunk by chunk"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for processed in processed_images:
+            try:
+                source = default_storage.open(processed.processed_image.name, 'rb')
+            except OSError:
+                continue  # File removed from storage; skip it
+            info = zipfile.ZipInfo(archive_name(processed), date_time=processed.created_at.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            # force_zip64: the size is unknown until the file is copied
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                while True:
+                    data = source.read(chunk_size)
+                    if not data:
+                        break
+                    entry.write(data)
+                    yield buffer.take()
+            yield buffer.take()
+    # The central directory
+    yield buffer.take()
@@ -1,8 +1,18 @@
 import requests
 import json
+import time
 import base64
 import os
-from django.conf import settings
+import logging
+from .timing import NULL_TIMER
+from .key_pool import EJECTING_STATUSES, key_pool, parse_retry_after
+from .structured_logging import log_event, elapsed_ms
+from . import metrics
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EDIT_MODEL = "gemini-2.5-flash-image-preview"
 
 class ImageGenerationClient:
     """
@@ -11,45 +21,92 @@ class ImageGenerationClient:
 
     def __init__(self):
         """
-        Initializes the client with the Gemini API key and sets up the base URL.
+        Sets up the base URL. API keys are leased per request from the key pool.
         """
-        self.api_key = getattr(settings, 'GEMINI_API_KEY', None)
         self.base_url = "https://generativelanguage.googleapis.com/v1beta/models/"
         self.headers = {
             "Content-Type": "application/json",
         }
 
-    def _make_request(self, model_name: str, payload: dict, is_imagen_model=False):
+    def _make_request(self, model_name: str, payload: dict, is_imagen_model=False, timer=NULL_TIMER, timeout=None):
         """
         A private helper method to send a request to the specified Gemini model.
 
+        The request goes out with the least-loaded key of the key pool. When
+        that key is taken out of rotation (429 or 403), the request is retried
+        with the next one.
+
         Args:
             model_name: The name of the model to use.
             payload: The dictionary containing the request body.
             is_imagen_model: A flag to use the specific endpoint for Imagen models.
+            timer: Optional StageTimer recording encode, request and parse stages.
+            timeout: Optional request timeout in seconds.
 
         Returns:
             The JSON response from the API or None on error.
         """
-        if not self.api_key:
+        attempts = key_pool.size()
+        if not attempts:
             return None
-            
+
+        with timer.stage('json_encode'):
+            body = json.dumps(payload)
+        metrics.GEMINI_REQUEST_BYTES.observe(len(body), model=model_name)
+
+        for _ in range(attempts):
+            lease = key_pool.acquire()
+            if lease is None:
+                metrics.GEMINI_KEY_POOL_EXHAUSTED.inc()
+                log_event(logger, 'gemini.key_pool.exhausted', logging.WARNING, model=model_name)
+                return None
+            result, status_code = self._send(lease, model_name, body, is_imagen_model, timer, timeout)
+            if status_code not in EJECTING_STATUSES:
+                return result
+        return None
+
+    def _send(self, lease, model_name, body, is_imagen_model, timer, timeout):
+        """One request with a leased key; returns (JSON response or None, HTTP error status)"""
         if is_imagen_model:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-002:predict?key={self.api_key}"
+            url = f"https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-002:predict?key={lease.key}"
         else:
-            url = f"{self.base_url}{model_name}:generateContent?key={self.api_key}"
+            url = f"{self.base_url}{model_name}:generateContent?key={lease.key}"
 
+        outcome = 'ok'
+        status_code = retry_after = None
+        start = time.perf_counter()
         try:
-            response = requests.post(url, headers=self.headers, data=json.dumps(payload))
-            response.raise_for_status()
-            return response.json()
+            with timer.stage('http_request'):
+                tracing.set_attribute('gemini.model', model_name)
+                tracing.set_attribute('gemini.key', lease.label)
+                tracing.set_attribute('http.request_bytes', len(body))
+                response = requests.post(url, headers=self.headers, data=body, timeout=timeout)
+                tracing.set_attribute('http.status_code', response.status_code)
+                metrics.GEMINI_RESPONSE_BYTES.observe(len(response.content), model=model_name)
+                response.raise_for_status()
+            with timer.stage('json_parse'):
+                return response.json(), None
         except requests.exceptions.HTTPError as err:
-            print(f"HTTP Error: {err}")
-            print(f"Response Content: {err.response.text}")
-            return None
+            status_code = err.response.status_code
+            retry_after = parse_retry_after(err.response.headers.get('Retry-After'))
+            outcome = f"http_{status_code}"
+            log_event(logger, 'gemini.request.http_error', logging.WARNING,
+                      model=model_name, payload_bytes=len(body), latency_ms=elapsed_ms(start),
+                      status_code=status_code, key=lease.label,
+                      response_excerpt=err.response.text[:500])
+            return None, status_code
         except requests.exceptions.RequestException as err:
-            print(f"Request Error: {err}")
-            return None
+            outcome = 'timeout' if isinstance(err, requests.exceptions.Timeout) else 'error'
+            log_event(logger, 'gemini.request.error', logging.WARNING,
+                      model=model_name, payload_bytes=len(body), latency_ms=elapsed_ms(start),
+                      key=lease.label, error=str(err))
+            return None, None
+        finally:
+            key_pool.release(lease, outcome == 'ok', status_code, retry_after)
+            metrics.GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model_name, outcome=outcome)
+            if outcome == 'ok':
+                log_event(logger, 'gemini.request.ok', sampled=True,
+                          model=model_name, payload_bytes=len(body), latency_ms=elapsed_ms(start))
 
     def generate_image_from_text(self, prompt: str):
         """
@@ -61,7 +118,6 @@ class ImageGenerationClient:
         Returns:
             Image data as bytes or None on error.
         """
-        print("--- Generating Image from Text ---")
         payload = {
             "instances": {"prompt": prompt},
             "parameters": {"sampleCount": 1}
@@ -73,28 +129,31 @@ class ImageGenerationClient:
             image_data = base64.b64decode(base64_data)
             return image_data
         else:
-            print("Image generation failed.")
+            log_event(logger, 'gemini.generate.no_image', logging.WARNING, model="imagen-3.0-generate-002")
             return None
 
-    def edit_image_with_text(self, image_bytes: bytes, prompt: str, mime_type: str = "image/jpeg"):
+    def edit_image_with_text(self, image_bytes: bytes, prompt: str, mime_type: str = "image/jpeg", timer=NULL_TIMER,
+                             model: str = IMAGE_EDIT_MODEL, timeout=None):
         """
         Edits an existing image using a text-based instruction.
 
-        This method uses the gemini-2.5-flash-image-preview model.
-        The image is passed as base64-encoded inline data.
+        This method uses the gemini-2.5-flash-image-preview model unless
+        another model is given. The image is passed as base64-encoded inline data.
 
         Args:
             image_bytes: The image bytes to be edited.
             prompt: The text prompt for the edit.
             mime_type: The MIME type of the image.
+            timer: Optional StageTimer for the per-stage timing breakdown.
+            model: The image editing model to call.
+            timeout: Optional request timeout in seconds.
 
         Returns:
             Edited image data as bytes or None on error.
         """
-        print("--- Editing Image with Text ---")
-        
         # Convert image bytes to base64
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
+        with timer.stage('base64_encode'):
+            base64_image = base64.b64encode(image_bytes).decode("utf-8")
 
         payload = {
             "contents": [
@@ -109,7 +168,7 @@ class ImageGenerationClient:
                 "responseModalities": ["IMAGE"]
             }
         }
-        response = self._make_request("gemini-2.5-flash-image-preview", payload)
+        response = self._make_request(model, payload, timer=timer, timeout=timeout)
         
         if response and response.get("candidates"):
             # Get the first candidate's content
@@ -120,13 +179,14 @@ class ImageGenerationClient:
                 for part in parts:
                     if "inlineData" in part and "data" in part["inlineData"]:
                         base64_data = part["inlineData"]["data"]
-                        image_data = base64.b64decode(base64_data)
+                        with timer.stage('base64_decode'):
+                            image_data = base64.b64decode(base64_data)
                         return image_data
             
-            print("Edited image generation failed. No image data in response.")
+            log_event(logger, 'gemini.edit.no_image_data', logging.WARNING, model=model)
             return None
         else:
-            print("Edited image generation failed.")
+            log_event(logger, 'gemini.edit.failed', logging.WARNING, model=model)
             return None
 
     def compose_image_from_multiple(self, image_paths: list, prompt: str):
@@ -143,11 +203,10 @@ class ImageGenerationClient:
         Returns:
             Composed image data as bytes or None on error.
         """
-        print("--- Composing Image from Multiple Inputs ---")
         parts = []
         for path in image_paths:
             if not os.path.exists(path):
-                print(f"Error: Image file not found at {path}")
+                log_event(logger, 'gemini.compose.file_not_found', logging.WARNING, path=path)
                 return None
             with open(path, "rb") as f:
                 image_bytes = f.read()
@@ -171,10 +230,10 @@ class ImageGenerationClient:
                 image_data = base64.b64decode(base64_data)
                 return image_data
             else:
-                print("Composed image generation failed. No image data in response.")
+                log_event(logger, 'gemini.compose.no_image_data', logging.WARNING, model="gemini-2.5-flash-image-preview")
                 return None
         else:
-            print("Composed image generation failed.")
+            log_event(logger, 'gemini.compose.failed', logging.WARNING, model="gemini-2.5-flash-image-preview")
             return None
 
     def generate_image_with_text(self, prompt: str):
@@ -189,7 +248,6 @@ class ImageGenerationClient:
         Returns:
             Image data as bytes or None on error.
         """
-        print("--- Generating Image with High-Precision Text ---")
         # High-precision text rendering is a capability of Imagen 3.
         # It's achieved by providing a clear and specific prompt.
         payload = {
@@ -203,5 +261,5 @@ class ImageGenerationClient:
             image_data = base64.b64decode(base64_data)
             return image_data
         else:
-            print("Image generation with text failed.")
+            log_event(logger, 'gemini.generate_text.no_image', logging.WARNING, model="imagen-3.0-generate-002")
             return None
\ No newline at end of file
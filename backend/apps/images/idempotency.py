@@ -0,0 +1,110 @@
+"""
+Idempotency-Key support for POST actions that start work.
+
+The first request with a key runs normally and its response is stored for
+IDEMPOTENCY_KEY_TTL seconds. Retries with the same key get the stored
+response back, including its Location and Retry-After headers, without
+running the view again. A retry that arrives while the first request is
+still running gets 409. That claim lasts only IDEMPOTENCY_CLAIM_TTL seconds,
+so a request whose worker died does not block its key for a day.
+
+Claims and responses live in the default cache. Retries can reach any
+server process, so that cache must be shared (REDIS_URL).
+"""
+import functools
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from . import metrics
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Response headers stored with the response and set again on replay
+REPLAYED_HEADERS = ('Location', 'Retry-After')
+
+
+def _fingerprint(request):
+    """Identify the request body, so a reused key with a new body is caught"""
+    data = {key: request.data.getlist(key) if hasattr(request.data, 'getlist') else request.data[key]
+            for key in sorted(request.data.keys()) if key not in request.FILES}
+    files = sorted((name, upload.name, upload.size)
+                   for name in request.FILES for upload in request.FILES.getlist(name))
+    payload = json.dumps([request.path, data, files], cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _cache_key(request, key):
+    owner = request.user.pk if request.user.is_authenticated else 'anon'
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return f'idempotency:{owner}:{request.path}:{digest}'
+
+
+def idempotent(view_method):
+    """Make a viewset method replay its response for a repeated Idempotency-Key"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600)
+        claim_ttl = getattr(settings, 'IDEMPOTENCY_CLAIM_TTL', 60)
+
+        # add() is atomic: exactly one request claims the key
+        if not cache.add(cache_key, {'state': 'in_progress', 'fingerprint': fingerprint}, timeout=claim_ttl):
+            entry = cache.get(cache_key)
+            if entry is not None:
+                metrics.CACHE_REQUESTS.inc(cache='idempotency', result='hit')
+                return _replay(entry, fingerprint)
+            # The entry expired between add() and get(); claim it again
+            cache.add(cache_key, {'state': 'in_progress', 'fingerprint': fingerprint}, timeout=claim_ttl)
+        metrics.CACHE_REQUESTS.inc(cache='idempotency', result='miss')
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            # Let the client retry server errors for real
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, {
+                'state': 'done',
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                # Plain JSON types, so the entry can live in any cache backend
+                'data': json.loads(json.dumps(response.data, cls=JSONEncoder)),
+                'headers': {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+            }, timeout=ttl)
+        return response
+    return wrapper
+
+
+def _replay(entry, fingerprint):
+    if entry['fingerprint'] != fingerprint:
+        return Response({
+            'error': f'{HEADER} was already used for a different request'
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if entry['state'] != 'done':
+        response = Response({
+            'error': 'A request with this Idempotency-Key is still in progress'
+        }, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '1'
+        return response
+    response = Response(entry['data'], status=entry['status'])
+    for name, value in entry.get('headers', {}).items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,67 @@
+"""
+Import-time profile of the app's process cold start.
+
+Each target is started in a fresh interpreter under `python -X importtime`,
+which reports every module's own and cumulative import time. 'web' sets
+Django up and loads the URL conf, as a server process does before its first
+request. 'worker' imports the local effects engine, as each process pool
+worker does.
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from django.conf import settings
+
+TARGETS = {
+    'web': 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+    'worker': 'import apps.images.local_effects',
+}
+
+# Heavy modules that must only be imported on first use, never at startup
+DEFERRED_MODULES = ('google.generativeai',)
+
+ImportRecord = namedtuple('ImportRecord', 'name self_us cumulative_us depth')
+StartupProfile = namedtuple('StartupProfile', 'target wall_seconds records')
+
+
+def parse_importtime(output):
+    """ImportRecords from `-X importtime` output, in import order"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # The name is indented by one space plus two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append(ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def profile_startup(target):
+    """Start a target in a new interpreter and return its StartupProfile"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'photo_effects.settings'))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', TARGETS[target]],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return StartupProfile(target, time.perf_counter() - started, parse_importtime(completed.stderr))
+
+
+def import_seconds(records):
+    """Total time spent importing: the cumulative time of the top-level imports"""
+    return sum(record.cumulative_us for record in records if record.depth == 0) / 1e6
+
+
+def slowest(records, count=15, field='cumulative_us'):
+    return sorted(records, key=lambda record: getattr(record, field), reverse=True)[:count]
+
+
+def deferred_imported(records, modules=DEFERRED_MODULES):
+    """Deferred modules (or their submodules) that were imported at startup"""
+    return sorted({
+        module for module in modules for record in records
+        if record.name == module or record.name.startswith(module + '.')
+    })
@@ -0,0 +1,97 @@
+"""
+Upload validation and batch ingestion.
+
+Multipart parsing already streams each file part to memory or a temporary
+file (FILE_UPLOAD_MAX_MEMORY_SIZE). Batch uploads then validate, measure,
+hash and store each file on a shared thread pool; Pillow and file I/O
+release the GIL, so files are ingested in parallel.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+from .models import ImageUpload
+from .phash import compute_dhash, band_fields
+
+ALLOWED_FORMATS = ('jpeg', 'jpg', 'png', 'webp')
+INVALID_IMAGE = 'Invalid image file. Please upload JPEG, PNG, or WebP.'
+
+
+class UploadRejected(Exception):
+    """The file cannot be accepted as an upload; the message is client-facing"""
+
+
+def inspect_upload(uploaded_file):
+    """
+    Validate an uploaded image and return its model field values:
+    dimensions and perceptual hash bands. Raises UploadRejected.
+    """
+    try:
+        uploaded_file.seek(0)
+        image = Image.open(uploaded_file)
+        valid = (image.format or '').lower() in ALLOWED_FORMATS
+    except Exception:
+        valid = False
+    if not valid:
+        raise UploadRejected(INVALID_IMAGE)
+    width, height = image.size
+
+    # Perceptual hash for near-duplicate detection; a failure here should
+    # never block the upload itself
+    try:
+        perceptual_hash = compute_dhash(image)
+    except Exception:
+        perceptual_hash = ''
+
+    uploaded_file.seek(0)
+    return {
+        'original_filename': uploaded_file.name,
+        'file_size': uploaded_file.size,
+        'image_width': width,
+        'image_height': height,
+        **band_fields(perceptual_hash),
+    }
+
+
+def _ingest(uploaded_file):
+    """Inspect and store one file; returns (fields, None) or (None, error)"""
+    try:
+        fields = inspect_upload(uploaded_file)
+    except UploadRejected as e:
+        return None, str(e)
+    field = ImageUpload._meta.get_field('original_image')
+    try:
+        fields['original_image'] = default_storage.save(
+            field.generate_filename(None, uploaded_file.name), uploaded_file
+        )
+    except Exception:
+        return None, 'The file could not be stored.'
+    return fields, None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Lazily create the shared ingestion thread pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'UPLOAD_INGEST_WORKERS', 4),
+                    thread_name_prefix='upload-ingest',
+                )
+    return _pool
+
+
+def ingest_files(files):
+    """
+    Inspect and store files in parallel. Returns one (fields, error) pair per
+    file, in order; fields are ready to build an ImageUpload from.
+    """
+    if len(files) == 1:
+        return [_ingest(files[0])]
+    return list(get_pool().map(_ingest, files))
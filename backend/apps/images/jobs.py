@@ -0,0 +1,152 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import close_old_connections
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class Job:
+    """A submitted job; `checkpoint` puts it back to a re-queueable state"""
+    
+    def __init__(self, checkpoint=None):
+        self.checkpoint = checkpoint
+        self.checkpointed = False
+        self.future = None
+
+
+class JobRunner:
+    """
+    Runs effect jobs on a bounded thread pool and tracks how many are
+    queued and running in this process.
+    """
+    
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._jobs = set()
+        self._draining = False
+    
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers or getattr(settings, 'IMAGE_JOB_WORKERS', 8),
+                        thread_name_prefix='image-job',
+                    )
+        return self._executor
+    
+    @property
+    def accepting(self):
+        return not self._draining
+    
+    def submit(self, fn, *args, checkpoint=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and return its Future. The job runs in a
+        copy of the caller's context, so the request's trace carries over.
+        
+        checkpoint() is called if the runner drains before the job finishes;
+        a job submitted while draining is checkpointed at once and None is
+        returned.
+        """
+        job = Job(checkpoint)
+        with self._lock:
+            draining = self._draining
+            if not draining:
+                self._queued += 1
+                self._jobs.add(job)
+        if draining:
+            self._checkpoint(job)
+            return None
+        context = contextvars.copy_context()
+        try:
+            job.future = self._get_executor().submit(context.run, self._run, job, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+                self._jobs.discard(job)
+            raise
+        return job.future
+    
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        token = _current_job.set(job)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_job.reset(token)
+            with self._lock:
+                self._running -= 1
+                self._jobs.discard(job)
+            # Worker threads are long-lived; don't hold on to stale connections
+            close_old_connections()
+    
+    def _checkpoint(self, job):
+        job.checkpointed = True
+        if job.checkpoint is not None:
+            job.checkpoint()
+    
+    def drain(self, timeout):
+        """
+        Stop accepting jobs and wait up to `timeout` seconds for the ones
+        submitted so far. Jobs still unfinished are checkpointed: queued ones
+        are cancelled, running ones are told to drop their result. Returns
+        the number of jobs finished and checkpointed.
+        """
+        with self._lock:
+            self._draining = True
+            jobs = [job for job in self._jobs if job.future is not None]
+        done, pending = wait([job.future for job in jobs], timeout=timeout)
+        checkpointed = 0
+        for job in jobs:
+            if job.future in done:
+                continue
+            if job.future.cancel():
+                with self._lock:
+                    self._queued -= 1
+                    self._jobs.discard(job)
+            self._checkpoint(job)
+            checkpointed += 1
+        return {'finished': len(done), 'checkpointed': checkpointed}
+    
+    def join(self):
+        """
+        Wait for the pool's threads to exit, if no job is queued or running.
+        Returns whether they did.
+        """
+        with self._lock:
+            if self._queued or self._running:
+                return False
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        return True
+    
+    def resume(self):
+        """Accept jobs again (after a drain that did not end the process)"""
+        with self._lock:
+            self._draining = False
+    
+    def counts(self):
+        with self._lock:
+            return {'queued': self._queued, 'running': self._running}
+
+
+job_runner = JobRunner()
+
+
+def submit_job(fn, *args, **kwargs):
+    return job_runner.submit(fn, *args, **kwargs)
+
+
+def current_job_checkpointed():
+    """Whether the running job was checkpointed and must not store its result"""
+    job = _current_job.get()
+    return job is not None and job.checkpointed
@@ -0,0 +1,145 @@
+"""
+Gemini API key pool.
+
+Keys come from GEMINI_API_KEYS (comma-separated), or GEMINI_API_KEY alone.
+Each request leases the least-loaded key in rotation: the fewest requests in
+flight, scaled by the key's health (a moving average of its success rate),
+with ties going to the key used least in the last minute. GEMINI_KEY_RPM caps
+each key's requests per minute. A key answering 429 (quota exhausted) or 403
+(revoked or not permitted) is taken out of rotation for a cooldown, honouring
+Retry-After, which doubles while the key keeps failing. State is per process;
+per-key usage is exported at /metrics/.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from .structured_logging import log_event
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+EJECTING_STATUSES = (429, 403)
+HEALTH_ALPHA = 0.2
+MAX_COOLDOWN_SECONDS = 6 * 3600
+
+
+def configured_keys():
+    keys = tuple(getattr(settings, 'GEMINI_API_KEYS', None) or ())
+    if not keys and getattr(settings, 'GEMINI_API_KEY', None):
+        keys = (settings.GEMINI_API_KEY,)
+    return keys
+
+
+def key_label(key):
+    """A stable name for a key that does not reveal it, for logs and metrics"""
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def parse_retry_after(value):
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class KeyState:
+    def __init__(self, key):
+        self.key = key
+        self.label = key_label(key)
+        self.in_flight = 0
+        self.health = 1.0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.recent = deque()  # Request start times within the last WINDOW_SECONDS
+
+    def available(self, now, rpm):
+        if self.ejected_until > now:
+            return False
+        while self.recent and self.recent[0] <= now - WINDOW_SECONDS:
+            self.recent.popleft()
+        return not rpm or len(self.recent) < rpm
+
+    def load(self):
+        # Unhealthy keys look busier, so healthy ones are preferred
+        return ((self.in_flight + 1) / max(self.health, 0.05), len(self.recent))
+
+
+class KeyPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = ()
+        self._states = []
+
+    def _sync(self):
+        # Callers hold self._lock; follows changes to the configured keys
+        keys = configured_keys()
+        if keys != self._keys:
+            previous = {state.key: state for state in self._states}
+            self._states = [previous.get(key) or KeyState(key) for key in keys]
+            self._keys = keys
+
+    def size(self):
+        with self._lock:
+            self._sync()
+            return len(self._states)
+
+    def acquire(self):
+        """Lease the least-loaded key in rotation; None when no key is available"""
+        now = time.monotonic()
+        rpm = getattr(settings, 'GEMINI_KEY_RPM', 0)
+        with self._lock:
+            self._sync()
+            candidates = [state for state in self._states if state.available(now, rpm)]
+            if not candidates:
+                return None
+            state = min(candidates, key=KeyState.load)
+            state.in_flight += 1
+            state.recent.append(now)
+            return state
+
+    def release(self, state, success, status_code=None, retry_after=None):
+        """Return a leased key, recording the outcome of its request"""
+        ejected_for = None
+        with self._lock:
+            state.in_flight -= 1
+            state.health += HEALTH_ALPHA * ((1.0 if success else 0.0) - state.health)
+            if success:
+                state.ejections = 0
+            elif status_code in EJECTING_STATUSES:
+                if retry_after is None:
+                    cooldown = (settings.GEMINI_KEY_QUOTA_COOLDOWN if status_code == 429
+                                else settings.GEMINI_KEY_FORBIDDEN_COOLDOWN)
+                    retry_after = min(cooldown * 2 ** state.ejections, MAX_COOLDOWN_SECONDS)
+                state.ejections += 1
+                state.ejected_until = max(state.ejected_until, time.monotonic() + retry_after)
+                ejected_for = retry_after
+        metrics.GEMINI_KEY_REQUESTS.inc(key=state.label, outcome='ok' if success else str(status_code or 'error'))
+        if ejected_for is not None:
+            metrics.GEMINI_KEY_EJECTIONS.inc(key=state.label, status_code=str(status_code))
+            log_event(logger, 'gemini.key_pool.ejected', logging.WARNING, key=state.label,
+                      status_code=status_code, cooldown_seconds=round(ejected_for, 3))
+
+    def snapshot(self):
+        """Per-key state for metrics: in flight, health, availability, recent requests"""
+        now = time.monotonic()
+        rpm = getattr(settings, 'GEMINI_KEY_RPM', 0)
+        with self._lock:
+            return [{
+                'key': state.label,
+                'in_flight': state.in_flight,
+                'health': round(state.health, 3),
+                'available': state.available(now, rpm),
+                'requests_last_minute': len(state.recent),
+            } for state in self._states]
+
+    def reset(self):
+        with self._lock:
+            self._keys = ()
+            self._states = []
+
+
+key_pool = KeyPool()
@@ -0,0 +1,27 @@
+"""Deferred imports for heavy modules that only some code paths use"""
+import importlib
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so
+    importing the app (every web and worker process start) does not pay for
+    it. Attributes can still be patched in tests.
+    """
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    @property
+    def loaded(self):
+        return self._module is not None
+    
+    def __getattr__(self, attribute):
+        # The import system's own locks make concurrent first use safe
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+    
+    def __repr__(self):
+        return f'<lazy module {self._name!r}{"" if self.loaded else " (not imported)"}>'
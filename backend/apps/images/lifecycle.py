@@ -0,0 +1,169 @@
+"""
+Graceful shutdown for the effect job engine.
+
+On SIGTERM the job runner stops accepting work: job-submitting endpoints
+answer 503 with Retry-After while requests keep being served. In-flight jobs
+get up to JOB_DRAIN_TIMEOUT seconds to finish; jobs still unfinished then are
+checkpointed to status 'queued', and the previous SIGTERM handler (usually
+the app server's own graceful stop) runs. On startup, queued jobs are claimed
+and re-submitted, so a rolling deploy does not lose work.
+
+A checkpointed job that finishes before the process exits keeps its result
+only if it can claim its record back before another process does.
+"""
+import functools
+import logging
+import os
+import signal
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from rest_framework import status
+from rest_framework.response import Response
+from .db import db_writer
+from .jobs import current_job_checkpointed, job_runner, submit_job
+from .models import ProcessedImage
+from .structured_logging import log_event
+from . import metrics
+from . import quota
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+
+_shutdown = {'previous': None, 'drained': False}
+
+
+def accepting_jobs(view_method):
+    """Answer 503 with Retry-After while the job runner drains"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not job_runner.accepting:
+            response = Response({
+                'error': 'The server is restarting. Please retry shortly.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(settings.JOB_DRAIN_RETRY_AFTER)
+            return response
+        return view_method(self, request, *args, **kwargs)
+    return wrapper
+
+
+def checkpoint_image_job(processed_id):
+    """Put an unfinished job's record back to the re-queueable state"""
+    if ProcessedImage.objects.filter(id=processed_id, status='processing').update(status=QUEUED):
+        metrics.PROCESSED_IMAGE_STATUS.inc(status=QUEUED)
+        metrics.JOBS_CHECKPOINTED.inc()
+        log_event(logger, 'job.checkpointed', logging.WARNING, job_id=str(processed_id))
+
+
+def reclaim_image_job(processed_id):
+    """Take a checkpointed record back; False once another process claimed it"""
+    if ProcessedImage.objects.filter(id=processed_id, status=QUEUED).update(status='processing'):
+        metrics.PROCESSED_IMAGE_STATUS.inc(status='processing')
+        return True
+    return False
+
+
+def result_abandoned(processed_id):
+    """Whether a checkpointed job must drop its result: its record was re-queued elsewhere"""
+    if current_job_checkpointed() and not reclaim_image_job(processed_id):
+        log_event(logger, 'job.abandoned', logging.WARNING)
+        return True
+    return False
+
+
+def job_checkpoint(processed_id):
+    """The checkpoint callback to submit an image job with"""
+    return functools.partial(checkpoint_image_job, processed_id)
+
+
+def requeue_checkpointed(limit=500):
+    """Claim queued jobs and submit them to this process; returns how many"""
+    from .effect_registry import effect_registry
+    from .views import process_image_task
+    
+    requeued = 0
+    queued = ProcessedImage.objects.filter(status=QUEUED).select_related('original_upload', 'user')
+    for processed in queued.order_by('created_at')[:limit]:
+        if not reclaim_image_job(processed.id):
+            continue  # Claimed by another process
+        params = processed.processing_params
+        effect = effect_registry.get(processed.effect_applied_id)
+        if effect is None:
+            ProcessedImage.objects.filter(id=processed.id).update(
+                status='failed', error_message='Effect not found'
+            )
+            metrics.PROCESSED_IMAGE_STATUS.inc(status='failed')
+            quota.release(params.get('quota_reservation'))
+            continue
+        submit_job(
+            process_image_task,
+            processed.id, processed.original_upload.original_image, effect, processed.user, params, time.monotonic(),
+            checkpoint=job_checkpoint(processed.id)
+        )
+        requeued += 1
+    if requeued:
+        metrics.JOBS_REQUEUED.inc(requeued)
+        log_event(logger, 'jobs.requeued', count=requeued)
+    return requeued
+
+
+def drain(timeout=None):
+    """Stop taking jobs, wait for in-flight ones and checkpoint the rest"""
+    timeout = settings.JOB_DRAIN_TIMEOUT if timeout is None else timeout
+    started = time.monotonic()
+    result = job_runner.drain(timeout)
+    # Commit job writes still queued for the serialized writer. Checkpointed
+    # jobs still running keep the writer: they may reclaim their records and
+    # store their results before the process exits.
+    if job_runner.join():
+        db_writer.stop()
+    log_event(logger, 'jobs.drained', duration_ms=round((time.monotonic() - started) * 1000, 3), **result)
+    return result
+
+
+def _drain_then_exit(signum):
+    try:
+        drain()
+    except Exception:
+        log_event(logger, 'jobs.drain_error', logging.ERROR, exc_info=True)
+    _shutdown['drained'] = True
+    # Signal handlers run on the main thread; send SIGTERM again to chain
+    # to the previous handler from there
+    os.kill(os.getpid(), signum)
+
+
+def _handle_sigterm(signum, frame):
+    if not _shutdown['drained']:
+        if job_runner.accepting:
+            threading.Thread(target=_drain_then_exit, args=(signum,), name='job-drain').start()
+        return
+    previous = _shutdown['previous'] or signal.SIG_DFL
+    signal.signal(signum, previous)
+    if callable(previous):
+        previous(signum, frame)
+    elif previous == signal.SIG_DFL:
+        os.kill(os.getpid(), signum)
+
+
+def start():
+    """
+    Install the SIGTERM drain handler and re-queue checkpointed jobs.
+    Called once per server process, from the WSGI module.
+    """
+    if not getattr(settings, 'JOB_GRACEFUL_SHUTDOWN', True):
+        return
+    if threading.current_thread() is threading.main_thread():
+        _shutdown['previous'] = signal.getsignal(signal.SIGTERM)
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+    threading.Thread(target=_requeue_in_background, name='job-requeue', daemon=True).start()
+
+
+def _requeue_in_background():
+    try:
+        requeue_checkpointed()
+    except Exception:
+        log_event(logger, 'jobs.requeue_error', logging.ERROR, exc_info=True)
+    finally:
+        connection.close()
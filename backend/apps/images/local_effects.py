@@ -0,0 +1,224 @@
+"""
+Local effects engine for non-generative looks (sepia, vintage, grain, ...).
+
+Filters are NumPy functions over float32 RGB arrays in [0, 1]. Keep this
+module free of Django imports: process pool workers import it directly.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+FILTERS = {}
+
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+], dtype=np.float32)
+
+
+def register_filter(name):
+    """Register a filter function under the given name"""
+    def decorator(func):
+        FILTERS[name] = func
+        return func
+    return decorator
+
+
+def available_filters():
+    return sorted(FILTERS)
+
+
+# Primitives
+
+def apply_color_matrix(pixels, matrix):
+    """Multiply every RGB pixel by a 3x3 colour matrix"""
+    # A flat (N, 3) @ (3, 3) product goes through BLAS; the stacked 3D
+    # matmul does not
+    result = pixels.reshape(-1, 3) @ matrix.T
+    return np.clip(result, 0.0, 1.0, out=result).reshape(pixels.shape)
+
+
+def build_tone_curve(points):
+    """Build a 256 entry lookup table from (input, output) control points"""
+    xs, ys = zip(*points)
+    return np.interp(np.linspace(0.0, 1.0, 256), xs, ys).astype(np.float32)
+
+
+def apply_lut(pixels, luts):
+    """
+    Apply per-channel 256 entry lookup tables.
+
+    Args:
+        pixels: float32 array of shape (H, W, 3)
+        luts: one table shared by all channels, or a (3, 256) array
+    """
+    luts = np.asarray(luts, dtype=np.float32)
+    indices = (pixels * 255.0 + 0.5).astype(np.uint8)
+    if luts.ndim == 1:
+        return luts[indices]
+    return np.stack([luts[c][indices[..., c]] for c in range(3)], axis=-1)
+
+
+def vignette_mask(height, width, amount):
+    """Radial falloff mask, 1.0 in the centre and (1 - amount) in the corners"""
+    ys = np.linspace(-1.0, 1.0, height, dtype=np.float32)[:, None]
+    xs = np.linspace(-1.0, 1.0, width, dtype=np.float32)[None, :]
+    return 1.0 - (amount / 2.0) * (xs * xs + ys * ys)
+
+
+def add_grain(pixels, amount, seed=None):
+    """Add monochrome film grain"""
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(pixels.shape[:2], dtype=np.float32)
+    noise *= amount
+    result = pixels + noise[..., None]
+    return np.clip(result, 0.0, 1.0, out=result)
+
+
+def gaussian_blur(pixels, radius):
+    """Gaussian blur via Pillow's C implementation"""
+    image = Image.fromarray(to_uint8(pixels))
+    blurred = image.filter(ImageFilter.GaussianBlur(radius))
+    return np.asarray(blurred, dtype=np.float32) / 255.0
+
+
+def to_uint8(pixels):
+    return (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+# Registered filters
+
+@register_filter('grayscale')
+def grayscale(pixels):
+    luma = pixels.reshape(-1, 3) @ LUMA_WEIGHTS
+    return np.repeat(luma.reshape(pixels.shape[:2])[..., None], 3, axis=-1)
+
+
+@register_filter('sepia')
+def sepia(pixels):
+    return apply_color_matrix(pixels, SEPIA_MATRIX)
+
+
+@register_filter('vignette')
+def vignette(pixels):
+    height, width = pixels.shape[:2]
+    return pixels * vignette_mask(height, width, 0.6)[..., None]
+
+
+@register_filter('grain')
+def grain(pixels):
+    return add_grain(pixels, 0.08)
+
+
+@register_filter('sharpen')
+def sharpen(pixels):
+    image = Image.fromarray(to_uint8(pixels))
+    sharpened = image.filter(ImageFilter.UnsharpMask(radius=2, percent=80, threshold=2))
+    return np.asarray(sharpened, dtype=np.float32) / 255.0
+
+
+@register_filter('soft-focus')
+def soft_focus(pixels):
+    return 0.6 * pixels + 0.4 * gaussian_blur(pixels, 4)
+
+
+VINTAGE_LUTS = np.stack([
+    build_tone_curve([(0.0, 0.10), (0.5, 0.56), (1.0, 0.95)]),
+    build_tone_curve([(0.0, 0.06), (0.5, 0.50), (1.0, 0.90)]),
+    build_tone_curve([(0.0, 0.08), (0.5, 0.42), (1.0, 0.78)]),
+])
+
+
+@register_filter('vintage')
+def vintage(pixels):
+    faded = apply_lut(pixels, VINTAGE_LUTS)
+    warmed = 0.7 * faded + 0.3 * apply_color_matrix(faded, SEPIA_MATRIX)
+    return add_grain(vignette(warmed), 0.04)
+
+
+HIGH_CONTRAST_CURVE = build_tone_curve([(0.0, 0.0), (0.25, 0.15), (0.75, 0.85), (1.0, 1.0)])
+
+
+@register_filter('high-contrast')
+def high_contrast(pixels):
+    return apply_lut(pixels, HIGH_CONTRAST_CURVE)
+
+
+@register_filter('noir')
+def noir(pixels):
+    return add_grain(vignette(high_contrast(grayscale(pixels))), 0.05)
+
+
+# Rendering
+
+def render(image_bytes, filter_name, strength=1.0, max_size=None, output_format='jpeg'):
+    """
+    Decode an image, apply a registered filter and encode the result.
+
+    The filtered image is blended with the original by `strength` (0-1).
+    This is the function run inside the process pool.
+
+    Returns:
+        Encoded image bytes.
+    """
+    if filter_name not in FILTERS:
+        raise ValueError(f"Unknown local filter: {filter_name}")
+
+    image = Image.open(io.BytesIO(image_bytes))
+    if max_size:
+        image.draft('RGB', max_size)
+    image = image.convert('RGB')
+    if max_size:
+        image.thumbnail(max_size, Image.LANCZOS)
+
+    original = np.asarray(image, dtype=np.float32) / 255.0
+    filtered = FILTERS[filter_name](original)
+    strength = min(max(float(strength), 0.0), 1.0)
+    if strength < 1.0:
+        filtered = original + (filtered - original) * strength
+
+    output = io.BytesIO()
+    pil_format = 'JPEG' if output_format.lower() in ('jpeg', 'jpg') else output_format.upper()
+    save_kwargs = {'quality': 92} if pil_format == 'JPEG' else {}
+    Image.fromarray(to_uint8(filtered)).save(output, format=pil_format, **save_kwargs)
+    return output.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers):
+    """Lazily create the shared process pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn keeps workers from inheriting the web process's
+                # threads and open database connections
+                _pool = ProcessPoolExecutor(
+                    max_workers=max_workers or os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def render_in_pool(image_bytes, filter_name, strength=1.0, max_size=None,
+                   output_format='jpeg', max_workers=None, timeout=None):
+    """
+    Render in the process pool, or inline when max_workers is 0.
+    """
+    if max_workers == 0:
+        return render(image_bytes, filter_name, strength, max_size, output_format)
+    future = get_pool(max_workers).submit(
+        render, image_bytes, filter_name, strength, max_size, output_format
+    )
+    return future.result(timeout=timeout)
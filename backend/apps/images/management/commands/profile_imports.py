@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.images.importtime import (
+    TARGETS, deferred_imported, import_seconds, profile_startup, slowest
+)
+
+
+class Command(BaseCommand):
+    help = 'Profile module import time at web and worker process start'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS) + ['all'], default='all')
+        parser.add_argument('--top', type=int, default=15, help='How many of the slowest imports to list')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail when a target spends longer than this importing')
+
+    def handle(self, *args, **options):
+        targets = sorted(TARGETS) if options['target'] == 'all' else [options['target']]
+        failures = []
+        for target in targets:
+            profile = profile_startup(target)
+            seconds = import_seconds(profile.records)
+            self.stdout.write(
+                f'{target}: {profile.wall_seconds * 1000:.1f} ms to start, {seconds * 1000:.1f} ms importing '
+                f'{len(profile.records)} modules'
+            )
+            self.stdout.write('  Slowest top-level imports (cumulative):')
+            for record in slowest([r for r in profile.records if r.depth == 0], options['top']):
+                self.stdout.write(f'    {record.cumulative_us / 1000:9.1f} ms  {record.name}')
+            self.stdout.write('  Slowest modules (own time):')
+            for record in slowest(profile.records, options['top'], field='self_us'):
+                self.stdout.write(f'    {record.self_us / 1000:9.1f} ms  {record.name}')
+
+            deferred = deferred_imported(profile.records)
+            if deferred:
+                failures.append(f'{target} imports deferred modules at startup: {", ".join(deferred)}')
+            if options['budget_ms'] is not None and seconds * 1000 > options['budget_ms']:
+                failures.append(f'{target} spends {seconds * 1000:.1f} ms importing '
+                                f'(budget {options["budget_ms"]:.1f} ms)')
+
+        if failures:
+            raise CommandError('; '.join(failures))
@@ -0,0 +1,279 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Recording a value is a dict update under a per-metric lock, so it is cheap
+enough for the request and job hot paths.
+"""
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTE_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+                16 * 1024 ** 2, 64 * 1024 ** 2)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for suffix, label_values, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, label_values, extra)
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('_total', key, None, value) for key, value in items]
+
+
+class Gauge(Metric):
+    """A gauge that is either set directly or read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            # The callback returns {label value tuple: value}
+            values = self.callback()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [('', key, None, value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        samples = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', key, ('le', _format_value(float(bound))), cumulative))
+            samples.append(('_sum', key, None, total))
+            samples.append(('_count', key, None, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = Registry()
+
+
+def _job_counts():
+    from .jobs import job_runner
+    return job_runner.counts()
+
+
+def _key_pool_values(field):
+    from .key_pool import key_pool
+    return {(state['key'],): float(state[field]) for state in key_pool.snapshot()}
+
+
+JOB_QUEUE_DEPTH = registry.register(Gauge(
+    'photo_effects_job_queue_depth', 'Effect jobs waiting for a worker',
+    callback=lambda: {(): _job_counts()['queued']},
+))
+JOBS_IN_FLIGHT = registry.register(Gauge(
+    'photo_effects_jobs_in_flight', 'Effect jobs held by this process, by state',
+    ('state',), callback=lambda: {(state,): count for state, count in _job_counts().items()},
+))
+PROCESSED_IMAGE_STATUS = registry.register(Counter(
+    'photo_effects_processed_image_status_changes', 'Processed image records entering each status',
+    ('status',),
+))
+JOBS_FINISHED = registry.register(Counter(
+    'photo_effects_jobs_finished', 'Effect jobs finished, by outcome and effect type',
+    ('outcome', 'effect_type'),
+))
+JOBS_CHECKPOINTED = registry.register(Counter(
+    'photo_effects_jobs_checkpointed', 'Unfinished effect jobs put back to queued by a shutdown drain',
+))
+JOBS_REQUEUED = registry.register(Counter(
+    'photo_effects_jobs_requeued', 'Checkpointed effect jobs picked up again on startup',
+))
+JOB_STAGE_SECONDS = registry.register(Histogram(
+    'photo_effects_job_stage_seconds', 'Time spent in each stage of an effect job',
+    ('stage',),
+))
+GEMINI_REQUEST_SECONDS = registry.register(Histogram(
+    'photo_effects_gemini_request_seconds', 'Gemini API request latency',
+    ('model', 'outcome'),
+))
+GEMINI_KEY_REQUESTS = registry.register(Counter(
+    'photo_effects_gemini_key_requests', 'Gemini API requests per pooled key, by outcome (ok or HTTP status)',
+    ('key', 'outcome'),
+))
+GEMINI_KEY_EJECTIONS = registry.register(Counter(
+    'photo_effects_gemini_key_ejections', 'Times a pooled key was taken out of rotation, by status code',
+    ('key', 'status_code'),
+))
+GEMINI_KEY_POOL_EXHAUSTED = registry.register(Counter(
+    'photo_effects_gemini_key_pool_exhausted', 'Gemini API requests not sent because no key was in rotation',
+))
+GEMINI_KEY_IN_FLIGHT = registry.register(Gauge(
+    'photo_effects_gemini_key_in_flight', 'Gemini API requests in flight per pooled key',
+    ('key',), callback=lambda: _key_pool_values('in_flight'),
+))
+GEMINI_KEY_HEALTH = registry.register(Gauge(
+    'photo_effects_gemini_key_health', 'Moving average success rate per pooled key',
+    ('key',), callback=lambda: _key_pool_values('health'),
+))
+GEMINI_KEY_AVAILABLE = registry.register(Gauge(
+    'photo_effects_gemini_key_available', 'Whether a pooled key is in rotation (1) or out (0)',
+    ('key',), callback=lambda: _key_pool_values('available'),
+))
+GEMINI_REQUEST_BYTES = registry.register(Histogram(
+    'photo_effects_gemini_request_bytes', 'Gemini API request payload size',
+    ('model',), buckets=BYTE_BUCKETS,
+))
+GEMINI_RESPONSE_BYTES = registry.register(Histogram(
+    'photo_effects_gemini_response_bytes', 'Gemini API response payload size',
+    ('model',), buckets=BYTE_BUCKETS,
+))
+STRATEGY_JOB_SECONDS = registry.register(Histogram(
+    'photo_effects_strategy_job_seconds', 'End-to-end effect job latency, by processing strategy and outcome',
+    ('strategy', 'outcome'),
+))
+STRATEGY_MODEL_CALLS = registry.register(Counter(
+    'photo_effects_strategy_model_calls', 'Model calls made, by processing strategy and model',
+    ('strategy', 'model'),
+))
+DB_WRITE_SECONDS = registry.register(Histogram(
+    'photo_effects_db_write_seconds', 'Write statement time, including SQLite lock wait',
+))
+DB_LOCK_ERRORS = registry.register(Counter(
+    'photo_effects_db_lock_errors', 'Statements that failed with "database is locked"',
+))
+DB_WRITER_QUEUE_SECONDS = registry.register(Histogram(
+    'photo_effects_db_writer_queue_seconds', 'Time job writes wait for the serialized writer',
+))
+DB_WRITER_BATCH_SIZE = registry.register(Histogram(
+    'photo_effects_db_writer_batch_size', 'Writes committed per serialized writer transaction',
+    buckets=(1, 2, 5, 10, 20, 50),
+))
+REPLICA_LAG_SECONDS = registry.register(Gauge(
+    'photo_effects_replica_lag_seconds', 'Read replica heartbeat lag (+Inf when unreadable)',
+    ('database',),
+))
+REPLICA_FALLBACKS = registry.register(Counter(
+    'photo_effects_replica_fallbacks', 'Replica-eligible reads served by the primary, by reason (pinned or lag)',
+    ('reason',),
+))
+ETA_ERROR_SECONDS = registry.register(Histogram(
+    'photo_effects_eta_error_seconds', 'Distance between estimated and actual job completion',
+    ('direction',),
+))
+CACHE_REQUESTS = registry.register(Counter(
+    'photo_effects_cache_requests', 'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result'),
+))
+UPLOADS = registry.register(Counter(
+    'photo_effects_uploads', 'Uploads received, by outcome',
+    ('outcome',),
+))
+UPLOAD_BYTES = registry.register(Counter(
+    'photo_effects_upload_bytes', 'Bytes of accepted uploads',
+))
+UPLOAD_CHUNKS = registry.register(Counter(
+    'photo_effects_upload_chunks', 'Resumable upload chunks received, by outcome',
+    ('outcome',),
+))
+
+
+def observe_job(timer, outcome, effect_type, strategy='unknown'):
+    """Record a finished job and its StageTimer breakdown"""
+    JOBS_FINISHED.inc(outcome=outcome, effect_type=effect_type)
+    STRATEGY_JOB_SECONDS.observe(timer.elapsed(), strategy=strategy, outcome=outcome)
+    for stage, seconds in timer.stages.items():
+        JOB_STAGE_SECONDS.observe(seconds, stage=stage)
+    JOB_STAGE_SECONDS.observe(timer.elapsed(), stage='total')
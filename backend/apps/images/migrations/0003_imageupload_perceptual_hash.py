@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0002_alter_processedimage_processing_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='phash_band_0',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='phash_band_1',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='phash_band_2',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='phash_band_3',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', 'phash_band_0'], name='upload_phash_band_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', 'phash_band_1'], name='upload_phash_band_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', 'phash_band_2'], name='upload_phash_band_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', 'phash_band_3'], name='upload_phash_band_3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0003_imageupload_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='is_preview',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0004_processedimage_is_preview'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', '-uploaded_at'], name='upload_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['user', '-created_at'], name='processed_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['effect_applied', '-created_at'], name='processed_effect_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['status', '-created_at'], name='processed_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0005_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicationHeartbeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beat_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_replicationheartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='estimated_completion_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
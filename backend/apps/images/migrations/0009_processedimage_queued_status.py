@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processedimage',
+            name='status',
+            field=models.CharField(choices=[('uploaded', 'Uploaded'), ('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='processing', max_length=20),
+        ),
+    ]
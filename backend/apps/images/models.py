@@ -6,6 +6,7 @@ import uuid
 class ImageUpload(models.Model):
     STATUS_CHOICES = [
         ('uploaded', 'Uploaded'),
+        ('queued', 'Queued'),  # checkpointed by a shutdown, waiting to be re-queued
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
@@ -19,8 +20,26 @@ class ImageUpload(models.Model):
     image_width = models.IntegerField()
     image_height = models.IntegerField()
     
+    # Perceptual hash (dHash) for near-duplicate detection, plus its four
+    # 16-bit bands so Hamming distance lookups can use an index
+    perceptual_hash = models.CharField(max_length=16, blank=True, default='', db_index=True)
+    phash_band_0 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band_1 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band_2 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band_3 = models.PositiveIntegerField(null=True, blank=True)
+    
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'phash_band_0'], name='upload_phash_band_0_idx'),
+            models.Index(fields=['user', 'phash_band_1'], name='upload_phash_band_1_idx'),
+            models.Index(fields=['user', 'phash_band_2'], name='upload_phash_band_2_idx'),
+            models.Index(fields=['user', 'phash_band_3'], name='upload_phash_band_3_idx'),
+            # Per-user upload history, newest first
+            models.Index(fields=['user', '-uploaded_at'], name='upload_user_uploaded_idx'),
+        ]
+    
     def __str__(self):
         return f"Upload {self.id} - {self.original_filename}"
 
@@ -33,7 +52,10 @@ class ProcessedImage(models.Model):
     processed_image = models.ImageField(upload_to='processed/')
     processing_time = models.FloatField(default=0.0)  # seconds
     status = models.CharField(max_length=20, choices=ImageUpload.STATUS_CHOICES, default='processing')
+    is_preview = models.BooleanField(default=False)  # low-resolution preview render
     error_message = models.TextField(blank=True, null=True)
+    # Predicted finish time at submission (see apps.images.eta)
+    estimated_completion_at = models.DateTimeField(null=True, blank=True)
     
     # Metadata
     gemini_response_data = models.JSONField(default=dict)
@@ -41,9 +63,33 @@ class ProcessedImage(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Per-user history and per-effect listings, newest first
+            models.Index(fields=['user', '-created_at'], name='processed_user_created_idx'),
+            models.Index(fields=['effect_applied', '-created_at'], name='processed_effect_created_idx'),
+            # Status filters (admin, metrics, stuck-job sweeps)
+            models.Index(fields=['status', '-created_at'], name='processed_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Processed {self.id} - {self.effect_applied.name}"
 
+class UploadSession(models.Model):
+    """A resumable upload; received chunks are appended to a file in UPLOAD_SESSION_DIR"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()  # in bytes
+    offset = models.BigIntegerField(default=0)  # bytes received so far
+    upload = models.OneToOneField(ImageUpload, on_delete=models.SET_NULL, null=True, blank=True)  # once finalized
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Upload session {self.id} - {self.filename} ({self.offset}/{self.total_size})"
+
 class UserUsage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     month = models.DateField()  # First day of month
@@ -51,4 +97,8 @@ class UserUsage(models.Model):
     premium_effects_used = models.IntegerField(default=0)
     
     class Meta:
-        unique_together = ['user', 'month']
\ No newline at end of file
+        unique_together = ['user', 'month']
+
+class ReplicationHeartbeat(models.Model):
+    """Single row the primary touches; its age on a replica is that replica's lag"""
+    beat_at = models.DateTimeField()
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination, newest first. Each page seeks past the previous
+    page's last created_at, so deep pages cost the same as the first.
+    """
+    ordering = '-created_at'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class UploadedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = '-uploaded_at'
+
+
+def owned_by(queryset, user):
+    """
+    Limit a listing to the requester's own records. Staff see everything;
+    anonymous clients see records without an owner.
+    """
+    if user.is_staff:
+        return queryset
+    if user.is_authenticated:
+        return queryset.filter(user=user)
+    return queryset.filter(user__isnull=True)
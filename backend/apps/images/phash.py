@@ -0,0 +1,101 @@
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+# A 64-bit hash split into 4 bands of 16 bits. Two hashes within a Hamming
+# distance of 3 are guaranteed to share at least one band exactly, so an
+# indexed equality lookup on the bands finds every near-duplicate candidate.
+HASH_SIZE = 8
+BAND_COUNT = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+# The largest distance the band index finds every match for
+MAX_INDEXED_DISTANCE = BAND_COUNT - 1
+
+
+def compute_dhash(image, hash_size=HASH_SIZE):
+    """
+    Compute a difference hash (dHash) for a PIL image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale grid and
+    each bit records whether a pixel is brighter than its left neighbour.
+
+    Returns:
+        The hash as a 16 character hex string.
+    """
+    # Let the JPEG decoder downscale while decoding; this is a no-op for
+    # other formats and avoids decoding full resolution pixels we discard.
+    image.draft('L', (hash_size * 8, hash_size * 8))
+    grayscale = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(grayscale, dtype=np.int16)
+
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    value = int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def hash_bands(hex_hash):
+    """Split a hex hash into its indexed 16-bit bands, most significant first."""
+    value = int(hex_hash, 16)
+    return [
+        (value >> (BAND_BITS * (BAND_COUNT - 1 - i))) & BAND_MASK
+        for i in range(BAND_COUNT)
+    ]
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hex hashes"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def band_fields(hex_hash):
+    """Model field values for storing a hash on ImageUpload"""
+    if not hex_hash:
+        return {'perceptual_hash': ''}
+
+    fields = {'perceptual_hash': hex_hash}
+    for i, band in enumerate(hash_bands(hex_hash)):
+        fields[f'phash_band_{i}'] = band
+    return fields
+
+
+def find_near_duplicates(upload, max_distance=None):
+    """
+    Find earlier uploads by the same user whose perceptual hash is within
+    max_distance bits of this upload's hash. max_distance is capped at
+    MAX_INDEXED_DISTANCE. Anonymous uploads have no owner to scope the
+    lookup to, so they never match.
+
+    Returns:
+        A list of (distance, ImageUpload) tuples ordered by distance.
+    """
+    from django.db.models import Q
+    from .models import ImageUpload
+
+    if not upload.perceptual_hash or upload.user_id is None:
+        return []
+
+    if max_distance is None:
+        max_distance = getattr(settings, 'PERCEPTUAL_HASH_MAX_DISTANCE', 3)
+    max_distance = min(max_distance, MAX_INDEXED_DISTANCE)
+
+    band_match = Q()
+    for i, band in enumerate(hash_bands(upload.perceptual_hash)):
+        band_match |= Q(**{f'phash_band_{i}': band})
+
+    candidates = (
+        ImageUpload.objects
+        .filter(band_match, user=upload.user)
+        .exclude(id=upload.id)
+        .exclude(perceptual_hash='')
+        .only('id', 'perceptual_hash', 'uploaded_at')
+    )
+
+    matches = []
+    for candidate in candidates:
+        distance = hamming_distance(upload.perceptual_hash, candidate.perceptual_hash)
+        if distance <= max_distance:
+            matches.append((distance, candidate))
+
+    matches.sort(key=lambda match: (match[0], -match[1].uploaded_at.timestamp()))
+    return matches
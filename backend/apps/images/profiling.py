@@ -0,0 +1,140 @@
+"""
+Opt-in per-request profiling: SQL query capture and an optional cProfile run.
+
+A request is profiled when it is sampled (PROFILING_SAMPLE_RATE) or when it
+sends an X-Profile header and is allowed to (staff users, or any client when
+PROFILING_ALLOW_HEADER is set). `X-Profile: cprofile` also records a
+cProfile of the request.
+"""
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+_reports = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 100))
+_reports_lock = threading.Lock()
+
+
+class QueryCollector:
+    """execute_wrapper that records every query run on a connection"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:200],
+                'alias': context['connection'].alias,
+                'time_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    def summary(self, max_queries=200):
+        statements = Counter(query['sql'] for query in self.queries)
+        exact = Counter((query['sql'], query['params']) for query in self.queries)
+        return {
+            'count': len(self.queries),
+            'time_ms': round(sum(query['time_ms'] for query in self.queries), 3),
+            'duplicate_count': sum(count - 1 for count in exact.values() if count > 1),
+            'similar': [
+                {'sql': sql, 'count': count}
+                for sql, count in statements.most_common(10) if count > 1
+            ],
+            'queries': self.queries[:max_queries],
+        }
+
+
+def add_report(report):
+    with _reports_lock:
+        _reports.append(report)
+
+
+def get_reports():
+    with _reports_lock:
+        return list(_reports)
+
+
+def get_report(report_id):
+    for report in get_reports():
+        if report['id'] == report_id:
+            return report
+    return None
+
+
+def clear_reports():
+    with _reports_lock:
+        _reports.clear()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _mode(self, request):
+        """Return None, 'sql' or 'cprofile' for this request"""
+        header = request.headers.get('X-Profile', '').lower()
+        if header:
+            user = getattr(request, 'user', None)
+            allowed = getattr(settings, 'PROFILING_ALLOW_HEADER', False) or (user is not None and user.is_staff)
+            if allowed:
+                return 'cprofile' if header == 'cprofile' else 'sql'
+
+        sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        if sample_rate and random.random() < sample_rate:
+            return 'sql'
+        return None
+
+    def __call__(self, request):
+        mode = self._mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        collector = QueryCollector()
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        sql = collector.summary()
+        report = {
+            'id': uuid.uuid4().hex,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status_code': response.status_code,
+            'duration_ms': duration_ms,
+            'created_at': time.time(),
+            'sql': sql,
+            'profile': None,
+        }
+        if profiler:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(40)
+            report['profile'] = output.getvalue()
+        add_report(report)
+
+        response['X-Profile-Id'] = report['id']
+        response['X-Profile-Duration-Ms'] = str(duration_ms)
+        response['X-SQL-Queries'] = str(sql['count'])
+        response['X-SQL-Time-Ms'] = str(sql['time_ms'])
+        response['X-SQL-Duplicates'] = str(sql['duplicate_count'])
+        return response
@@ -0,0 +1,175 @@
+"""
+Monthly effect quota.
+
+Usage counters live in the cache and are changed with atomic incr/decr, so
+concurrent requests cannot both take the last free slot. A slot is reserved
+when a job is submitted. The job then commits it to UserUsage with an F()
+update (off the request path), or releases it if rendering fails.
+
+Previews are counted against a separate, larger monthly allowance
+(FREE_MONTHLY_PREVIEWS). They are not written to UserUsage; the preview
+records themselves are the usage.
+
+The counters are only atomic across server processes with a shared cache
+(REDIS_URL). A counter that expired is reseeded from UserUsage plus the jobs
+still holding a reservation, or for previews from the month's preview records.
+"""
+from datetime import date, datetime, time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.users.models import UserProfile
+from .models import UserUsage
+
+
+def current_month():
+    return timezone.now().date().replace(day=1)
+
+
+def is_premium_user(user):
+    """The user's tier, looked up once and memoized on the user object"""
+    if not hasattr(user, '_quota_is_premium'):
+        user._quota_is_premium = bool(
+            UserProfile.objects.filter(user_id=user.pk).values_list('is_premium', flat=True).first()
+        )
+    return user._quota_is_premium
+
+
+def _key(user_id, month, preview=False):
+    if preview:
+        return f'quota:previews:{user_id}:{month.isoformat()}'
+    return f'quota:{user_id}:{month.isoformat()}'
+
+
+def _timeout():
+    return getattr(settings, 'QUOTA_CACHE_TIMEOUT', 3600)
+
+
+def _in_flight(user_id, month):
+    """Jobs holding a reservation that is neither committed nor released yet"""
+    from .models import ProcessedImage
+    return (
+        ProcessedImage.objects
+        .filter(user_id=user_id, status__in=('processing', 'queued'), is_preview=False,
+                processing_params__quota_reservation__month=month.isoformat())
+        .count()
+    )
+
+
+def _previews_used(user_id, month):
+    """Previews created this month that did not fail, including those in flight"""
+    from .models import ProcessedImage
+    return (
+        ProcessedImage.objects
+        .filter(user_id=user_id, is_preview=True,
+                created_at__gte=timezone.make_aware(datetime.combine(month, time.min)))
+        .exclude(status='failed')
+        .count()
+    )
+
+
+def _load(user_id, month, preview=False):
+    """
+    Seed the cached counter from UserUsage plus the reservations of jobs
+    still in flight (or from the month's previews); returns the cache key
+    """
+    key = _key(user_id, month, preview)
+    if cache.get(key) is None:
+        if preview:
+            used = _previews_used(user_id, month)
+        else:
+            used = UserUsage.objects.filter(user_id=user_id, month=month).values_list(
+                'effects_used', flat=True).first() or 0
+            used += _in_flight(user_id, month)
+        # add() keeps a counter another request seeded (and incremented) first
+        cache.add(key, used, timeout=_timeout())
+    return key
+
+
+def effects_used(user, month=None):
+    """Effects used this month, including reserved in-flight jobs"""
+    return cache.get(_load(user.pk, month or current_month()))
+
+
+def _denied(user, effect):
+    return not is_premium_user(user) and effect.is_premium
+
+
+def check(user, effect):
+    """Whether the user could use this effect now, without reserving a slot"""
+    if _denied(user, effect):
+        return False
+    return is_premium_user(user) or effects_used(user) < settings.FREE_MONTHLY_EFFECTS
+
+
+def reserve(user, effect, preview=False):
+    """
+    Atomically take one slot of the user's monthly quota, or of their preview
+    allowance for a preview.
+
+    Returns the reservation to store with the job, or None when the user is
+    over their limit or may not use the effect.
+    """
+    if _denied(user, effect):
+        return None
+    month = current_month()
+    key = _load(user.pk, month, preview)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        # The counter expired between seeding and incrementing
+        key = _load(user.pk, month, preview)
+        used = cache.incr(key)
+    # incr() keeps the original expiry; an active counter should not expire
+    cache.touch(key, _timeout())
+    limit = settings.FREE_MONTHLY_PREVIEWS if preview else settings.FREE_MONTHLY_EFFECTS
+    if not is_premium_user(user) and used > limit:
+        cache.decr(key)
+        return None
+    reservation = {
+        'user_id': user.pk,
+        'month': month.isoformat(),
+        'premium_effect': effect.is_premium,
+    }
+    if preview:
+        reservation['preview'] = True
+    return reservation
+
+
+def release(reservation):
+    """Give back a reserved slot, e.g. when the job failed"""
+    if not reservation:
+        return
+    try:
+        cache.decr(_key(reservation['user_id'], date.fromisoformat(reservation['month']),
+                        reservation.get('preview', False)))
+    except ValueError:
+        pass  # Counter expired; reseeding no longer counts this released job
+
+
+def commit(reservation):
+    """Write a used slot through to UserUsage"""
+    if not reservation or reservation.get('preview'):
+        return  # A preview's record is its usage
+    month = reservation['month']
+    premium = 1 if reservation['premium_effect'] else 0
+    updated = UserUsage.objects.filter(user_id=reservation['user_id'], month=month).update(
+        effects_used=F('effects_used') + 1,
+        premium_effects_used=F('premium_effects_used') + premium
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            UserUsage.objects.create(
+                user_id=reservation['user_id'], month=month,
+                effects_used=1, premium_effects_used=premium
+            )
+    except IntegrityError:
+        # Another job created the row first
+        UserUsage.objects.filter(user_id=reservation['user_id'], month=month).update(
+            effects_used=F('effects_used') + 1,
+            premium_effects_used=F('premium_effects_used') + premium
+        )
@@ -0,0 +1,174 @@
+"""
+Read-replica routing.
+
+Read-only requests (GET, HEAD and OPTIONS on views using ReplicaReadsMixin)
+read from one of DATABASE_REPLICAS. Everything else stays on the primary:
+writes, reads made after a write in the same request, background jobs, and
+requests from a client that wrote within REPLICA_PIN_SECONDS (tracked with a
+cookie), so users always read their own writes. A replica more than
+REPLICA_MAX_LAG_SECONDS behind the primary's heartbeat is skipped.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.utils import timezone
+from django.utils.connection import ConnectionDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from . import metrics
+from .structured_logging import log_event
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_primary_pin'
+
+logger = logging.getLogger(__name__)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class _RequestState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_request_state = ContextVar('db_request_state', default=None)
+
+
+@contextmanager
+def replica_reads(use_replica):
+    """Route this context's reads to a replica (if use_replica) until it writes"""
+    token = _request_state.set(_RequestState(use_replica))
+    try:
+        yield _request_state.get()
+    finally:
+        _request_state.reset(token)
+
+
+def heartbeat_lag(primary_beat, replica_beat):
+    """Seconds of primary heartbeats a replica has not seen yet; None if unknown"""
+    if replica_beat is None:
+        # A replica copied before the first heartbeat is as fresh as the primary
+        return 0.0 if primary_beat is None else None
+    if primary_beat is None or replica_beat >= primary_beat:
+        return 0.0
+    return (primary_beat - replica_beat).total_seconds()
+
+
+class LagMonitor:
+    """
+    Per-process replica lag. At most every REPLICA_LAG_CHECK_INTERVAL seconds
+    the primary heartbeat is advanced and every replica's copy is read.
+    """
+
+    def __init__(self):
+        self._lags = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def lags(self):
+        """{alias: lag in seconds, or None when the replica is unreadable}"""
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        if self._checked_at is None or time.monotonic() - self._checked_at >= interval:
+            with self._lock:
+                if self._checked_at is None or time.monotonic() - self._checked_at >= interval:
+                    self._lags = self._measure()
+                    self._checked_at = time.monotonic()
+        return self._lags
+
+    def healthy(self):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10)
+        return [alias for alias, lag in self.lags().items() if lag is not None and lag <= max_lag]
+
+    def reset(self):
+        self._checked_at = None
+
+    def _beat(self):
+        """Advance the primary heartbeat; returns the previous beat"""
+        from .models import ReplicationHeartbeat
+        # Explicit using() keeps the heartbeat from pinning the request
+        heartbeat = ReplicationHeartbeat.objects.using(PRIMARY).filter(pk=1)
+        previous = heartbeat.values_list('beat_at', flat=True).first()
+        now = timezone.now()
+        if not heartbeat.update(beat_at=now):
+            try:
+                ReplicationHeartbeat.objects.using(PRIMARY).create(pk=1, beat_at=now)
+            except IntegrityError:
+                pass  # Another process created it first
+        return previous
+
+    def _measure(self):
+        from .models import ReplicationHeartbeat
+        try:
+            primary_beat = self._beat()
+        except DatabaseError as e:
+            # Without a primary heartbeat no replica can be trusted
+            log_event(logger, 'replica_heartbeat_failed', level=logging.WARNING, error=str(e))
+            return {alias: None for alias in replica_aliases()}
+        lags = {}
+        for alias in replica_aliases():
+            try:
+                replica_beat = ReplicationHeartbeat.objects.using(alias).filter(pk=1).values_list(
+                    'beat_at', flat=True
+                ).first()
+                lags[alias] = heartbeat_lag(primary_beat, replica_beat)
+            except (DatabaseError, ConnectionDoesNotExist) as e:
+                log_event(logger, 'replica_unreadable', level=logging.WARNING, database=alias, error=str(e))
+                lags[alias] = None
+            metrics.REPLICA_LAG_SECONDS.set(float('inf') if lags[alias] is None else lags[alias], database=alias)
+        return lags
+
+
+lag_monitor = LagMonitor()
+
+
+class ReplicaRouter:
+    """Database router for DATABASE_REPLICAS; all writes go to the primary"""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or not state.use_replica or state.wrote or not replica_aliases():
+            return PRIMARY
+        replicas = lag_monitor.healthy()
+        if not replicas:
+            metrics.REPLICA_FALLBACKS.inc(reason='lag')
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            # Reads after a write in the same request must see it
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadsMixin:
+    """Serve a view's read-only requests from a replica unless the client recently wrote"""
+
+    def dispatch(self, request, *args, **kwargs):
+        pinned = PIN_COOKIE in request.COOKIES
+        if pinned and request.method in SAFE_METHODS and replica_aliases():
+            metrics.REPLICA_FALLBACKS.inc(reason='pinned')
+        with replica_reads(request.method in SAFE_METHODS and not pinned) as state:
+            response = super().dispatch(request, *args, **kwargs)
+        if state.wrote and replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax'
+            )
+        return response
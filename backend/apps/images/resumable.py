@@ -0,0 +1,159 @@
+"""
+Resumable uploads, following the tus protocol (https://tus.io).
+
+A client creates an UploadSession with the file's total size, then sends the
+file in chunks, each at the session's current offset, optionally with an
+Upload-Checksum header. Chunks are appended to a file in UPLOAD_SESSION_DIR.
+After a dropped connection the client asks for the offset and resumes from
+there. Once all bytes are in, finalizing validates the image and moves the
+assembled file into storage, which avoids copying it.
+
+A chunk is received into a temporary file first and appended only once it is
+complete, under an exclusive lock on the session file, so a racing request
+for the same offset can never overwrite bytes another request committed.
+"""
+import base64
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .ingest import inspect_upload
+from .models import ImageUpload, UploadSession
+
+READ_SIZE = 64 * 1024
+# Chunks up to this size are received in memory, larger ones spill to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+CHECKSUM_ALGORITHMS = ('sha1', 'sha256', 'md5')
+# Status used by the tus checksum extension
+CHECKSUM_MISMATCH = 460
+
+
+class ChunkError(Exception):
+    """A chunk that cannot be appended; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def session_path(session):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f'{session.id}.part')
+
+
+def create_session(user, filename, total_size):
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    session = UploadSession.objects.create(
+        user=user, filename=filename, total_size=total_size,
+        expires_at=timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    )
+    open(session_path(session), 'wb').close()
+    return session
+
+
+def parse_checksum(header):
+    """(algorithm, digest bytes) from an 'Upload-Checksum: <algorithm> <base64>' header"""
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise ChunkError('Upload-Checksum must be "<algorithm> <base64 digest>"', 400)
+    if algorithm.lower() not in CHECKSUM_ALGORITHMS:
+        raise ChunkError(f'Unsupported checksum algorithm; use one of {", ".join(CHECKSUM_ALGORITHMS)}', 400)
+    return algorithm.lower(), digest
+
+
+def append_chunk(session, stream, offset, length, checksum=None):
+    """
+    Append `length` bytes from stream at `offset`; returns the new offset.
+
+    Without a checksum, bytes that arrived before a dropped connection are
+    kept so the client resumes after them. A checksummed chunk is kept only
+    when it arrived whole and matches.
+    """
+    if offset != session.offset:
+        raise ChunkError(f'Upload-Offset must be {session.offset}', 409)
+    if offset + length > session.total_size:
+        raise ChunkError('Chunk extends past the upload length', 413)
+    hasher = hashlib.new(checksum[0]) if checksum else None
+
+    received = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, dir=settings.UPLOAD_SESSION_DIR) as chunk:
+        try:
+            while received < length:
+                data = stream.read(min(READ_SIZE, length - received))
+                if not data:
+                    break
+                chunk.write(data)
+                if hasher:
+                    hasher.update(data)
+                received += len(data)
+        except OSError:
+            pass  # Connection dropped; keep what arrived
+        if hasher and (received < length or hasher.digest() != checksum[1]):
+            raise ChunkError('Chunk checksum mismatch', CHECKSUM_MISMATCH)
+        chunk.seek(0)
+
+        with open(session_path(session), 'r+b') as part:
+            # Held until the file is closed; serializes writers across processes
+            fcntl.flock(part, fcntl.LOCK_EX)
+            # Only write at the committed offset, so a racing duplicate of the
+            # same chunk cannot truncate or overwrite what the winner wrote
+            current = UploadSession.objects.filter(pk=session.pk).values_list('offset', flat=True).first()
+            if current != offset:
+                raise ChunkError('Upload offset changed during the request', 409)
+            part.seek(offset)
+            shutil.copyfileobj(chunk, part, READ_SIZE)
+            part.truncate(offset + received)
+            part.flush()
+            UploadSession.objects.filter(pk=session.pk, offset=offset).update(offset=offset + received)
+    session.offset = offset + received
+    return session.offset
+
+
+class AssembledFile(File):
+    """An assembled session file; FileSystemStorage moves it instead of copying it"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def finalize_session(session):
+    """
+    Turn a complete session into an ImageUpload. Raises UploadRejected for
+    files that are not valid images.
+    """
+    if session.upload_id is not None:
+        return session.upload
+    with AssembledFile(open(session_path(session), 'rb')) as assembled:
+        fields = inspect_upload(assembled)
+        field = ImageUpload._meta.get_field('original_image')
+        name = default_storage.save(field.generate_filename(None, session.filename), assembled)
+    fields.update(original_image=name, original_filename=session.filename, file_size=session.total_size)
+    try:
+        upload = ImageUpload.objects.create(user=session.user, **fields)
+    except Exception:
+        default_storage.delete(name)
+        raise
+    session.upload = upload
+    session.save(update_fields=['upload'])
+    return upload
+
+
+def delete_session(session):
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_expired(limit=100):
+    """Delete expired sessions and their partial files"""
+    for session in UploadSession.objects.filter(expires_at__lt=timezone.now())[:limit]:
+        delete_session(session)
@@ -1,25 +1,80 @@
 from rest_framework import serializers
 from .models import ImageUpload, ProcessedImage
+from .eta import seconds_remaining
 
-class ImageUploadSerializer(serializers.ModelSerializer):
+
+def requested_fields(request):
+    """Field names from a ?fields=a,b,c query parameter, or None"""
+    if request is None:
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_queryset(queryset, serializer_class, fields, always=()):
+    """
+    Load only the columns the requested fields read, joining only the
+    relations they need
+    """
+    columns = {'id', *always}
+    for name in fields & set(serializer_class.Meta.fields):
+        columns.update(serializer_class.source_columns.get(name, (name,)))
+    relations = sorted({column.split('__')[0] for column in columns if '__' in column})
+    return queryset.select_related(None).select_related(*relations).only(*columns)
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin that keeps only the fields named in ?fields=.
+    source_columns maps computed fields to the model columns they read.
+    """
+    source_columns = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields - {'id'}:
+                self.fields.pop(name)
+
+class ImageUploadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ImageUpload
         fields = ['id', 'original_image', 'original_filename', 'file_size', 
                  'image_width', 'image_height', 'uploaded_at']
         read_only_fields = ['id', 'uploaded_at']
 
-class ProcessedImageSerializer(serializers.ModelSerializer):
+class ProcessedImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     effect_name = serializers.CharField(source='effect_applied.name', read_only=True)
     original_image_url = serializers.URLField(source='original_upload.original_image.url', read_only=True)
     processed_image_url = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+    
+    source_columns = {
+        'effect_name': ('effect_applied__name',),
+        'original_image_url': ('original_upload__original_image',),
+        'processed_image_url': ('processed_image',),
+        'eta_seconds': ('status', 'estimated_completion_at'),
+    }
 
     class Meta:
         model = ProcessedImage
         fields = ['id', 'processed_image', 'processed_image_url', 'effect_name', 'original_image_url',
-                 'processing_time', 'status', 'created_at']
-        read_only_fields = ['id', 'created_at']
+                 'processing_time', 'status', 'is_preview', 'created_at',
+                 'estimated_completion_at', 'eta_seconds']
+        read_only_fields = ['id', 'is_preview', 'created_at', 'estimated_completion_at']
 
     def get_processed_image_url(self, obj):
         if obj.processed_image:
             return obj.processed_image.url
         return None
+    
+    def get_eta_seconds(self, obj):
+        return seconds_remaining(obj)
+
+class ProcessedImageListSerializer(ProcessedImageSerializer):
+    """Compact gallery representation used by list views"""
+    class Meta(ProcessedImageSerializer.Meta):
+        fields = ['id', 'status', 'is_preview', 'processed_image_url', 'created_at']
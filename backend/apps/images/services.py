@@ -1,80 +1,159 @@
-import google.generativeai as genai
 from PIL import Image
 import io
 import base64
 from django.conf import settings
 from django.core.files.base import ContentFile
 import time
-from .gemini_client import ImageGenerationClient
+import threading
+import logging
+from .gemini_client import ImageGenerationClient, IMAGE_EDIT_MODEL
+from .key_pool import configured_keys
+from .lazy import LazyModule
+from .timing import NULL_TIMER
+from .structured_logging import log_event
+from . import local_effects
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# The SDK takes most of a second to import and the REST client does not need it
+genai = LazyModule('google.generativeai')
+
+
+def parse_resolution(value):
+    """Parse a resolution string such as '2048x2048' into a (width, height) tuple"""
+    try:
+        width, height = (int(part) for part in str(value).lower().split('x'))
+        return (width, height)
+    except (TypeError, ValueError):
+        return None
+
+
+def cap_resolution(resolution, limit):
+    """The smaller of two resolution strings, either of which may be empty"""
+    size, limit_size = parse_resolution(resolution), parse_resolution(limit)
+    if not limit_size:
+        return resolution
+    if not size:
+        return limit
+    return f"{min(size[0], limit_size[0])}x{min(size[1], limit_size[1])}"
 
 class GeminiImageProcessor:
+    """
+    Stateless between calls, so one instance per process is shared by all
+    job threads (see get_gemini_processor).
+    """
     def __init__(self):
-        self.api_key = getattr(settings, 'GEMINI_API_KEY', None)
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
         self.gemini_client = ImageGenerationClient()
     
-    def process_image(self, image_file, effect_prompt, strength=0.7, preserve_faces=True):
+    @property
+    def api_key(self):
+        """Mock mode unless a key is configured; REST requests use the key pool"""
+        keys = configured_keys()
+        return keys[0] if keys else None
+    
+    def process_image(self, image_file, effect_prompt, strength=0.7, preserve_faces=True,
+                      max_resolution=None, preview=False, timer=None, prompt=None,
+                      model=IMAGE_EDIT_MODEL, timeout=None, preprocess=None):
         """
         Process image with Gemini Vision API
+        
+        Previews use a lighter prompt; max_resolution caps the image sent.
+        Stage durations are recorded on the optional StageTimer.
+        A precompiled prompt (see compile_prompts) skips prompt building.
+        preprocess names a local filter applied before the image is sent.
         """
+        timer = timer or NULL_TIMER
+        if prompt:
+            full_prompt = prompt
+        elif preview:
+            full_prompt = self._build_preview_prompt(effect_prompt, strength)
+        else:
+            full_prompt = self._build_full_prompt(effect_prompt, strength, preserve_faces)
+        
         # If no API key is configured, return a mock response
         if not self.api_key:
             return {
                 'success': True,
                 'processing_time': 0.1,
                 'gemini_response': 'Mock response: This is a simulated image processing result',
-                'enhanced_prompt': self._build_full_prompt(effect_prompt, strength, preserve_faces)
+                'enhanced_prompt': full_prompt
             }
         
         try:
-            start_time = time.time()
+            start_time = time.monotonic()
             
-            # Read image bytes
-            image_file.seek(0)
-            image_bytes = image_file.read()
+            # Read image bytes, downscaled to the working resolution
+            image_bytes, mime_type = self._read_image(image_file, max_resolution, timer)
             
-            # Build enhanced prompt
-            full_prompt = self._build_full_prompt(effect_prompt, strength, preserve_faces)
+            if preprocess:
+                # The image is already at working size, so render inline
+                with timer.stage('preprocess'):
+                    image_bytes = local_effects.render(image_bytes, preprocess)
+                    mime_type = 'image/jpeg'
             
             # Generate the actual edited image using Gemini API
-            edited_image_data = self.gemini_client.edit_image_with_text(image_bytes, full_prompt)
+            edited_image_data = self.gemini_client.edit_image_with_text(
+                image_bytes, full_prompt, mime_type, timer=timer, model=model, timeout=timeout
+            )
             
             if edited_image_data is None:
                 return {
                     'success': False,
                     'error': 'No image data returned from Gemini API',
-                    'processing_time': time.time() - start_time
+                    'processing_time': time.monotonic() - start_time
                 }
             
             return {
                 'success': True,
-                'processing_time': time.time() - start_time,
+                'processing_time': time.monotonic() - start_time,
                 'gemini_response': f"Applied effect: {effect_prompt}",
                 'enhanced_prompt': full_prompt,
                 'edited_image_data': edited_image_data
             }
             
         except Exception as e:
+            processing_time = time.monotonic() - start_time
+            log_event(logger, 'gemini.process_image.error', logging.ERROR, exc_info=True,
+                      latency_ms=round(processing_time * 1000, 3))
             return {
                 'success': False,
                 'error': str(e),
-                'processing_time': time.time() - start_time
+                'processing_time': processing_time
             }
     
-    def process_center_stage_effect(self, image_file, base_prompt):
+    def _read_image(self, image_file, max_resolution=None, timer=NULL_TIMER):
         """
-        Specialized processing for Center Stage effect
+        Read image bytes, downscaling to max_resolution when the image is larger
+        
+        Returns:
+            A tuple of (image bytes, MIME type)
         """
-        try:
-            start_time = time.time()
-            
-            # Read image bytes
+        with timer.stage('file_read'):
             image_file.seek(0)
             image_bytes = image_file.read()
-            
-            # For Center Stage effect, we'll use a predefined prompt
-            enhanced_prompt = f"""
+        
+        image = Image.open(io.BytesIO(image_bytes))
+        mime_type = Image.MIME.get(image.format, 'image/jpeg')
+        max_size = parse_resolution(max_resolution)
+        if not max_size or (image.width <= max_size[0] and image.height <= max_size[1]):
+            return image_bytes, mime_type
+        
+        with timer.stage('resize'):
+            # Let the JPEG decoder downscale while decoding, then resize exactly
+            image.draft('RGB', max_size)
+            image = image.convert('RGB')
+            image.thumbnail(max_size, Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=90)
+        return output.getvalue(), 'image/jpeg'
+    
+    @staticmethod
+    def _build_center_stage_prompt(base_prompt):
+        """
+        Build the predefined prompt used by the Center Stage effect
+        """
+        return f"""
             Transform this image with the following effect:
             {base_prompt}
             
@@ -85,34 +164,21 @@ class GeminiImageProcessor:
             - Maintain natural colors
             - Ensure high quality output
             """
-            
-            # Generate the actual edited image using Gemini API
-            edited_image_data = self.gemini_client.edit_image_with_text(image_bytes, enhanced_prompt)
-            
-            if edited_image_data is None:
-                return {
-                    'success': False,
-                    'error': 'No image data returned from Gemini API',
-                    'processing_time': time.time() - start_time
-                }
-            
-            return {
-                'success': True,
-                'processing_time': time.time() - start_time,
-                'gemini_response': f"Applied center stage effect: {base_prompt}",
-                'enhanced_prompt': enhanced_prompt,
-                'effect_type': 'center_stage',
-                'edited_image_data': edited_image_data
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'processing_time': time.time() - start_time
-            }
     
-    def _build_full_prompt(self, effect_prompt, strength, preserve_faces):
+    @staticmethod
+    def _build_preview_prompt(effect_prompt, strength=None):
+        """
+        Build a short prompt for fast, low-resolution previews
+        """
+        strength_instruction = f" Apply the effect with {int(strength * 100)}% intensity." if strength is not None else ""
+        
+        return f"""Quick preview edit. Apply the following effect to this image:
+        {effect_prompt}
+        {strength_instruction}
+        """
+    
+    @staticmethod
+    def _build_full_prompt(effect_prompt, strength, preserve_faces):
         """
         Build comprehensive prompt for image editing
         """
@@ -134,4 +200,191 @@ class GeminiImageProcessor:
         - {strength_instruction}
         - {face_instruction}
         - {quality_instruction}
-        """
\ No newline at end of file
+        """
+
+
+_gemini_processor = None
+_gemini_processor_lock = threading.Lock()
+
+
+def get_gemini_processor():
+    """The process-wide GeminiImageProcessor, created on first use"""
+    global _gemini_processor
+    if _gemini_processor is None:
+        with _gemini_processor_lock:
+            if _gemini_processor is None:
+                _gemini_processor = GeminiImageProcessor()
+    return _gemini_processor
+
+
+class LocalEffectProcessor:
+    """
+    Renders non-generative effects with the local NumPy engine.
+    Returns results in the same shape as GeminiImageProcessor.
+    """
+    def __init__(self):
+        self.max_workers = getattr(settings, 'LOCAL_EFFECTS_WORKERS', None)
+        self.timeout = getattr(settings, 'LOCAL_EFFECTS_TIMEOUT', 30)
+    
+    def process_image(self, image_file, filter_name, strength=1.0, max_resolution=None, output_format='jpeg', timer=None):
+        """
+        Apply a registered local filter to the image
+        """
+        timer = timer or NULL_TIMER
+        start_time = time.monotonic()
+        try:
+            with timer.stage('file_read'):
+                image_file.seek(0)
+                image_bytes = image_file.read()
+            
+            with timer.stage('local_render'):
+                edited_image_data = local_effects.render_in_pool(
+                    image_bytes,
+                    filter_name,
+                    strength,
+                    parse_resolution(max_resolution),
+                    output_format,
+                    max_workers=self.max_workers,
+                    timeout=self.timeout
+                )
+            
+            return {
+                'success': True,
+                'processing_time': time.monotonic() - start_time,
+                'gemini_response': f"Applied local filter: {filter_name}",
+                'enhanced_prompt': '',
+                'effect_type': 'local',
+                'edited_image_data': edited_image_data,
+                'file_extension': 'jpg' if output_format.lower() in ('jpeg', 'jpg') else output_format.lower()
+            }
+        except Exception as e:
+            processing_time = time.monotonic() - start_time
+            log_event(logger, 'local_effect.render.error', logging.ERROR, exc_info=True,
+                      latency_ms=round(processing_time * 1000, 3), filter=filter_name)
+            return {
+                'success': False,
+                'error': str(e),
+                'processing_time': processing_time
+            }
+
+
+PROMPT_TEMPLATES = {
+    'standard': lambda effect_prompt, strength, preserve_faces: GeminiImageProcessor._build_full_prompt(
+        effect_prompt, strength, preserve_faces
+    ),
+    'center-stage': lambda effect_prompt, strength, preserve_faces: GeminiImageProcessor._build_center_stage_prompt(
+        effect_prompt
+    ),
+}
+
+
+class ProcessingStrategy:
+    """
+    How an effect is rendered: the model called, the working resolution
+    sent to it, the prompt template, optional local filters run before and
+    after the model, and the request timeout budget in seconds.
+    """
+    def __init__(self, name, model=IMAGE_EDIT_MODEL, working_resolution=None, prompt_template='standard',
+                 preprocess=None, postprocess=None, timeout=120, effect_type='standard'):
+        self.name = name
+        self.model = model
+        self.working_resolution = working_resolution
+        self.prompt_template = prompt_template
+        self.preprocess = preprocess
+        self.postprocess = postprocess
+        self.timeout = timeout
+        self.effect_type = effect_type
+    
+    def build_prompts(self, effect, effect_prompt=None):
+        """Return the (full, preview) prompts for an effect"""
+        effect_prompt = effect.hidden_prompt if effect_prompt is None else effect_prompt
+        template = PROMPT_TEMPLATES[self.prompt_template]
+        # Center Stage previews have always been sent without a strength hint
+        preview_strength = effect.strength if self.prompt_template == 'standard' else None
+        return (template(effect_prompt, effect.strength, effect.preserve_faces),
+                GeminiImageProcessor._build_preview_prompt(effect_prompt, preview_strength))
+    
+    def process(self, image_file, effect, params, timer=NULL_TIMER):
+        """Render one job; returns the GeminiImageProcessor result dict"""
+        preview = params.get('preview', False)
+        prompt = params.get('preview_prompt' if preview else 'prompt')
+        if not prompt:
+            full_prompt, preview_prompt = self.build_prompts(effect, params.get('effect_prompt'))
+            prompt = preview_prompt if preview else full_prompt
+        
+        metrics.STRATEGY_MODEL_CALLS.inc(strategy=self.name, model=self.model)
+        result = get_gemini_processor().process_image(
+            image_file,
+            params.get('effect_prompt', effect.hidden_prompt),
+            params.get('strength', effect.strength),
+            params.get('preserve_faces', effect.preserve_faces),
+            max_resolution=cap_resolution(params.get('resolution', effect.max_resolution), self.working_resolution),
+            preview=preview,
+            timer=timer,
+            prompt=prompt,
+            model=self.model,
+            timeout=self.timeout,
+            preprocess=self.preprocess
+        )
+        
+        if result['success'] and self.postprocess and result.get('edited_image_data'):
+            with timer.stage('postprocess'):
+                result['edited_image_data'] = local_effects.render(result['edited_image_data'], self.postprocess)
+                result['file_extension'] = 'jpg'
+        result['effect_type'] = self.effect_type
+        return result
+
+
+class LocalStrategy(ProcessingStrategy):
+    """Renders the effect's local_filter without calling a model"""
+    def __init__(self, name='local'):
+        super().__init__(name, model='', prompt_template='', effect_type='local')
+    
+    def build_prompts(self, effect, effect_prompt=None):
+        return '', ''
+    
+    def process(self, image_file, effect, params, timer=NULL_TIMER):
+        return LocalEffectProcessor().process_image(
+            image_file,
+            effect.local_filter,
+            params.get('strength', effect.strength),
+            params.get('resolution', effect.max_resolution),
+            effect.output_format,
+            timer=timer
+        )
+
+
+STRATEGIES = {}
+
+
+def register_strategy(strategy):
+    """Register a ProcessingStrategy under its name"""
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+def get_strategy(effect):
+    """
+    The strategy an effect renders with. Effects with a local filter always
+    render locally; unknown strategy names fall back to 'standard'.
+    """
+    if effect.local_filter:
+        return STRATEGIES['local']
+    return STRATEGIES.get(effect.strategy) or STRATEGIES['standard']
+
+
+def compile_prompts(effect, effect_prompt=None):
+    """
+    Build the (full, preview) prompts sent to the model for an effect, the
+    same way its strategy would build them per job
+    """
+    return get_strategy(effect).build_prompts(effect, effect_prompt)
+
+
+register_strategy(ProcessingStrategy('standard'))
+register_strategy(ProcessingStrategy('center-stage', prompt_template='center-stage', effect_type='center_stage'))
+# Cheap looks: a smaller image and a tighter budget
+register_strategy(ProcessingStrategy('fast', working_resolution='1024x1024', timeout=60))
+# Premium looks: full resolution, a longer budget and a local sharpening pass
+register_strategy(ProcessingStrategy('premium', timeout=240, postprocess='sharpen'))
+register_strategy(LocalStrategy())
@@ -0,0 +1,23 @@
+"""
+Counts processed image status changes as they are saved, so scraping
+/metrics/ never queries the table (see metrics.PROCESSED_IMAGE_STATUS).
+Queryset updates bypass these signals; lifecycle counts its own.
+"""
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import ProcessedImage
+from . import metrics
+
+
+@receiver(post_init, sender=ProcessedImage)
+def remember_status(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred status is not fetched for every row
+    instance._saved_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=ProcessedImage)
+def count_status_change(sender, instance, created, **kwargs):
+    status = instance.__dict__.get('status')
+    if status is not None and (created or status != instance._saved_status):
+        metrics.PROCESSED_IMAGE_STATUS.inc(status=status)
+    instance._saved_status = status
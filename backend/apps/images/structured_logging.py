@@ -0,0 +1,119 @@
+"""
+Structured JSON logging that stays off the request and job hot paths.
+
+Callers log through `log_event`, which attaches job id, model, payload size
+and latency fields. Records go onto a queue and are formatted and written by
+a background listener thread. High-volume success events can be sampled.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from django.conf import settings
+from . import tracing
+
+STANDARD_FIELDS = ('job_id', 'model', 'payload_bytes', 'latency_ms')
+
+_log_context = ContextVar('log_context', default={})
+
+
+@contextmanager
+def bind(**fields):
+    """Attach fields (e.g. job_id) to every record logged in this context"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def log_event(logger, event, level=logging.INFO, sampled=False, exc_info=None, **fields):
+    """
+    Log a structured event.
+
+    Events logged with sampled=True are kept with probability
+    LOG_SUCCESS_SAMPLE_RATE; kept records carry the rate so they can be
+    re-weighted.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sampled:
+        rate = getattr(settings, 'LOG_SUCCESS_SAMPLE_RATE', 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+        fields['sample_rate'] = rate
+    logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, always including the standard fields"""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            'trace_id': getattr(record, 'trace_id', None),
+        }
+        context = getattr(record, 'context', {})
+        fields = getattr(record, 'fields', {})
+        for name in STANDARD_FIELDS:
+            data[name] = fields.get(name, context.get(name))
+        for source in (context, fields):
+            for name, value in source.items():
+                data.setdefault(name, value)
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Enqueues records for a listener thread that formats and writes them.
+
+    The request or job thread only captures its context variables; JSON
+    encoding and the stream write happen on the listener thread.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        self.dropped = 0
+        atexit.register(self._stop_listener)
+
+    def prepare(self, record):
+        # Context variables are only visible from the logging thread
+        record.trace_id = tracing.current_trace_id()
+        record.context = _log_context.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging
+            self.dropped += 1
+
+    def _stop_listener(self):
+        # stop() flushes the queue; it fails if called twice
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._stop_listener()
+        super().close()
+
+
+def elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - start) * 1000, 3)
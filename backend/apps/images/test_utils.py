@@ -0,0 +1,51 @@
+"""
+Helpers shared by the images app tests: test images, effects and a
+throwaway MEDIA_ROOT. Not named tests_*.py, so the runner does not collect it.
+"""
+import io
+import shutil
+import tempfile
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from apps.effects.models import EffectCategory, Effect
+
+
+def jpeg_bytes(size=(64, 48), color=(90, 120, 150), image_format='JPEG', **save_options):
+    """A solid-colour image encoded as JPEG (or image_format)"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format, **save_options)
+    return buffer.getvalue()
+
+
+def jpeg_file(size=(64, 48), color=(90, 120, 150)):
+    """A solid-colour JPEG in a file-like buffer, positioned at the start"""
+    return io.BytesIO(jpeg_bytes(size, color))
+
+
+def image_upload(name='photo.jpg', size=(64, 48), color=(90, 120, 150), image_format='JPEG'):
+    """A solid-colour image as an uploaded file"""
+    return SimpleUploadedFile(name, jpeg_bytes(size, color, image_format),
+                              content_type=Image.MIME[image_format])
+
+
+def create_effect(slug='test-effect', **fields):
+    """An effect in the 'Looks' category; fields override the defaults"""
+    category, _ = EffectCategory.objects.get_or_create(
+        slug='looks', defaults={'name': 'Looks', 'description': 'Looks'}
+    )
+    defaults = {'name': 'Test Effect', 'user_description': 'A test effect', 'hidden_prompt': 'A secret prompt'}
+    return Effect.objects.create(slug=slug, category=category, **{**defaults, **fields})
+
+
+def use_temp_media_root(test_case):
+    """
+    Point MEDIA_ROOT at a new temporary directory for one test; the
+    directory and the override are removed on cleanup. Returns its path.
+    """
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return media_root
@@ -0,0 +1,82 @@
+import os
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import ImageUpload
+from .test_utils import image_upload, use_temp_media_root
+
+
+@override_settings(UPLOAD_BATCH_MAX_FILES=5)
+class BatchUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.media_root = use_temp_media_root(self)
+    
+    def test_batch_upload_creates_all_files(self):
+        """Test that every valid file in a batch becomes an upload"""
+        files = [image_upload('a.jpg', color=(200, 0, 0)),
+                 image_upload('b.png', color=(0, 200, 0), image_format='PNG'),
+                 image_upload('c.webp', color=(0, 0, 200), image_format='WEBP')]
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/images/images/batch/', {'images': files}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([result['filename'] for result in response.data['results']], ['a.jpg', 'b.png', 'c.webp'])
+        # One INSERT for the whole batch
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        
+        upload = ImageUpload.objects.get(original_filename='b.png')
+        self.assertEqual((upload.image_width, upload.image_height), (64, 48))
+        self.assertEqual(len(upload.perceptual_hash), 16)
+        self.assertTrue(os.path.exists(upload.original_image.path))
+        self.assertEqual(response.data['results'][1]['upload']['id'], str(upload.id))
+    
+    def test_invalid_files_are_reported_per_file(self):
+        """Test that a bad file is rejected without failing the batch"""
+        files = [image_upload('good.jpg', color=(10, 20, 30)),
+                 SimpleUploadedFile('notes.txt', b'not an image')]
+        
+        response = self.client.post('/api/images/images/batch/', {'images': files}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['results'][0]['status'], 'created')
+        self.assertEqual(response.data['results'][1]['status'], 'rejected')
+        self.assertIn('Invalid image file', response.data['results'][1]['error'])
+        self.assertEqual(ImageUpload.objects.count(), 1)
+    
+    def test_all_invalid_batch_is_rejected(self):
+        """Test that a batch without any valid file returns 400"""
+        response = self.client.post('/api/images/images/batch/',
+                                    {'images': [SimpleUploadedFile('a.txt', b'nope')]}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['rejected'], 1)
+    
+    def test_batch_size_is_limited(self):
+        """Test that batches above UPLOAD_BATCH_MAX_FILES are refused"""
+        files = [image_upload(f'{index}.jpg', color=(index, 0, 0)) for index in range(6)]
+        
+        response = self.client.post('/api/images/images/batch/', {'images': files}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.count(), 0)
+    
+    def test_failed_insert_removes_stored_files(self):
+        """Test that files are deleted again when the bulk insert fails"""
+        files = [image_upload('a.jpg', color=(1, 2, 3)), image_upload('b.jpg', color=(4, 5, 6))]
+        
+        with patch.object(ImageUpload.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            response = self.client.post('/api/images/images/batch/', {'images': files}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        uploads_dir = os.path.join(self.media_root, 'uploads')
+        self.assertEqual(os.listdir(uploads_dir) if os.path.isdir(uploads_dir) else [], [])
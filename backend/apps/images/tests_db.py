@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import Future, TimeoutError
+from unittest.mock import MagicMock, patch
+from django.contrib.auth.models import Group
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from . import metrics
+from .db import SerializedWriter, configure_sqlite, observe_writes, run_write
+
+
+class SQLiteConfigurationTest(TestCase):
+    def test_connections_get_busy_timeout(self):
+        """Test that new SQLite connections wait on locks instead of failing"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertIn(observe_writes, connection.execute_wrappers)
+    
+    # Journal mode cannot change inside the test transaction
+    @override_settings(SQLITE_BUSY_TIMEOUT_MS=1234, SQLITE_WAL=False)
+    def test_configure_is_idempotent(self):
+        """Test that reconfiguring a connection does not stack wrappers"""
+        self.addCleanup(connection.cursor().execute, 'PRAGMA busy_timeout=5000')
+        configure_sqlite(sender=None, connection=connection)
+        configure_sqlite(sender=None, connection=connection)
+        
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+        self.assertEqual(connection.execute_wrappers.count(observe_writes), 1)
+    
+    def test_write_statements_are_timed(self):
+        """Test that INSERTs are observed and reads are not"""
+        before = metrics.DB_WRITE_SECONDS.count()
+        Group.objects.create(name='writers')
+        after_write = metrics.DB_WRITE_SECONDS.count()
+        list(Group.objects.all())
+        
+        self.assertEqual(after_write, before + 1)
+        self.assertEqual(metrics.DB_WRITE_SECONDS.count(), after_write)
+    
+    def test_lock_errors_are_counted(self):
+        """Test that "database is locked" failures are counted"""
+        def locked(sql, params, many, context):
+            raise OperationalError('database is locked')
+        
+        before = metrics.DB_LOCK_ERRORS.value()
+        with self.assertRaises(OperationalError):
+            observe_writes(locked, 'UPDATE images SET status = %s', ('failed',), False, {})
+        self.assertEqual(metrics.DB_LOCK_ERRORS.value(), before + 1)
+
+
+class SerializedWriterTest(TestCase):
+    def setUp(self):
+        self.writer = SerializedWriter(batch_size=10, batch_delay=0.2)
+    
+    def tearDown(self):
+        self.writer.stop()
+    
+    def test_queued_writes_share_a_batch(self):
+        """Test that writes submitted together commit in one batch"""
+        batches = metrics.DB_WRITER_BATCH_SIZE.count()
+        futures = [self.writer.submit(lambda i=i: i * 2) for i in range(3)]
+        
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4])
+        self.assertEqual(metrics.DB_WRITER_BATCH_SIZE.count(), batches + 1)
+    
+    def test_failing_write_does_not_fail_batch(self):
+        """Test that one failing write is isolated from the rest of its batch"""
+        def fail():
+            raise ValueError('bad write')
+        
+        ok = self.writer.submit(lambda: 'ok')
+        bad = self.writer.submit(fail)
+        
+        self.assertEqual(ok.result(timeout=5), 'ok')
+        with self.assertRaises(ValueError):
+            bad.result(timeout=5)
+    
+    def test_writes_run_on_writer_thread(self):
+        """Test that submitted writes run on the single writer thread"""
+        future = self.writer.submit(lambda: threading.current_thread().name)
+        
+        self.assertEqual(future.result(timeout=5), 'db-writer')
+    
+    def test_write_inside_transaction_stays_inline(self):
+        """Test that run_write keeps writes in the caller's open transaction"""
+        self.assertTrue(connection.in_atomic_block)
+        
+        self.assertEqual(run_write(lambda: threading.current_thread()), threading.current_thread())
+    
+    def test_stopped_writer_runs_writes_inline(self):
+        """Test that writes submitted after stop() still run, in the caller's thread"""
+        self.writer.submit(lambda: None).result(timeout=5)
+        self.writer.stop()
+        
+        future = self.writer.submit(lambda: threading.current_thread())
+        
+        self.assertIs(future.result(timeout=0), threading.current_thread())
+    
+    @override_settings(DB_WRITER_TIMEOUT=0.05)
+    def test_run_write_times_out(self):
+        """Test that run_write gives up on a writer that never commits"""
+        stuck = MagicMock(**{'submit.return_value': Future(), 'in_writer_thread.return_value': False})
+        with patch('apps.images.db.db_writer', stuck), \
+                patch('apps.images.db.serialized_writes_enabled', return_value=True), \
+                patch('apps.images.db.connection', MagicMock(in_atomic_block=False)):
+            with self.assertRaises(TimeoutError):
+                run_write(lambda: None)
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import CatalogVersion, EffectCategory, Effect
+from .models import ImageUpload
+from .effect_registry import effect_registry
+from .services import GeminiImageProcessor
+
+
+class EffectRegistryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        self.effect = Effect.objects.create(
+            name='Test Effect',
+            slug='test-effect',
+            category=self.category,
+            user_description='A test effect',
+            hidden_prompt='A secret prompt',
+            strength=0.5
+        )
+    
+    def test_prompts_are_precompiled(self):
+        """Test that the registry holds the prompts the processor would build"""
+        spec = effect_registry.get(self.effect.id)
+        
+        self.assertEqual(spec.prompt, GeminiImageProcessor._build_full_prompt('A secret prompt', 0.5, True))
+        self.assertEqual(spec.preview_prompt, GeminiImageProcessor._build_preview_prompt('A secret prompt', 0.5))
+        self.assertEqual(spec.version, self.effect.updated_at.isoformat())
+    
+    def test_lookups_do_not_query_once_loaded(self):
+        """Test that a warm registry answers without touching the database"""
+        effect_registry.get(self.effect.id)
+        
+        with self.assertNumQueries(0):
+            spec = effect_registry.get(str(self.effect.id))
+        
+        self.assertEqual(spec.slug, 'test-effect')
+        self.assertIsNone(effect_registry.get('not-a-uuid'))
+    
+    def test_edits_refresh_the_registry(self):
+        """Test that saving or deactivating an effect is picked up"""
+        effect_registry.get(self.effect.id)
+        
+        self.effect.hidden_prompt = 'A new prompt'
+        self.effect.save()
+        self.assertIn('A new prompt', effect_registry.get(self.effect.id).prompt)
+        
+        self.effect.is_active = False
+        self.effect.save()
+        self.assertIsNone(effect_registry.get(self.effect.id))
+    
+    @override_settings(EFFECT_CATALOG_VERSION_TTL=0)
+    def test_edits_in_another_process_refresh_the_registry(self):
+        """Test that a version bumped by another process reloads this one's registry"""
+        effect_registry.get(self.effect.id)
+        
+        # Queryset updates send no signals, as if another process made the edit
+        Effect.objects.filter(pk=self.effect.pk).update(hidden_prompt='A prompt from elsewhere')
+        CatalogVersion.objects.update(version='elsewhere')
+        
+        self.assertIn('A prompt from elsewhere', effect_registry.get(self.effect.id).prompt)
+    
+    @patch('apps.images.views.submit_job')
+    def test_apply_effect_makes_no_effect_queries(self, mock_submit):
+        """Test that job submission does not query the effect catalog"""
+        upload = ImageUpload.objects.create(
+            original_image='uploads/test.jpg',
+            original_filename='test.jpg',
+            file_size=1024,
+            image_width=800,
+            image_height=600
+        )
+        effect_registry.get(self.effect.id)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post(
+                f'/api/images/images/{upload.id}/apply_effect/',
+                {'effect_id': str(self.effect.id), 'force': 'true'},
+                format='multipart'
+            )
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['effect_name'], 'Test Effect')
+        self.assertFalse([query for query in queries if 'effects_effect' in query['sql']])
+        spec = mock_submit.call_args[0][3]
+        self.assertEqual(spec.id, self.effect.id)
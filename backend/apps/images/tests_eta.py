@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from .eta import LatencySketch, latency_model
+from .jobs import job_runner
+from .models import ImageUpload, ProcessedImage
+
+
+class LatencySketchTest(TestCase):
+    def test_quantiles(self):
+        """Test interpolated quantiles over the recent window"""
+        sketch = LatencySketch(size=5)
+        for value in (100, 1, 2, 3, 4, 5):
+            sketch.add(value)
+        
+        # The oldest value fell out of the window
+        self.assertEqual(len(sketch), 5)
+        self.assertEqual(sketch.quantile(0.5), 3)
+        self.assertEqual(sketch.quantile(0.9), 4.6)
+        self.assertIsNone(LatencySketch(size=5).quantile(0.5))
+
+
+@override_settings(ETA_MIN_SAMPLES=3, ETA_DEFAULT_SECONDS=15, IMAGE_JOB_WORKERS=2)
+class CompletionEstimateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        latency_model.reset()
+        self.addCleanup(latency_model.reset)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        self.effect = Effect.objects.create(
+            name='Test Effect', slug='test-effect', category=category,
+            user_description='A test effect', hidden_prompt='A secret prompt'
+        )
+        self.upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+    
+    def test_cold_effect_uses_default(self):
+        """Test that an effect without samples falls back to ETA_DEFAULT_SECONDS"""
+        self.assertEqual(latency_model.duration(self.effect.id, False), 15)
+    
+    def test_duration_follows_recent_jobs(self):
+        """Test that the median of recent durations is used once there are enough"""
+        for seconds in (4.0, 6.0, 20.0):
+            latency_model.observe(self.effect.id, False, seconds)
+        
+        self.assertEqual(latency_model.duration(self.effect.id, False), 6.0)
+        # Previews are tracked separately
+        self.assertEqual(latency_model.duration(self.effect.id, True), 15)
+    
+    def test_queue_depth_adds_wait(self):
+        """Test that jobs ahead in a full pool push the estimate out"""
+        for seconds in (10.0, 10.0, 10.0):
+            latency_model.observe(self.effect.id, False, seconds)
+        
+        with patch.object(job_runner, 'counts', return_value={'queued': 0, 'running': 1}):
+            self.assertEqual(latency_model.queue_wait(), 0.0)
+        with patch.object(job_runner, 'counts', return_value={'queued': 3, 'running': 2}):
+            # Four jobs ahead of a free slot, drained by two workers
+            self.assertEqual(latency_model.queue_wait(), 20.0)
+    
+    @patch('apps.images.views.submit_job')
+    def test_apply_effect_returns_eta(self, mock_submit):
+        """Test that the 202 response carries the ETA and a Retry-After hint"""
+        for seconds in (8.0, 8.0, 8.0):
+            latency_model.observe(self.effect.id, False, seconds)
+        
+        response = self.client.post(
+            f'/api/images/images/{self.upload.id}/apply_effect/',
+            {'effect_id': str(self.effect.id)},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertAlmostEqual(response.data['eta_seconds'], 8.0, delta=1)
+        self.assertIsNotNone(response.data['estimated_completion_at'])
+        self.assertEqual(response['Retry-After'], '8')
+    
+    def test_status_reports_remaining_time(self):
+        """Test that status polls count down to the stored estimate"""
+        processed = ProcessedImage.objects.create(
+            original_upload=self.upload, effect_applied=self.effect, user=self.user,
+            status='processing', estimated_completion_at=timezone.now() + timedelta(seconds=30)
+        )
+        
+        response = self.client.get(f'/api/images/processed_images/{processed.id}/processing_status/')
+        
+        self.assertAlmostEqual(response.data['eta_seconds'], 30, delta=1)
+        self.assertIn(response['Retry-After'], ('29', '30'))
+        
+        processed.status = 'completed'
+        processed.save()
+        response = self.client.get(f'/api/images/processed_images/{processed.id}/processing_status/')
+        
+        self.assertIsNone(response.data['eta_seconds'])
+        self.assertFalse(response.has_header('Retry-After'))
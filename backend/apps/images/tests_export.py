@@ -0,0 +1,122 @@
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from .models import ImageUpload, ProcessedImage
+
+
+@override_settings(EXPORT_CHUNK_SIZE=1024)
+class GalleryExportTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        self.effect = Effect.objects.create(
+            name='Test Effect', slug='test-effect', category=category,
+            user_description='A test effect', hidden_prompt='A secret prompt'
+        )
+        self.upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+    
+    def make_result(self, content, user=None, age=timedelta(0), **kwargs):
+        processed = ProcessedImage(
+            original_upload=self.upload, effect_applied=self.effect, user=user or self.user,
+            status='completed', **kwargs
+        )
+        processed.processed_image.save(f'{processed.id}.png', ContentFile(content), save=False)
+        processed.save()
+        ProcessedImage.objects.filter(id=processed.id).update(created_at=timezone.now() - age)
+        return processed
+    
+    def download(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+    
+    def test_export_streams_stored_zip(self):
+        """Test that results are streamed into an uncompressed ZIP"""
+        large = bytes(range(256)) * 40  # Spans several read chunks
+        self.make_result(large, age=timedelta(hours=1))
+        self.make_result(b'second image')
+        
+        response = self.client.get('/api/images/processed_images/export/')
+        
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        archive = self.download(response)
+        infos = archive.infolist()
+        self.assertEqual(len(infos), 2)
+        self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in infos))
+        self.assertTrue(infos[0].filename.startswith('test-effect/'))
+        self.assertEqual(archive.read(infos[0]), large)
+        self.assertIsNone(archive.testzip())
+    
+    def test_export_only_includes_own_completed_results(self):
+        """Test that other users' results, previews and failures are left out"""
+        mine = self.make_result(b'mine')
+        self.make_result(b'preview', is_preview=True)
+        self.make_result(b'theirs', user=User.objects.create_user(username='other', password='testpass123'))
+        ProcessedImage.objects.create(original_upload=self.upload, effect_applied=self.effect,
+                                      user=self.user, status='failed')
+        
+        archive = self.download(self.client.get('/api/images/processed_images/export/'))
+        
+        self.assertEqual(len(archive.infolist()), 1)
+        self.assertIn(str(mine.id)[:8], archive.namelist()[0])
+    
+    def test_since_exports_only_newer_results(self):
+        """Test that the export cursor makes the next export incremental"""
+        self.make_result(b'old', age=timedelta(days=2))
+        first = self.client.get('/api/images/processed_images/export/')
+        self.assertEqual(len(self.download(first).infolist()), 1)
+        
+        newer = self.make_result(b'new')
+        response = self.client.get('/api/images/processed_images/export/', {'since': first['X-Export-Cursor']})
+        
+        archive = self.download(response)
+        self.assertEqual(len(archive.infolist()), 1)
+        self.assertEqual(archive.read(archive.infolist()[0]), b'new')
+        self.assertEqual(response['X-Export-Cursor'], ProcessedImage.objects.get(id=newer.id).created_at.isoformat())
+    
+    def test_nothing_new_returns_no_content(self):
+        """Test that an export without matching results returns 204"""
+        response = self.client.get('/api/images/processed_images/export/', {'since': '2999-01-01'})
+        
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+    
+    def test_invalid_since_is_rejected(self):
+        """Test that an unparsable since returns 400"""
+        response = self.client.get('/api/images/processed_images/export/', {'since': 'yesterday'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_out_of_range_since_is_rejected(self):
+        """Test that a well-formed but impossible since returns 400"""
+        for since in ('2024-13-01', '2024-01-01T25:00:00', '2024-02-30'):
+            response = self.client.get('/api/images/processed_images/export/', {'since': since})
+            
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, since)
+    
+    def test_export_requires_login(self):
+        """Test that anonymous clients cannot export"""
+        self.client.force_authenticate(user=None)
+        
+        response = self.client.get('/api/images/processed_images/export/')
+        
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
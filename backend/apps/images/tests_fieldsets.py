@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.effects.models import EffectCategory, Effect
+from .models import ImageUpload, ProcessedImage
+
+
+class SparseFieldsetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        effect = Effect.objects.create(
+            name='Test Effect', slug='test-effect', category=category,
+            user_description='A test effect', hidden_prompt='A secret prompt'
+        )
+        for _ in range(3):
+            upload = ImageUpload.objects.create(
+                user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+                file_size=1024, image_width=800, image_height=600
+            )
+            self.processed = ProcessedImage.objects.create(
+                original_upload=upload, effect_applied=effect, user=self.user, status='completed',
+                gemini_response_data={'prompt_used': 'x' * 10000}
+            )
+    
+    def test_list_is_compact_and_skips_json_columns(self):
+        """Test that the default listing is the gallery representation"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/images/processed_images/')
+        
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'is_preview', 'processed_image_url', 'created_at'})
+        listing_sql = [query['sql'] for query in queries if 'images_processedimage' in query['sql']]
+        self.assertEqual(len(listing_sql), 1)
+        self.assertNotIn('gemini_response_data', listing_sql[0])
+        self.assertNotIn('processing_params', listing_sql[0])
+    
+    def test_fields_parameter(self):
+        """Test that ?fields= returns and loads only the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/images/processed_images/?fields=status,effect_name')
+        
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'effect_name'})
+        self.assertEqual(response.data['results'][0]['effect_name'], 'Test Effect')
+        listing_sql = [query['sql'] for query in queries if 'images_processedimage' in query['sql']]
+        # The effect name comes from the same joined query, not one per row
+        self.assertEqual(len(listing_sql), 1)
+        self.assertNotIn('hidden_prompt', listing_sql[0])
+    
+    def test_fields_on_detail_and_uploads(self):
+        """Test sparse fieldsets on a detail route and on uploads"""
+        detail = self.client.get(f'/api/images/processed_images/{self.processed.id}/?fields=status')
+        uploads = self.client.get('/api/images/images/?fields=file_size')
+        
+        self.assertEqual(detail.data, {'id': str(self.processed.id), 'status': 'completed'})
+        self.assertEqual(set(uploads.data['results'][0]), {'id', 'file_size'})
+    
+    def test_status_polls_skip_json_columns(self):
+        """Test that detail and status polls without ?fields= do not load the JSON columns"""
+        urls = [
+            f'/api/images/processed_images/{self.processed.id}/',
+            f'/api/images/processed_images/{self.processed.id}/processing_status/',
+            f'/api/images/images/{self.processed.id}/processing_status/',
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.data['effect_name'], 'Test Effect')
+            detail_sql = [query['sql'] for query in queries if 'images_processedimage' in query['sql']]
+            self.assertEqual(len(detail_sql), 1, url)
+            self.assertNotIn('gemini_response_data', detail_sql[0])
+            self.assertNotIn('processing_params', detail_sql[0])
@@ -0,0 +1,136 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+from .checks import check_shared_cache
+from .idempotency import idempotent
+from .models import ImageUpload, ProcessedImage
+from .test_utils import create_effect, image_upload, use_temp_media_root
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.effect = create_effect()
+    
+    def test_retried_upload_is_stored_once(self):
+        """Test that a retried upload returns the original response"""
+        first = self.client.post('/api/images/images/', {'image': image_upload()},
+                                 format='multipart', HTTP_IDEMPOTENCY_KEY='upload-1')
+        retry = self.client.post('/api/images/images/', {'image': image_upload()},
+                                 format='multipart', HTTP_IDEMPOTENCY_KEY='upload-1')
+        
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data['id'], str(first.data['id']))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(ImageUpload.objects.count(), 1)
+    
+    @patch('apps.images.views.submit_job')
+    def test_retried_apply_effect_starts_one_job(self, mock_submit):
+        """Test that a retried apply_effect does not create a second job"""
+        upload = ImageUpload.objects.create(
+            original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        url = f'/api/images/images/{upload.id}/apply_effect/'
+        data = {'effect_id': str(self.effect.id)}
+        
+        first = self.client.post(url, data, format='multipart', HTTP_IDEMPOTENCY_KEY='apply-1')
+        retry = self.client.post(url, data, format='multipart', HTTP_IDEMPOTENCY_KEY='apply-1')
+        other = self.client.post(url, data, format='multipart', HTTP_IDEMPOTENCY_KEY='apply-2')
+        
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(retry.data['id'], str(first.data['id']))
+        self.assertNotEqual(other.data['id'], first.data['id'])
+        self.assertEqual(mock_submit.call_count, 2)
+        self.assertEqual(ProcessedImage.objects.count(), 2)
+    
+    @patch('apps.images.views.submit_job')
+    def test_key_reuse_with_different_body_is_rejected(self, mock_submit):
+        """Test that one key cannot be replayed for a different request"""
+        upload = ImageUpload.objects.create(
+            original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        url = f'/api/images/images/{upload.id}/apply_effect/'
+        self.client.post(url, {'effect_id': str(self.effect.id)}, format='multipart', HTTP_IDEMPOTENCY_KEY='key')
+        
+        response = self.client.post(url, {'effect_id': str(self.effect.id), 'preview': 'true'},
+                                    format='multipart', HTTP_IDEMPOTENCY_KEY='key')
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+    
+    def test_in_flight_key_conflicts(self):
+        """Test that a retry while the first request runs gets 409"""
+        upload = ImageUpload.objects.create(
+            original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        url = f'/api/images/images/{upload.id}/apply_effect/'
+        retries = []
+        
+        def submit_and_retry(*args, **kwargs):
+            retries.append(self.client.post(url, {'effect_id': str(self.effect.id)},
+                                            format='multipart', HTTP_IDEMPOTENCY_KEY='slow'))
+        
+        with patch('apps.images.views.submit_job', side_effect=submit_and_retry):
+            self.client.post(url, {'effect_id': str(self.effect.id)}, format='multipart', HTTP_IDEMPOTENCY_KEY='slow')
+        
+        self.assertEqual(retries[0].status_code, status.HTTP_409_CONFLICT)
+
+
+class IdempotentDecoratorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+    
+    @idempotent
+    def start_work(self, request):
+        self.calls += 1
+        response = Response({'id': self.calls}, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = f'/work/{self.calls}/'
+        response['Retry-After'] = '5'
+        return response
+    
+    def post(self):
+        request = APIRequestFactory().post('/work/', {'job': 'a'}, format='json', HTTP_IDEMPOTENCY_KEY='work-1')
+        return self.start_work(Request(request, parsers=[JSONParser()]))
+    
+    def test_replay_keeps_response_headers(self):
+        """Test that a replay returns the original Location and Retry-After"""
+        self.post()
+        
+        retry = self.post()
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(retry.data, {'id': 1})
+        self.assertEqual(retry['Location'], '/work/1/')
+        self.assertEqual(retry['Retry-After'], '5')
+    
+    @override_settings(IDEMPOTENCY_CLAIM_TTL=30, IDEMPOTENCY_KEY_TTL=86400)
+    def test_claim_is_short_lived(self):
+        """Test that an unfinished claim expires soon and only the stored response is kept long"""
+        with patch('apps.images.idempotency.cache', wraps=cache) as spy:
+            self.post()
+        
+        self.assertEqual(spy.add.call_args.kwargs['timeout'], 30)
+        self.assertEqual(spy.set.call_args.kwargs['timeout'], 86400)
+
+
+class SharedCacheCheckTest(TestCase):
+    def test_process_local_cache_is_reported(self):
+        """Test that the deploy check warns about a per-process cache"""
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['images.W001'])
+        
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                              'LOCATION': 'redis://localhost:6379'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,111 @@
+from unittest.mock import patch, MagicMock
+import requests
+from django.test import TestCase, override_settings
+from .gemini_client import ImageGenerationClient
+from .key_pool import key_label, key_pool
+from . import metrics
+
+
+def http_error(status_code, retry_after=None):
+    response = MagicMock(status_code=status_code, content=b'', text='error')
+    response.headers = {'Retry-After': retry_after} if retry_after else {}
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+    return response
+
+
+def ok_response():
+    response = MagicMock(status_code=200, content=b'{}')
+    response.json.return_value = {'ok': True}
+    return response
+
+
+@override_settings(GEMINI_API_KEYS=['key-a', 'key-b'], GEMINI_KEY_RPM=0,
+                   GEMINI_KEY_QUOTA_COOLDOWN=60, GEMINI_KEY_FORBIDDEN_COOLDOWN=900)
+class KeyPoolTest(TestCase):
+    def setUp(self):
+        key_pool.reset()
+        self.addCleanup(key_pool.reset)
+    
+    def test_leases_go_to_least_loaded_key(self):
+        """Test that concurrent requests are spread over the keys"""
+        first = key_pool.acquire()
+        second = key_pool.acquire()
+        
+        self.assertNotEqual(first.key, second.key)
+        
+        key_pool.release(first, True)
+        key_pool.release(second, True)
+        # With nothing in flight, the key used less recently-per-minute wins
+        third = key_pool.acquire()
+        key_pool.release(third, True)
+        fourth = key_pool.acquire()
+        self.assertNotEqual(third.key, fourth.key)
+    
+    @override_settings(GEMINI_KEY_RPM=1)
+    def test_rpm_budget_limits_each_key(self):
+        """Test that a key at its per-minute budget is skipped until the window moves"""
+        leases = [key_pool.acquire(), key_pool.acquire()]
+        for lease in leases:
+            key_pool.release(lease, True)
+        
+        self.assertIsNone(key_pool.acquire())
+    
+    def test_quota_error_takes_key_out_of_rotation(self):
+        """Test that a 429 ejects the key for its Retry-After, then lets it back"""
+        lease = key_pool.acquire()
+        with patch('apps.images.key_pool.time.monotonic', return_value=1000.0):
+            key_pool.release(lease, False, 429, retry_after=30.0)
+        
+        with patch('apps.images.key_pool.time.monotonic', return_value=1010.0):
+            states = [key_pool.acquire() for _ in range(3)]
+        self.assertTrue(all(state.key != lease.key for state in states))
+        
+        with patch('apps.images.key_pool.time.monotonic', return_value=1031.0):
+            self.assertIn(lease.key, {key_pool.acquire().key for _ in range(4)})
+    
+    def test_forbidden_cooldown_doubles(self):
+        """Test that a key that keeps answering 403 stays out longer each time"""
+        with patch('apps.images.key_pool.time.monotonic', return_value=0.0):
+            lease = key_pool.acquire()
+            key_pool.release(lease, False, 403)
+            self.assertEqual(lease.ejected_until, 900.0)
+        with patch('apps.images.key_pool.time.monotonic', return_value=901.0):
+            lease.in_flight += 1
+            key_pool.release(lease, False, 403)
+            self.assertEqual(lease.ejected_until, 901.0 + 1800.0)
+        self.assertLess(lease.health, 1.0)
+    
+    def test_usage_is_exported_per_key(self):
+        """Test that per-key metrics are labelled without revealing the key"""
+        key_pool.release(key_pool.acquire(), True)
+        
+        rendered = metrics.registry.render()
+        
+        self.assertIn(f'photo_effects_gemini_key_available{{key="{key_label("key-a")}"}} 1', rendered)
+        self.assertIn(f'photo_effects_gemini_key_requests_total{{key="{key_label("key-a")}",outcome="ok"}}',
+                      rendered)
+        self.assertNotIn('key-a', rendered)
+    
+    def test_client_retries_with_next_key(self):
+        """Test that a request rejected with 429 is sent again with another key"""
+        with patch('apps.images.gemini_client.requests.post',
+                   side_effect=[http_error(429, '120'), ok_response()]) as mock_post:
+            result = ImageGenerationClient()._make_request('gemini-test', {'a': 1})
+        
+        self.assertEqual(result, {'ok': True})
+        urls = [call.args[0] for call in mock_post.call_args_list]
+        self.assertEqual(len(urls), 2)
+        self.assertNotEqual(urls[0].rsplit('key=', 1)[1], urls[1].rsplit('key=', 1)[1])
+    
+    def test_exhausted_pool_sends_nothing(self):
+        """Test that no request is sent while every key is out of rotation"""
+        for _ in range(2):
+            key_pool.release(key_pool.acquire(), False, 429, retry_after=60.0)
+        exhausted = metrics.GEMINI_KEY_POOL_EXHAUSTED.value()
+        
+        with patch('apps.images.gemini_client.requests.post') as mock_post:
+            result = ImageGenerationClient()._make_request('gemini-test', {'a': 1})
+        
+        self.assertIsNone(result)
+        mock_post.assert_not_called()
+        self.assertEqual(metrics.GEMINI_KEY_POOL_EXHAUSTED.value(), exhausted + 1)
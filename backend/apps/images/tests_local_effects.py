@@ -0,0 +1,82 @@
+import io
+import numpy as np
+from PIL import Image
+from django.test import TestCase, override_settings
+from . import local_effects
+from .services import LocalEffectProcessor, parse_resolution
+
+
+def png_bytes(size=(320, 240)):
+    gradient = np.linspace(0, 255, size[0], dtype=np.uint8)
+    pixels = np.stack([np.tile(gradient, (size[1], 1))] * 3, axis=-1)
+    pixels[..., 0] = 200
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class LocalEffectsEngineTest(TestCase):
+    def test_registry_contains_basic_looks(self):
+        """Test that the common non-generative looks are registered"""
+        for name in ('sepia', 'vintage', 'grain', 'vignette', 'grayscale'):
+            self.assertIn(name, local_effects.available_filters())
+    
+    def test_filters_preserve_shape_and_range(self):
+        """Test that every filter returns a valid RGB array"""
+        pixels = np.random.default_rng(0).random((32, 48, 3), dtype=np.float32)
+        for name, func in local_effects.FILTERS.items():
+            result = func(pixels)
+            self.assertEqual(result.shape, pixels.shape, name)
+            self.assertGreaterEqual(result.min(), 0.0, name)
+            self.assertLessEqual(result.max(), 1.0 + 1e-6, name)
+    
+    def test_grayscale_output_is_neutral(self):
+        """Test that grayscale makes all channels equal"""
+        pixels = np.random.default_rng(1).random((8, 8, 3), dtype=np.float32)
+        result = local_effects.FILTERS['grayscale'](pixels)
+        self.assertTrue(np.allclose(result[..., 0], result[..., 2]))
+    
+    def test_render_respects_max_size(self):
+        """Test that rendering downsizes to the working resolution"""
+        output = local_effects.render(png_bytes(), 'sepia', max_size=(160, 160))
+        image = Image.open(io.BytesIO(output))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (160, 120))
+    
+    def test_render_unknown_filter(self):
+        """Test that unknown filters are rejected"""
+        with self.assertRaises(ValueError):
+            local_effects.render(png_bytes(), 'does-not-exist')
+    
+    def test_parse_resolution(self):
+        """Test parsing of Effect.max_resolution values"""
+        self.assertEqual(parse_resolution('2048x1536'), (2048, 1536))
+        self.assertIsNone(parse_resolution('original'))
+
+
+class LocalEffectProcessorTest(TestCase):
+    @override_settings(LOCAL_EFFECTS_WORKERS=0)
+    def test_process_image_inline(self):
+        """Test processing in-process returns a Gemini-shaped result"""
+        result = LocalEffectProcessor().process_image(io.BytesIO(png_bytes()), 'vintage', 0.5)
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['effect_type'], 'local')
+        self.assertEqual(result['file_extension'], 'jpg')
+        Image.open(io.BytesIO(result['edited_image_data'])).verify()
+    
+    @override_settings(LOCAL_EFFECTS_WORKERS=1)
+    def test_process_image_in_pool(self):
+        """Test processing through the process pool"""
+        result = LocalEffectProcessor().process_image(io.BytesIO(png_bytes()), 'sepia', 1.0, output_format='png')
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['file_extension'], 'png')
+    
+    @override_settings(LOCAL_EFFECTS_WORKERS=0)
+    def test_process_image_failure(self):
+        """Test that failures are reported instead of raised"""
+        result = LocalEffectProcessor().process_image(io.BytesIO(b'not an image'), 'sepia')
+        
+        self.assertFalse(result['success'])
+        self.assertIn('error', result)
@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+from unittest.mock import patch, MagicMock
+import requests
+from django.test import TestCase, override_settings
+from .structured_logging import BackgroundQueueHandler, bind, log_event
+from .gemini_client import ImageGenerationClient
+from .key_pool import key_pool
+
+
+class StructuredLoggingTest(TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = BackgroundQueueHandler(stream=self.stream)
+        self.logger = logging.getLogger('apps.tests.structured')
+        self.logger.handlers = [self.handler]
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+    
+    def tearDown(self):
+        self.logger.handlers = []
+        self.handler.close()
+    
+    def records(self):
+        # Stopping the listener flushes everything still queued
+        self.handler.close()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+    
+    def test_records_carry_standard_fields(self):
+        """Test that every record has job id, model, payload size and latency"""
+        with bind(job_id='42'):
+            log_event(self.logger, 'job.failed', logging.WARNING, latency_ms=12.5, error='boom')
+        
+        record, = self.records()
+        
+        self.assertEqual(record['event'], 'job.failed')
+        self.assertEqual(record['job_id'], '42')
+        self.assertIsNone(record['model'])
+        self.assertIsNone(record['payload_bytes'])
+        self.assertEqual(record['latency_ms'], 12.5)
+        self.assertEqual(record['error'], 'boom')
+    
+    @override_settings(LOG_SUCCESS_SAMPLE_RATE=0.0)
+    def test_sampled_events_can_be_dropped(self):
+        """Test that sampled success events honour the sample rate"""
+        log_event(self.logger, 'gemini.request.ok', sampled=True)
+        log_event(self.logger, 'gemini.request.error', logging.WARNING)
+        
+        self.assertEqual([record['event'] for record in self.records()], ['gemini.request.error'])
+    
+    @override_settings(GEMINI_API_KEY='test-key')
+    def test_gemini_http_error_is_logged(self):
+        """Test that Gemini HTTP errors are logged, not printed"""
+        self.addCleanup(key_pool.reset)
+        response = MagicMock(status_code=429, content=b'quota', text='quota exceeded')
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+        
+        with self.assertLogs('apps.images.gemini_client', level='WARNING') as logs, \
+                patch('apps.images.gemini_client.requests.post', return_value=response), \
+                patch('builtins.print') as mock_print:
+            result = ImageGenerationClient()._make_request('gemini-test', {'a': 1})
+        
+        self.assertIsNone(result)
+        mock_print.assert_not_called()
+        record = logs.records[0]
+        self.assertEqual(record.getMessage(), 'gemini.request.http_error')
+        self.assertEqual(record.fields['model'], 'gemini-test')
+        self.assertEqual(record.fields['status_code'], 429)
+        self.assertGreater(record.fields['payload_bytes'], 0)
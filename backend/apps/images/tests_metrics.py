@@ -0,0 +1,111 @@
+import threading
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from apps.effects.models import EffectCategory, Effect
+from .metrics import Counter, Histogram, Registry, CACHE_REQUESTS, PROCESSED_IMAGE_STATUS
+from .models import ImageUpload, ProcessedImage
+from .jobs import JobRunner
+
+
+class MetricsTest(TestCase):
+    def test_counter_exposition(self):
+        """Test counter rendering with escaped labels"""
+        registry = Registry()
+        counter = registry.register(Counter('test_requests', 'Requests', ('path',)))
+        counter.inc(path='/a"b')
+        counter.inc(2, path='/a"b')
+        
+        output = registry.render()
+        
+        self.assertIn('# TYPE test_requests counter', output)
+        self.assertIn('test_requests_total{path="/a\\"b"} 3', output)
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        histogram = Histogram('test_latency_seconds', 'Latency', ('model',), buckets=(0.1, 1))
+        histogram.observe(0.05, model='m')
+        histogram.observe(0.5, model='m')
+        histogram.observe(5, model='m')
+        
+        output = histogram.render()
+        
+        self.assertIn('test_latency_seconds_bucket{model="m",le="0.1"} 1', output)
+        self.assertIn('test_latency_seconds_bucket{model="m",le="1"} 2', output)
+        self.assertIn('test_latency_seconds_bucket{model="m",le="+Inf"} 3', output)
+        self.assertIn('test_latency_seconds_sum{model="m"} 5.55', output)
+        self.assertIn('test_latency_seconds_count{model="m"} 3', output)
+    
+    def test_metrics_endpoint(self):
+        """Test that the endpoint serves the Prometheus text format"""
+        CACHE_REQUESTS.inc(cache='near_duplicate', result='hit')
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='admin', password='x', is_staff=True))
+        
+        response = client.get('/metrics/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('photo_effects_job_queue_depth 0', body)
+        self.assertIn('photo_effects_cache_requests_total{cache="near_duplicate",result="hit"}', body)
+        self.assertIn('# TYPE photo_effects_gemini_request_seconds histogram', body)
+    
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_endpoint_is_restricted(self):
+        """Test that only staff users and holders of METRICS_TOKEN can scrape"""
+        client = APIClient()
+        self.assertIn(client.get('/metrics/').status_code, (401, 403))
+        self.assertIn(client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, (401, 403))
+        client.force_authenticate(user=User.objects.create_user(username='user', password='x'))
+        self.assertIn(client.get('/metrics/').status_code, (401, 403))
+        
+        response = APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        
+        self.assertEqual(response.status_code, 200)
+    
+    def test_status_changes_are_counted_without_queries(self):
+        """Test that saving a status change counts it and scraping does not query"""
+        user = User.objects.create_user(username='user', password='x')
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        effect = Effect.objects.create(name='Effect', slug='effect', category=category,
+                                       user_description='Effect', hidden_prompt='Prompt')
+        upload = ImageUpload.objects.create(user=user, original_filename='a.jpg', file_size=1,
+                                            image_width=1, image_height=1)
+        processing = PROCESSED_IMAGE_STATUS.value(status='processing')
+        completed = PROCESSED_IMAGE_STATUS.value(status='completed')
+        
+        processed = ProcessedImage.objects.create(user=user, original_upload=upload, effect_applied=effect,
+                                                  status='processing')
+        processed.save()
+        processed.status = 'completed'
+        processed.save()
+        
+        self.assertEqual(PROCESSED_IMAGE_STATUS.value(status='processing'), processing + 1)
+        self.assertEqual(PROCESSED_IMAGE_STATUS.value(status='completed'), completed + 1)
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='admin', password='x', is_staff=True))
+        with self.assertNumQueries(0):
+            client.get('/metrics/')
+
+
+class JobRunnerTest(TestCase):
+    def test_counts_queued_and_running_jobs(self):
+        """Test that the runner tracks queue depth and running jobs"""
+        runner = JobRunner(max_workers=1)
+        release = threading.Event()
+        started = threading.Event()
+        
+        def blocking_job():
+            started.set()
+            release.wait(5)
+        
+        first = runner.submit(blocking_job)
+        second = runner.submit(lambda: None)
+        started.wait(5)
+        
+        self.assertEqual(runner.counts(), {'queued': 1, 'running': 1})
+        release.set()
+        first.result(5)
+        second.result(5)
+        self.assertEqual(runner.counts(), {'queued': 0, 'running': 0})
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from .models import ImageUpload, ProcessedImage
+
+
+class HistoryPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        effect = Effect.objects.create(
+            name='Test Effect', slug='test-effect', category=category,
+            user_description='A test effect', hidden_prompt='A secret prompt'
+        )
+        for owner, count in ((self.user, 5), (self.other, 2)):
+            for _ in range(count):
+                upload = ImageUpload.objects.create(
+                    user=owner, original_image='uploads/test.jpg', original_filename='test.jpg',
+                    file_size=1024, image_width=800, image_height=600
+                )
+                ProcessedImage.objects.create(original_upload=upload, effect_applied=effect, user=owner)
+    
+    def test_cursor_pages_walk_own_history(self):
+        """Test that cursor pages cover the user's history newest first"""
+        self.client.force_authenticate(user=self.user)
+        
+        first = self.client.get('/api/images/processed_images/?page_size=3')
+        second = self.client.get(first.data['next'])
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', first.data)
+        ids = [item['id'] for item in first.data['results'] + second.data['results']]
+        expected = ProcessedImage.objects.filter(user=self.user).order_by('-created_at').values_list('id', flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+        self.assertIsNone(second.data['next'])
+    
+    def test_upload_listing_is_per_user(self):
+        """Test that upload listings only show the requester's uploads"""
+        self.client.force_authenticate(user=self.other)
+        
+        response = self.client.get('/api/images/images/')
+        
+        self.assertEqual(len(response.data['results']), 2)
+    
+    def test_history_query_uses_index(self):
+        """Test that the per-user history query is served by the composite index"""
+        queryset = ProcessedImage.objects.filter(user=self.user).order_by('-created_at')[:20]
+        sql, params = queryset.query.sql_with_params()
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        
+        self.assertIn('processed_user_created_idx', plan)
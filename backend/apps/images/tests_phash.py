@@ -0,0 +1,139 @@
+import io
+import numpy as np
+from PIL import Image
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import ImageUpload, ProcessedImage
+from .phash import compute_dhash, hamming_distance, band_fields, find_near_duplicates
+from .test_utils import create_effect, use_temp_media_root
+
+
+def make_image(seed=0, size=(256, 192)):
+    """Build a smooth random test image"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize(size, Image.BICUBIC)
+
+
+def encode_jpeg(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class PerceptualHashTest(TestCase):
+    def test_hash_is_stable_across_recompression(self):
+        """Test that re-saving a photo barely changes its hash"""
+        original = make_image()
+        resaved = Image.open(io.BytesIO(encode_jpeg(original, quality=60)))
+        
+        distance = hamming_distance(compute_dhash(original), compute_dhash(resaved))
+        self.assertLessEqual(distance, 3)
+    
+    def test_hash_differs_for_different_images(self):
+        """Test that unrelated images are far apart"""
+        distance = hamming_distance(compute_dhash(make_image(1)), compute_dhash(make_image(2)))
+        self.assertGreater(distance, 10)
+    
+    def test_band_fields(self):
+        """Test splitting a hash into indexed bands"""
+        fields = band_fields('0001000200030004')
+        self.assertEqual(fields['perceptual_hash'], '0001000200030004')
+        self.assertEqual(
+            [fields[f'phash_band_{i}'] for i in range(4)],
+            [1, 2, 3, 4]
+        )
+
+
+class NearDuplicateLookupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.effect = create_effect(hidden_prompt='A secret prompt for AI')
+    
+    def _create_upload(self, perceptual_hash, user=None):
+        return ImageUpload.objects.create(
+            user=user or self.user,
+            original_image='uploads/test.jpg',
+            original_filename='test.jpg',
+            file_size=1024,
+            image_width=800,
+            image_height=600,
+            **band_fields(perceptual_hash)
+        )
+    
+    def test_find_near_duplicates(self):
+        """Test that lookups match within the distance and ignore other users"""
+        upload = self._create_upload('ffff0000ffff0000')
+        near = self._create_upload('ffff0000ffff0003')
+        self._create_upload('0000ffff0000ffff')
+        other_user = User.objects.create_user(username='other', password='testpass123')
+        self._create_upload('ffff0000ffff0000', user=other_user)
+        
+        matches = find_near_duplicates(upload)
+        
+        self.assertEqual([(d, u.id) for d, u in matches], [(2, near.id)])
+    
+    def test_distance_is_capped_at_indexed_range(self):
+        """Test that distances beyond what the band index covers never match"""
+        upload = self._create_upload('ffff0000ffff0000')
+        self._create_upload('ffff0000ffff000f')
+        
+        self.assertEqual(find_near_duplicates(upload, max_distance=64), [])
+    
+    def test_anonymous_uploads_are_not_pooled(self):
+        """Test that anonymous uploads never match each other's uploads"""
+        earlier = self._create_upload('ffff0000ffff0000')
+        upload = self._create_upload('ffff0000ffff0000')
+        ImageUpload.objects.filter(id__in=[earlier.id, upload.id]).update(user=None)
+        upload.refresh_from_db()
+        
+        self.assertEqual(find_near_duplicates(upload), [])
+    
+    def test_apply_effect_reuses_earlier_result(self):
+        """Test that a near-duplicate upload reuses a completed result"""
+        self.client.force_authenticate(user=self.user)
+        earlier_upload = self._create_upload('ffff0000ffff0000')
+        earlier = ProcessedImage.objects.create(
+            original_upload=earlier_upload,
+            effect_applied=self.effect,
+            user=self.user,
+            processed_image='processed/earlier.png',
+            status='completed'
+        )
+        upload = self._create_upload('ffff0000ffff0001')
+        
+        response = self.client.post(
+            f'/api/images/images/{upload.id}/apply_effect/',
+            {'effect_id': str(self.effect.id)},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], str(earlier.id))
+        self.assertTrue(response.data['reused'])
+        self.assertEqual(ProcessedImage.objects.count(), 1)
+
+
+class UploadHashTest(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+    
+    def test_upload_stores_perceptual_hash(self):
+        """Test that the upload endpoint records the hash and its bands"""
+        image = make_image()
+        
+        response = self.client.post(
+            '/api/images/images/',
+            {'image': SimpleUploadedFile('photo.jpg', encode_jpeg(image), content_type='image/jpeg')},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = ImageUpload.objects.get(id=response.data['id'])
+        self.assertEqual(len(upload.perceptual_hash), 16)
+        self.assertIsNotNone(upload.phash_band_0)
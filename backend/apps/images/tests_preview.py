@@ -0,0 +1,141 @@
+import io
+from PIL import Image
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from unittest.mock import patch
+from .models import ImageUpload, ProcessedImage
+from .services import GeminiImageProcessor
+from .test_utils import create_effect, jpeg_file
+from .views import build_processing_params
+
+
+@override_settings(PREVIEW_RESOLUTION='512x512')
+class PreviewModeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.effect = create_effect(hidden_prompt='A secret prompt for AI', max_resolution='2048x2048')
+        self.upload = ImageUpload.objects.create(
+            user=self.user,
+            original_image='uploads/test.jpg',
+            original_filename='test.jpg',
+            file_size=1024,
+            image_width=800,
+            image_height=600
+        )
+    
+    def test_build_processing_params(self):
+        """Test that previews use the preview resolution and keep the full one"""
+        params = build_processing_params(self.effect, preview=True)
+        
+        self.assertTrue(params['preview'])
+        self.assertEqual(params['resolution'], '512x512')
+        self.assertEqual(params['full_resolution'], '2048x2048')
+        self.assertEqual(params['effect_prompt'], 'A secret prompt for AI')
+    
+    @patch('apps.images.views.submit_job')
+    def test_apply_effect_preview(self, mock_submit):
+        """Test that a preview job is recorded with preview settings"""
+        response = self.client.post(
+            f'/api/images/images/{self.upload.id}/apply_effect/',
+            {'effect_id': str(self.effect.id), 'preview': 'true'},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['is_preview'])
+        processed = ProcessedImage.objects.get(id=response.data['id'])
+        self.assertEqual(processed.processing_params['resolution'], '512x512')
+        mock_submit.assert_called_once()
+    
+    @patch('apps.images.views_processed.submit_job')
+    def test_finalize_reuses_preview_settings(self, mock_submit):
+        """Test that finalizing renders at full resolution with the same prompt"""
+        params = build_processing_params(self.effect, preview=True)
+        params['effect_prompt'] = 'Prompt at preview time'
+        preview = ProcessedImage.objects.create(
+            original_upload=self.upload,
+            effect_applied=self.effect,
+            user=self.user,
+            status='completed',
+            is_preview=True,
+            processing_params=params
+        )
+        
+        response = self.client.post(f'/api/images/processed_images/{preview.id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(response.data['is_preview'])
+        final = ProcessedImage.objects.get(id=response.data['id'])
+        self.assertEqual(final.processing_params['resolution'], '2048x2048')
+        self.assertEqual(final.processing_params['effect_prompt'], 'Prompt at preview time')
+        self.assertEqual(final.processing_params['preview_id'], str(preview.id))
+    
+    @patch('apps.images.views_processed.submit_job')
+    def test_finalize_is_limited_to_own_previews(self, mock_submit):
+        """Test that another user's preview cannot be finalized"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        preview = ProcessedImage.objects.create(
+            original_upload=self.upload,
+            effect_applied=self.effect,
+            user=other,
+            status='completed',
+            is_preview=True,
+            processing_params=build_processing_params(self.effect, preview=True)
+        )
+        
+        response = self.client.post(f'/api/images/processed_images/{preview.id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        mock_submit.assert_not_called()
+        self.assertEqual(ProcessedImage.objects.count(), 1)
+    
+    def test_finalize_rejects_full_renders(self):
+        """Test that only previews can be finalized"""
+        processed = ProcessedImage.objects.create(
+            original_upload=self.upload,
+            effect_applied=self.effect,
+            user=self.user,
+            status='completed'
+        )
+        
+        response = self.client.post(f'/api/images/processed_images/{processed.id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PreviewProcessingTest(TestCase):
+    @override_settings(GEMINI_API_KEY=None)
+    def test_preview_prompt_is_lighter(self):
+        """Test that previews send a shorter prompt"""
+        processor = GeminiImageProcessor()
+        full = processor.process_image(jpeg_file((64, 64)), 'Make it pop', 0.7, True)
+        preview = processor.process_image(jpeg_file((64, 64)), 'Make it pop', 0.7, True, preview=True)
+        
+        self.assertIn('Make it pop', preview['enhanced_prompt'])
+        self.assertLess(len(preview['enhanced_prompt']), len(full['enhanced_prompt']))
+    
+    @override_settings(GEMINI_API_KEY=None)
+    def test_read_image_downscales_to_working_resolution(self):
+        """Test that large images are downscaled before being sent"""
+        processor = GeminiImageProcessor()
+        
+        image_bytes, mime_type = processor._read_image(jpeg_file((2000, 1000)), '512x512')
+        
+        self.assertEqual(mime_type, 'image/jpeg')
+        self.assertEqual(Image.open(io.BytesIO(image_bytes)).size, (512, 256))
+    
+    @override_settings(GEMINI_API_KEY=None)
+    def test_read_image_keeps_small_images(self):
+        """Test that images within the resolution are sent untouched"""
+        source = jpeg_file((300, 200))
+        processor = GeminiImageProcessor()
+        
+        image_bytes, _ = processor._read_image(source, '512x512')
+        
+        self.assertEqual(image_bytes, source.getvalue())
@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from .models import ImageUpload, ProcessedImage
+from . import profiling
+
+
+@override_settings(PROFILING_ALLOW_HEADER=False, PROFILING_SAMPLE_RATE=0.0)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        profiling.clear_reports()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        effect = Effect.objects.create(
+            name='Test Effect',
+            slug='test-effect',
+            category=category,
+            user_description='A test effect',
+            hidden_prompt='A secret prompt'
+        )
+        for _ in range(3):
+            upload = ImageUpload.objects.create(
+                original_image='uploads/test.jpg',
+                original_filename='test.jpg',
+                file_size=1024,
+                image_width=800,
+                image_height=600
+            )
+            ProcessedImage.objects.create(original_upload=upload, effect_applied=effect)
+    
+    def test_requests_are_not_profiled_by_default(self):
+        """Test that profiling is opt-in"""
+        response = self.client.get('/api/images/processed_images/', HTTP_X_PROFILE='1')
+        
+        self.assertNotIn('X-SQL-Queries', response)
+        self.assertEqual(profiling.get_reports(), [])
+    
+    def test_staff_header_captures_queries(self):
+        """Test that a sampled request reports its queries in headers and the buffer"""
+        self.client.login(username='admin', password='testpass123')
+        
+        response = self.client.get('/api/images/processed_images/', HTTP_X_PROFILE='1')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(int(response['X-SQL-Queries']), 0)
+        report = profiling.get_report(response['X-Profile-Id'])
+        self.assertEqual(report['path'], '/api/images/processed_images/')
+        self.assertIsNone(report['profile'])
+    
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampling_and_cprofile(self):
+        """Test sampled requests and the admin report views"""
+        self.client.login(username='admin', password='testpass123')
+        self.client.get('/api/effects/categories/')
+        
+        response = self.client.get('/api/effects/effects/', HTTP_X_PROFILE='cprofile')
+        report_id = response['X-Profile-Id']
+        
+        listing = self.client.get('/profiling/', HTTP_X_PROFILE='')
+        self.assertEqual(listing.status_code, status.HTTP_200_OK)
+        self.assertIn(report_id, [report['id'] for report in listing.data])
+        detail = self.client.get(f'/profiling/{report_id}/')
+        self.assertIn('cumulative', detail.data['profile'])
+    
+    def test_reports_require_admin(self):
+        """Test that profile reports are not public"""
+        response = self.client.get('/profiling/')
+        
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
@@ -0,0 +1,184 @@
+import threading
+from unittest.mock import patch
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from apps.users.models import UserProfile
+from .models import ImageUpload, ProcessedImage, UserUsage
+from . import quota
+
+
+@override_settings(FREE_MONTHLY_EFFECTS=5, FREE_MONTHLY_PREVIEWS=3)
+class QuotaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        self.effect = Effect.objects.create(
+            name='Test Effect', slug='test-effect', category=category,
+            user_description='A test effect', hidden_prompt='A secret prompt'
+        )
+        self.premium_effect = Effect.objects.create(
+            name='Premium Effect', slug='premium-effect', category=category,
+            user_description='A premium effect', hidden_prompt='A premium prompt', is_premium=True
+        )
+    
+    def test_free_limit_is_enforced(self):
+        """Test that a free user gets exactly five reservations"""
+        reservations = [quota.reserve(self.user, self.effect) for _ in range(6)]
+        
+        self.assertTrue(all(reservations[:5]))
+        self.assertIsNone(reservations[5])
+        self.assertFalse(quota.check(self.user, self.effect))
+    
+    def test_concurrent_reservations_do_not_exceed_limit(self):
+        """Test that racing requests cannot overshoot the free limit"""
+        quota.effects_used(self.user)
+        quota.is_premium_user(self.user)
+        results = []
+        barrier = threading.Barrier(20)
+        
+        def reserve():
+            barrier.wait()
+            results.append(quota.reserve(self.user, self.effect))
+        
+        threads = [threading.Thread(target=reserve) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len([result for result in results if result]), 5)
+        self.assertEqual(quota.effects_used(self.user), 5)
+    
+    def test_release_and_commit(self):
+        """Test that failed jobs give their slot back and successes are written through"""
+        failed = quota.reserve(self.user, self.effect)
+        kept = quota.reserve(self.user, self.premium_effect)
+        self.assertIsNone(kept)  # free users cannot use premium effects
+        kept = quota.reserve(self.user, self.effect)
+        
+        quota.release(failed)
+        quota.commit(kept)
+        quota.commit(kept)
+        
+        self.assertEqual(quota.effects_used(self.user), 1)
+        usage = UserUsage.objects.get(user=self.user)
+        self.assertEqual(usage.effects_used, 2)
+    
+    def test_counter_is_seeded_from_usage(self):
+        """Test that a cold cache starts from the stored usage"""
+        UserUsage.objects.create(user=self.user, month=quota.current_month(), effects_used=4)
+        
+        self.assertIsNotNone(quota.reserve(self.user, self.effect))
+        self.assertIsNone(quota.reserve(self.user, self.effect))
+    
+    def test_reseeding_keeps_in_flight_reservations(self):
+        """Test that an expired counter still counts jobs that hold a reservation"""
+        upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        for _ in range(2):
+            ProcessedImage.objects.create(
+                original_upload=upload, effect_applied=self.effect, user=self.user, status='processing',
+                processing_params={'quota_reservation': quota.reserve(self.user, self.effect)}
+            )
+        ProcessedImage.objects.create(
+            original_upload=upload, effect_applied=self.effect, user=self.user, status='processing',
+            is_preview=True, processing_params={'quota_reservation': None}
+        )
+        UserUsage.objects.create(user=self.user, month=quota.current_month(), effects_used=1)
+        
+        cache.clear()
+        
+        self.assertEqual(quota.effects_used(self.user), 3)
+    
+    def test_previews_use_their_own_allowance(self):
+        """Test that previews are limited separately and never reach UserUsage"""
+        previews = [quota.reserve(self.user, self.effect, preview=True) for _ in range(4)]
+        
+        self.assertTrue(all(previews[:3]))
+        self.assertIsNone(previews[3])
+        self.assertTrue(previews[0]['preview'])
+        self.assertEqual(quota.effects_used(self.user), 0)
+        quota.commit(previews[0])
+        self.assertFalse(UserUsage.objects.exists())
+        quota.release(previews[1])
+        self.assertIsNotNone(quota.reserve(self.user, self.effect, preview=True))
+    
+    def test_preview_counter_is_seeded_from_previews(self):
+        """Test that a cold cache counts this month's previews that did not fail"""
+        upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        for preview_status in ('completed', 'processing', 'failed'):
+            ProcessedImage.objects.create(
+                original_upload=upload, effect_applied=self.effect, user=self.user,
+                status=preview_status, is_preview=True
+            )
+        
+        self.assertIsNotNone(quota.reserve(self.user, self.effect, preview=True))
+        self.assertIsNone(quota.reserve(self.user, self.effect, preview=True))
+    
+    def test_reservations_refresh_the_expiry(self):
+        """Test that reserving pushes the counter's expiry out again"""
+        quota.reserve(self.user, self.effect)
+        
+        with patch.object(cache, 'touch', wraps=cache.touch) as mock_touch:
+            quota.reserve(self.user, self.effect)
+        
+        mock_touch.assert_called_once()
+    
+    def test_premium_tier_is_looked_up_once(self):
+        """Test that the profile is read once and premium users are not limited"""
+        UserProfile.objects.create(user=self.user, is_premium=True, subscription_tier='premium')
+        quota.reserve(self.user, self.premium_effect)
+        
+        with self.assertNumQueries(0):
+            reservations = [quota.reserve(self.user, self.premium_effect) for _ in range(10)]
+        
+        self.assertTrue(all(reservations))
+        self.assertTrue(reservations[0]['premium_effect'])
+    
+    @patch('apps.images.views.submit_job')
+    def test_apply_effect_reserves_quota(self, mock_submit):
+        """Test that submitting a job reserves a slot and the limit returns 403"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        UserUsage.objects.create(user=self.user, month=quota.current_month(), effects_used=4)
+        url = f'/api/images/images/{upload.id}/apply_effect/'
+        
+        first = client.post(url, {'effect_id': str(self.effect.id), 'force': 'true'}, format='multipart')
+        second = client.post(url, {'effect_id': str(self.effect.id), 'force': 'true'}, format='multipart')
+        
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_403_FORBIDDEN)
+        params = mock_submit.call_args[0][5]
+        self.assertEqual(params['quota_reservation']['user_id'], self.user.pk)
+    
+    @patch('apps.images.views.submit_job')
+    def test_apply_effect_limits_previews(self, mock_submit):
+        """Test that previews reserve from the preview allowance and the limit returns 403"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        upload = ImageUpload.objects.create(
+            user=self.user, original_image='uploads/test.jpg', original_filename='test.jpg',
+            file_size=1024, image_width=800, image_height=600
+        )
+        url = f'/api/images/images/{upload.id}/apply_effect/'
+        
+        responses = [client.post(url, {'effect_id': str(self.effect.id), 'preview': 'true'}, format='multipart')
+                     for _ in range(4)]
+        
+        self.assertEqual([response.status_code for response in responses], [202, 202, 202, 403])
+        self.assertTrue(mock_submit.call_args[0][5]['quota_reservation']['preview'])
+        self.assertEqual(quota.effects_used(self.user), 0)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import router
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from apps.effects.models import Effect, EffectCategory
+from .models import ReplicationHeartbeat
+from .replicas import PIN_COOKIE, ReplicaReadsMixin, heartbeat_lag, lag_monitor, replica_reads
+from . import metrics
+
+
+class RoutingView(ReplicaReadsMixin, APIView):
+    """Reports the database its reads are routed to"""
+    
+    def get(self, request):
+        return Response({'db': router.db_for_read(Effect)})
+    
+    def post(self, request):
+        EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        return Response({'db': router.db_for_read(Effect)})
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        patcher = patch.object(lag_monitor, 'lags', return_value={'replica_1': 0.0})
+        self.lags = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_read_only_request_uses_replica(self):
+        """Test that GET requests read from a replica"""
+        response = RoutingView.as_view()(self.factory.get('/'))
+        
+        self.assertEqual(response.data['db'], 'replica_1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+    
+    def test_write_pins_client_to_primary(self):
+        """Test that a write reads its own result and pins the client to the primary"""
+        response = RoutingView.as_view()(self.factory.post('/'))
+        
+        self.assertEqual(response.data['db'], 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(RoutingView.as_view()(request).data['db'], 'default')
+    
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Test that a replica behind REPLICA_MAX_LAG_SECONDS is not used"""
+        self.lags.return_value = {'replica_1': 30.0}
+        before = metrics.REPLICA_FALLBACKS.value(reason='lag')
+        
+        with override_settings(REPLICA_MAX_LAG_SECONDS=10):
+            response = RoutingView.as_view()(self.factory.get('/'))
+        
+        self.assertEqual(response.data['db'], 'default')
+        self.assertEqual(metrics.REPLICA_FALLBACKS.value(reason='lag'), before + 1)
+    
+    def test_reads_outside_requests_use_primary(self):
+        """Test that background jobs never read from a replica"""
+        self.assertEqual(router.db_for_read(Effect), 'default')
+        with replica_reads(False):
+            self.assertEqual(router.db_for_read(Effect), 'default')
+    
+    def test_writes_always_use_primary(self):
+        """Test that writes go to the primary even in read-only contexts"""
+        with replica_reads(True):
+            self.assertEqual(router.db_for_write(Effect), 'default')
+            # And later reads in the same context see the write
+            self.assertEqual(router.db_for_read(Effect), 'default')
+
+
+class LagMonitorTest(TestCase):
+    def setUp(self):
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+    
+    def test_heartbeat_lag(self):
+        """Test lag from primary and replica heartbeats"""
+        now = timezone.now()
+        
+        self.assertEqual(heartbeat_lag(now, now), 0.0)
+        self.assertEqual(heartbeat_lag(None, now), 0.0)
+        self.assertEqual(heartbeat_lag(now, now - timedelta(seconds=12)), 12.0)
+        self.assertIsNone(heartbeat_lag(now, None))
+        self.assertEqual(heartbeat_lag(None, None), 0.0)
+    
+    @override_settings(DATABASE_REPLICAS=['default'], REPLICA_LAG_CHECK_INTERVAL=60)
+    def test_check_advances_primary_heartbeat(self):
+        """Test that checking lag touches the primary heartbeat once per interval"""
+        self.assertEqual(lag_monitor.lags(), {'default': 0.0})
+        beat = ReplicationHeartbeat.objects.get(pk=1).beat_at
+        
+        lag_monitor.lags()
+        self.assertEqual(ReplicationHeartbeat.objects.get(pk=1).beat_at, beat)
+    
+    @override_settings(DATABASE_REPLICAS=['missing'])
+    def test_unreadable_replica_is_unhealthy(self):
+        """Test that a replica that cannot be read is skipped"""
+        self.assertEqual(lag_monitor.lags(), {'missing': None})
+        self.assertEqual(lag_monitor.healthy(), [])
@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import io
+import os
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import ImageUpload, UploadSession
+from .resumable import ChunkError, append_chunk, session_path
+from .test_utils import jpeg_bytes, use_temp_media_root
+
+CHUNK_TYPE = 'application/offset+octet-stream'
+
+
+def sha256_header(data):
+    return 'sha256 ' + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+class ResumableUploadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.session_dir = os.path.join(use_temp_media_root(self), 'sessions')
+        settings_override = override_settings(UPLOAD_SESSION_DIR=self.session_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.data = jpeg_bytes((300, 200), quality=95)
+    
+    def start(self, size=None):
+        response = self.client.post('/api/images/upload_sessions/',
+                                    {'filename': 'large.jpg', 'size': size or len(self.data)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+    
+    def send(self, session_id, offset, chunk, checksum=True):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = sha256_header(chunk)
+        return self.client.patch(f'/api/images/upload_sessions/{session_id}/', chunk,
+                                 content_type=CHUNK_TYPE, **headers)
+    
+    def test_chunked_upload_is_finalized(self):
+        """Test that chunks sent in order assemble into an image upload"""
+        session_id = self.start()
+        middle = len(self.data) // 2
+        
+        first = self.send(session_id, 0, self.data[:middle])
+        self.assertEqual(first.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(first['Upload-Offset'], str(middle))
+        self.send(session_id, middle, self.data[middle:])
+        
+        response = self.client.post(f'/api/images/upload_sessions/{session_id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = ImageUpload.objects.get(id=response.data['id'])
+        self.assertEqual(upload.user, self.user)
+        self.assertEqual((upload.image_width, upload.image_height), (300, 200))
+        self.assertEqual(upload.original_filename, 'large.jpg')
+        self.assertEqual(len(upload.perceptual_hash), 16)
+        with upload.original_image.open('rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+        # The assembled file was moved into storage
+        self.assertFalse(os.path.exists(session_path(UploadSession.objects.get(id=session_id))))
+    
+    def test_resume_after_interrupted_chunk(self):
+        """Test that a client resumes from the offset the server reports"""
+        session_id = self.start()
+        # A chunk without a checksum that was cut off after 100 bytes
+        self.send(session_id, 0, self.data[:100], checksum=False)
+        
+        head = self.client.head(f'/api/images/upload_sessions/{session_id}/')
+        self.assertEqual(head['Upload-Offset'], '100')
+        self.assertEqual(head['Tus-Resumable'], '1.0.0')
+        
+        response = self.send(session_id, 100, self.data[100:])
+        self.assertEqual(response['Upload-Offset'], str(len(self.data)))
+        self.assertEqual(
+            self.client.post(f'/api/images/upload_sessions/{session_id}/finalize/').status_code,
+            status.HTTP_201_CREATED
+        )
+    
+    def test_checksum_mismatch_discards_chunk(self):
+        """Test that a corrupted chunk is rejected and not appended"""
+        session_id = self.start()
+        chunk = self.data[:500]
+        
+        response = self.client.patch(
+            f'/api/images/upload_sessions/{session_id}/', b'x' * 500, content_type=CHUNK_TYPE,
+            HTTP_UPLOAD_OFFSET='0', HTTP_UPLOAD_CHECKSUM=sha256_header(chunk)
+        )
+        
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertEqual(os.path.getsize(session_path(UploadSession.objects.get(id=session_id))), 0)
+    
+    def test_wrong_offset_conflicts(self):
+        """Test that a chunk at the wrong offset is refused"""
+        session_id = self.start()
+        self.send(session_id, 0, self.data[:100])
+        
+        response = self.send(session_id, 0, self.data[:100])
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '100')
+    
+    def test_losing_duplicate_chunk_keeps_committed_bytes(self):
+        """Test that a racing request that loses the offset does not touch the file"""
+        session_id = self.start()
+        stale = UploadSession.objects.get(id=session_id)
+        self.send(session_id, 0, self.data[:200])
+        
+        # A request that read the session before the first chunk committed
+        with self.assertRaises(ChunkError) as raised:
+            append_chunk(stale, io.BytesIO(b'x' * 100), 0, 100)
+        
+        self.assertEqual(raised.exception.status, status.HTTP_409_CONFLICT)
+        with open(session_path(stale), 'rb') as part:
+            self.assertEqual(part.read(), self.data[:200])
+        self.assertEqual(UploadSession.objects.get(id=session_id).offset, 200)
+    
+    def test_chunk_without_content_length_is_refused(self):
+        """Test that a chunked-transfer PATCH is rejected instead of appending nothing"""
+        session_id = self.start()
+        
+        response = self.client.patch(f'/api/images/upload_sessions/{session_id}/', self.data[:100],
+                                     content_type=CHUNK_TYPE, HTTP_UPLOAD_OFFSET='0', CONTENT_LENGTH='')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(id=session_id).offset, 0)
+    
+    def test_incomplete_upload_cannot_be_finalized(self):
+        """Test that finalizing before every byte arrived returns 409"""
+        session_id = self.start()
+        self.send(session_id, 0, self.data[:100])
+        
+        response = self.client.post(f'/api/images/upload_sessions/{session_id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(ImageUpload.objects.count(), 0)
+    
+    def test_invalid_image_is_rejected_on_finalize(self):
+        """Test that a complete upload that is not an image is discarded"""
+        session_id = self.start(size=10)
+        self.send(session_id, 0, b'0123456789')
+        
+        response = self.client.post(f'/api/images/upload_sessions/{session_id}/finalize/')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadSession.objects.filter(id=session_id).exists())
+    
+    def test_sessions_are_private(self):
+        """Test that another user cannot see or write to a session"""
+        session_id = self.start()
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='other', password='testpass123'))
+        
+        self.assertEqual(other.head(f'/api/images/upload_sessions/{session_id}/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+    
+    def test_expired_sessions_are_purged(self):
+        """Test that expired sessions and their files are removed"""
+        session_id = self.start()
+        UploadSession.objects.filter(id=session_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        
+        self.start()
+        
+        self.assertFalse(UploadSession.objects.filter(id=session_id).exists())
+        self.assertEqual(len(os.listdir(self.session_dir)), 1)
+    
+    @override_settings(UPLOAD_SESSION_MAX_SIZE=1024)
+    def test_size_limit(self):
+        """Test that sessions larger than UPLOAD_SESSION_MAX_SIZE are refused"""
+        response = self.client.post('/api/images/upload_sessions/', {'filename': 'a.jpg', 'size': 2048},
+                                    format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
@@ -0,0 +1,181 @@
+import threading
+import time
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from .jobs import Job, JobRunner, _current_job, current_job_checkpointed, job_runner
+from .lifecycle import checkpoint_image_job, drain, requeue_checkpointed
+from .models import ImageUpload, ProcessedImage
+from .test_utils import create_effect, image_upload, use_temp_media_root
+from .views import process_image_task
+
+
+class JobRunnerDrainTest(TestCase):
+    def setUp(self):
+        self.runner = JobRunner(max_workers=1)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+    
+    def test_drain_checkpoints_unfinished_jobs(self):
+        """Test that drain waits for jobs and checkpoints the ones still running or queued"""
+        checkpointed = []
+        seen = {}
+        
+        def blocking_job():
+            self.release.wait(5)
+            seen['checkpointed'] = current_job_checkpointed()
+        
+        self.runner.submit(lambda: None, checkpoint=lambda: checkpointed.append('quick'))
+        time.sleep(0.05)
+        running = self.runner.submit(blocking_job, checkpoint=lambda: checkpointed.append('running'))
+        queued = self.runner.submit(lambda: None, checkpoint=lambda: checkpointed.append('queued'))
+        
+        result = self.runner.drain(timeout=0.1)
+        
+        self.assertEqual(result, {'finished': 0, 'checkpointed': 2})
+        self.assertEqual(sorted(checkpointed), ['queued', 'running'])
+        self.assertTrue(queued.cancelled())
+        self.assertFalse(self.runner.accepting)
+        
+        # The running job finishes, knowing it was checkpointed
+        self.release.set()
+        running.result(timeout=5)
+        self.assertTrue(seen['checkpointed'])
+        self.assertEqual(self.runner.counts(), {'queued': 0, 'running': 0})
+    
+    def test_join_waits_for_idle_pool(self):
+        """Test that the pool is joined only once no job is running"""
+        running = self.runner.submit(self.release.wait, 5)
+        
+        self.assertFalse(self.runner.join())
+        
+        self.release.set()
+        running.result(timeout=5)
+        self.assertTrue(self.runner.join())
+    
+    def test_jobs_submitted_while_draining_are_checkpointed(self):
+        """Test that a job submitted after the drain started is checkpointed, not run"""
+        self.runner.drain(timeout=0)
+        checkpointed = []
+        
+        future = self.runner.submit(self.fail, checkpoint=lambda: checkpointed.append(True))
+        
+        self.assertIsNone(future)
+        self.assertEqual(checkpointed, [True])
+        self.runner.resume()
+        self.assertTrue(self.runner.accepting)
+
+
+@override_settings(LOCAL_EFFECTS_WORKERS=0, JOB_DRAIN_RETRY_AFTER=7)
+class GracefulShutdownTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.effect = create_effect('sepia', name='Sepia', user_description='Sepia',
+                                    hidden_prompt='Sepia tone', local_filter='sepia')
+        self.upload = ImageUpload.objects.create(
+            user=self.user,
+            original_image=image_upload(),
+            original_filename='photo.jpg', file_size=100, image_width=64, image_height=48
+        )
+    
+    def _processed(self, status_value):
+        return ProcessedImage.objects.create(
+            original_upload=self.upload, effect_applied=self.effect, user=self.user, status=status_value
+        )
+    
+    @patch('apps.images.views.submit_job')
+    def test_new_jobs_get_503_while_draining(self, mock_submit):
+        """Test that job-submitting endpoints answer 503 with Retry-After during a drain"""
+        job_runner.drain(timeout=0)
+        self.addCleanup(job_runner.resume)
+        
+        response = self.client.post(
+            f'/api/images/images/{self.upload.id}/apply_effect/',
+            {'effect_id': str(self.effect.id)},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '7')
+        mock_submit.assert_not_called()
+        self.assertFalse(ProcessedImage.objects.exists())
+        # Reads are still served
+        self.assertEqual(self.client.get('/api/images/images/').status_code, status.HTTP_200_OK)
+    
+    @patch('apps.images.lifecycle.db_writer')
+    @patch('apps.images.lifecycle.job_runner')
+    def test_drain_keeps_writer_for_running_jobs(self, mock_runner, mock_writer):
+        """Test that the writer is stopped only after the job threads have exited"""
+        mock_runner.drain.return_value = {'finished': 0, 'checkpointed': 1}
+        mock_runner.join.return_value = False
+        
+        drain(timeout=0)
+        mock_writer.stop.assert_not_called()
+        
+        mock_runner.join.return_value = True
+        drain(timeout=0)
+        mock_writer.stop.assert_called_once()
+    
+    def test_checkpoint_only_touches_processing_records(self):
+        """Test that checkpointing re-queues a processing record and leaves finished ones alone"""
+        processing = self._processed('processing')
+        completed = self._processed('completed')
+        
+        checkpoint_image_job(processing.id)
+        checkpoint_image_job(completed.id)
+        
+        processing.refresh_from_db()
+        completed.refresh_from_db()
+        self.assertEqual(processing.status, 'queued')
+        self.assertEqual(completed.status, 'completed')
+    
+    @patch('apps.images.lifecycle.submit_job')
+    def test_requeue_claims_queued_jobs(self, mock_submit):
+        """Test that startup re-queueing claims checkpointed jobs and submits them again"""
+        queued = self._processed('queued')
+        self._processed('completed')
+        
+        self.assertEqual(requeue_checkpointed(), 1)
+        
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'processing')
+        mock_submit.assert_called_once()
+        self.assertEqual(mock_submit.call_args[0][1], queued.id)
+        self.assertIn('checkpoint', mock_submit.call_args[1])
+        # A second process finds nothing left to claim
+        self.assertEqual(requeue_checkpointed(), 0)
+    
+    def _run_checkpointed(self, processed):
+        job = Job()
+        job.checkpointed = True
+        token = _current_job.set(job)
+        try:
+            process_image_task(processed.id, self.upload.original_image, self.effect, self.user)
+        finally:
+            _current_job.reset(token)
+    
+    def test_checkpointed_job_keeps_result_when_unclaimed(self):
+        """Test that a checkpointed job finishing before exit reclaims its record"""
+        processed = self._processed('queued')
+        
+        self._run_checkpointed(processed)
+        
+        processed.refresh_from_db()
+        self.assertEqual(processed.status, 'completed')
+    
+    def test_checkpointed_job_drops_result_once_requeued(self):
+        """Test that a checkpointed job does not overwrite a record another process picked up"""
+        processed = self._processed('processing')
+        
+        self._run_checkpointed(processed)
+        
+        processed.refresh_from_db()
+        self.assertEqual(processed.status, 'processing')
+        self.assertFalse(processed.processed_image)
@@ -0,0 +1,65 @@
+import threading
+from django.test import TestCase, override_settings
+from .importtime import deferred_imported, import_seconds, parse_importtime, profile_startup
+from .lazy import LazyModule
+from .services import GeminiImageProcessor, get_gemini_processor
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     json.decoder
+import time:       300 |        420 |   json
+import time:       900 |        900 |   google.generativeai.types
+import time:       500 |       1820 | apps.images.services
+import time:        80 |         80 | site
+"""
+
+
+class ImportTimeTest(TestCase):
+    def test_parse_importtime(self):
+        """Test that -X importtime output is parsed with nesting depth"""
+        records = parse_importtime(IMPORTTIME_OUTPUT)
+        
+        self.assertEqual([record.name for record in records],
+                         ['json.decoder', 'json', 'google.generativeai.types', 'apps.images.services', 'site'])
+        self.assertEqual([record.depth for record in records], [2, 1, 1, 0, 0])
+        self.assertEqual(records[3].self_us, 500)
+        # Only top-level imports count towards the total
+        self.assertAlmostEqual(import_seconds(records), 0.0019)
+        self.assertEqual(deferred_imported(records), ['google.generativeai'])
+    
+    def test_web_startup_does_not_import_the_sdk(self):
+        """Test that setting up the web process leaves the Gemini SDK unimported"""
+        profile = profile_startup('web')
+        
+        self.assertIn('apps.images.services', [record.name for record in profile.records])
+        self.assertEqual(deferred_imported(profile.records), [])
+
+
+class LazyProcessorTest(TestCase):
+    def test_lazy_module_imports_on_first_use(self):
+        """Test that a lazy module is imported only when an attribute is read"""
+        module = LazyModule('json')
+        
+        self.assertFalse(module.loaded)
+        self.assertEqual(module.dumps([1]), '[1]')
+        self.assertTrue(module.loaded)
+    
+    def test_one_processor_per_process(self):
+        """Test that concurrent first use creates a single shared processor"""
+        processors = []
+        threads = [threading.Thread(target=lambda: processors.append(get_gemini_processor())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len({id(processor) for processor in processors}), 1)
+        self.assertIs(processors[0], get_gemini_processor())
+    
+    def test_shared_processor_follows_key_settings(self):
+        """Test that the shared processor switches between mock and live mode with the settings"""
+        processor = GeminiImageProcessor()
+        
+        with override_settings(GEMINI_API_KEY=None, GEMINI_API_KEYS=[]):
+            self.assertIsNone(processor.api_key)
+        with override_settings(GEMINI_API_KEY=None, GEMINI_API_KEYS=['key-a', 'key-b']):
+            self.assertEqual(processor.api_key, 'key-a')
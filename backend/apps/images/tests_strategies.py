@@ -0,0 +1,66 @@
+import io
+from unittest.mock import patch
+from PIL import Image
+from django.test import TestCase, override_settings
+from .services import STRATEGIES, ProcessingStrategy, cap_resolution, get_strategy, register_strategy
+from .test_utils import create_effect, jpeg_file
+from .views import build_processing_params
+
+
+@override_settings(GEMINI_API_KEY='test-key')
+class ProcessingStrategyTest(TestCase):
+    def make_effect(self, slug, **fields):
+        return create_effect(slug, name=slug, **fields)
+    
+    def test_strategy_selection(self):
+        """Test that effects resolve to their declared strategy"""
+        self.assertEqual(get_strategy(self.make_effect('plain')).name, 'standard')
+        self.assertEqual(get_strategy(self.make_effect('center-stage', strategy='center-stage')).name, 'center-stage')
+        self.assertEqual(get_strategy(self.make_effect('sepia', local_filter='sepia')).name, 'local')
+        self.assertEqual(get_strategy(self.make_effect('unknown', strategy='missing')).name, 'standard')
+    
+    def test_cap_resolution(self):
+        """Test that the working resolution caps the effect's resolution"""
+        self.assertEqual(cap_resolution('2048x2048', '1024x1024'), '1024x1024')
+        self.assertEqual(cap_resolution('512x512', '1024x1024'), '512x512')
+        self.assertEqual(cap_resolution('2048x2048', None), '2048x2048')
+    
+    def test_fast_strategy_settings_reach_the_model(self):
+        """Test that the strategy's model, timeout and working resolution are used"""
+        effect = self.make_effect('quick', strategy='fast')
+        params = build_processing_params(effect)
+        
+        with patch('apps.images.services.ImageGenerationClient.edit_image_with_text',
+                   return_value=b'edited') as mock_edit:
+            result = STRATEGIES['fast'].process(jpeg_file((2000, 1500)), effect, params)
+        
+        self.assertTrue(result['success'])
+        image_bytes, prompt, mime_type = mock_edit.call_args[0]
+        self.assertEqual(mock_edit.call_args[1]['timeout'], 60)
+        self.assertEqual(mock_edit.call_args[1]['model'], STRATEGIES['fast'].model)
+        self.assertEqual(Image.open(io.BytesIO(image_bytes)).size, (1024, 768))
+        self.assertEqual(prompt, params['prompt'])
+        self.assertEqual(params['strategy'], 'fast')
+    
+    def test_custom_strategy_with_local_stages(self):
+        """Test a registered strategy with a prompt template and local stages"""
+        register_strategy(ProcessingStrategy(
+            'test-graded', model='test-model', prompt_template='center-stage',
+            preprocess='grayscale', postprocess='sharpen', timeout=5, effect_type='graded'
+        ))
+        self.addCleanup(STRATEGIES.pop, 'test-graded')
+        effect = self.make_effect('graded', strategy='test-graded')
+        params = build_processing_params(effect)
+        edited = jpeg_file((64, 64)).getvalue()
+        
+        with patch('apps.images.services.ImageGenerationClient.edit_image_with_text',
+                   return_value=edited) as mock_edit:
+            result = get_strategy(effect).process(jpeg_file((64, 64)), effect, params)
+        
+        sent = Image.open(io.BytesIO(mock_edit.call_args[0][0])).convert('RGB')
+        red, green, blue = sent.getpixel((32, 32))
+        self.assertLessEqual(max(red, green, blue) - min(red, green, blue), 2)
+        self.assertIn('Focus on the main subject', mock_edit.call_args[0][1])
+        self.assertEqual(result['effect_type'], 'graded')
+        self.assertEqual(result['file_extension'], 'jpg')
+        self.assertNotEqual(result['edited_image_data'], edited)
@@ -0,0 +1,84 @@
+import base64
+import time
+from django.test import TestCase, override_settings
+from unittest.mock import patch, MagicMock
+from .models import ImageUpload, ProcessedImage
+from .gemini_client import ImageGenerationClient
+from .test_utils import create_effect, image_upload, use_temp_media_root
+from .timing import STAGES, StageTimer
+from .views import process_image_task
+
+
+class StageTimerTest(TestCase):
+    def test_stages_accumulate(self):
+        """Test that repeated stages add up and the total covers them"""
+        timer = StageTimer()
+        timer.add('http_request', 0.25)
+        timer.add('http_request', 0.25)
+        with timer.stage('file_read'):
+            pass
+        
+        timings = timer.as_dict()
+        self.assertEqual(timings['http_request'], 500.0)
+        self.assertIn('file_read', timings)
+        self.assertEqual(timer.slowest_stage(), 'http_request')
+
+
+class ClientTimingTest(TestCase):
+    @override_settings(GEMINI_API_KEY='test-api-key')
+    @patch('apps.images.gemini_client.requests.post')
+    def test_edit_image_records_stages(self, mock_post):
+        """Test that the client records encode, request, parse and decode stages"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            'candidates': [{'content': {'parts': [
+                {'inlineData': {'data': base64.b64encode(b'edited').decode()}}
+            ]}}]
+        }
+        mock_post.return_value = mock_response
+        timer = StageTimer()
+        
+        result = ImageGenerationClient().edit_image_with_text(b'image', 'prompt', timer=timer)
+        
+        self.assertEqual(result, b'edited')
+        for stage in ('base64_encode', 'json_encode', 'http_request', 'json_parse', 'base64_decode'):
+            self.assertIn(stage, timer.stages)
+
+
+@override_settings(LOCAL_EFFECTS_WORKERS=0)
+class ProcessImageTaskTimingTest(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.effect = create_effect('sepia', name='Sepia', user_description='Sepia',
+                                    hidden_prompt='Sepia tone', local_filter='sepia')
+        self.upload = ImageUpload.objects.create(
+            original_image=image_upload(),
+            original_filename='photo.jpg',
+            file_size=100,
+            image_width=64,
+            image_height=48
+        )
+    
+    def test_breakdown_is_stored_in_processing_params(self):
+        """Test that every job stores its per-stage breakdown"""
+        processed = ProcessedImage.objects.create(
+            original_upload=self.upload,
+            effect_applied=self.effect,
+            status='processing'
+        )
+        
+        process_image_task(processed.id, self.upload.original_image, self.effect,
+                           submitted_at=time.monotonic() - 0.05)
+        
+        processed.refresh_from_db()
+        self.assertEqual(processed.status, 'completed')
+        timings = processed.processing_params['timings_ms']
+        for stage in ('queue_wait', 'file_read', 'local_render', 'db_read', 'storage_write', 'db_write', 'total'):
+            self.assertIn(stage, timings)
+        # The admin's slowest stage filter offers STAGES
+        self.assertLessEqual(set(timings) - {'total'}, set(STAGES))
+        self.assertGreaterEqual(timings['queue_wait'], 50.0)
+        self.assertEqual(processed.processing_params['slowest_stage'], 'queue_wait')
+        self.assertTrue(
+            ProcessedImage.objects.filter(processing_params__slowest_stage='queue_wait').exists()
+        )
@@ -0,0 +1,137 @@
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.effects.models import EffectCategory, Effect
+from .models import ImageUpload, ProcessedImage
+from .jobs import JobRunner
+from . import tracing
+
+
+class TracingTest(TestCase):
+    def setUp(self):
+        tracing.get_exporter().clear()
+    
+    def test_child_spans_share_the_trace(self):
+        """Test that nested spans link to their parent"""
+        with tracing.start_span('parent') as parent:
+            with tracing.start_span('child') as child:
+                pass
+        
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertIsNone(parent.parent_id)
+        self.assertEqual(len(tracing.get_exporter().get_trace(parent.trace_id)), 2)
+    
+    def test_job_continues_the_request_trace(self):
+        """Test that jobs run in the submitting request's trace"""
+        runner = JobRunner(max_workers=1)
+        
+        def job():
+            with tracing.start_span('job') as span:
+                return span.trace_id, span.parent_id
+        
+        with tracing.start_span('request') as request_span:
+            future = runner.submit(job)
+        
+        self.assertEqual(future.result(5), (request_span.trace_id, request_span.span_id))
+    
+    def test_middleware_continues_traceparent(self):
+        """Test that the middleware returns the trace id and honours traceparent"""
+        trace_id = 'a' * 32
+        
+        response = APIClient().get(
+            '/api/effects/categories/',
+            HTTP_TRACEPARENT=f'00-{trace_id}-{"b" * 16}-01'
+        )
+        
+        self.assertEqual(response['X-Trace-Id'], trace_id)
+        spans = tracing.get_exporter().get_trace(trace_id)
+        self.assertEqual(spans[0]['parent_id'], 'b' * 16)
+        self.assertEqual(spans[0]['attributes']['http.status_code'], 200)
+    
+    def test_jsonl_exporter(self):
+        """Test that spans can be written to and read back from a JSON lines file"""
+        path = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+        exporter = tracing.JsonLinesExporter(path)
+        span = tracing.Span('write', tracing.new_trace_id())
+        span.end()
+        
+        exporter.export(span)
+        
+        self.assertEqual(exporter.get_trace(span.trace_id)[0]['name'], 'write')
+    
+    def test_jsonl_exporter_writes_off_thread(self):
+        """Test that exporting only enqueues spans and a flush writes them all"""
+        path = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+        exporter = tracing.JsonLinesExporter(path, batch_size=10)
+        trace_id = tracing.new_trace_id()
+        for index in range(25):
+            span = tracing.Span(f'span-{index}', trace_id)
+            span.end()
+            exporter.export(span)
+        
+        exporter.flush()
+        
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 25)
+        self.assertEqual(exporter.dropped, 0)
+    
+    def test_jsonl_exporter_drops_spans_when_full(self):
+        """Test that a full export queue drops spans instead of blocking"""
+        exporter = tracing.JsonLinesExporter(os.path.join(tempfile.mkdtemp(), 'traces.jsonl'), maxsize=1)
+        span = tracing.Span('write', tracing.new_trace_id())
+        span.end()
+        
+        # Without a writer thread nothing drains the queue
+        with patch.object(exporter, '_ensure_thread'):
+            exporter.export(span)
+            exporter.export(span)
+        
+        self.assertEqual(exporter.dropped, 1)
+
+
+class ProcessedImageTraceViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        category = EffectCategory.objects.create(name='Looks', slug='looks', description='Looks')
+        effect = Effect.objects.create(
+            name='Test Effect',
+            slug='test-effect',
+            category=category,
+            user_description='A test effect',
+            hidden_prompt='A secret prompt'
+        )
+        upload = ImageUpload.objects.create(
+            original_filename='test.jpg',
+            file_size=1024,
+            image_width=800,
+            image_height=600
+        )
+        with tracing.start_span('POST /apply_effect/') as span:
+            self.trace_id = span.trace_id
+        self.processed = ProcessedImage.objects.create(
+            original_upload=upload,
+            effect_applied=effect,
+            processing_params={'trace_id': self.trace_id}
+        )
+    
+    def test_admin_can_view_trace(self):
+        """Test that spans are viewable per processed image"""
+        self.client.force_authenticate(user=self.admin)
+        
+        response = self.client.get(f'/api/images/processed_images/{self.processed.id}/trace/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['trace_id'], self.trace_id)
+        self.assertEqual(response.data['spans'][0]['name'], 'POST /apply_effect/')
+    
+    def test_trace_requires_admin(self):
+        """Test that traces are not public"""
+        response = self.client.get(f'/api/images/processed_images/{self.processed.id}/trace/')
+        
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
@@ -87,7 +87,7 @@ class ImageUploadViewSetTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
     
-    @patch('apps.images.views.GeminiImageProcessor')
+    @patch('apps.images.services.GeminiImageProcessor')
     def test_apply_effect_success(self, mock_processor):
         """Test successful effect application"""
         self.client.force_authenticate(user=self.user)
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager, nullcontext
+from . import tracing
+
+# Every stage an image job records, in the order they run
+STAGES = (
+    'queue_wait', 'file_open', 'db_read', 'file_read', 'resize', 'preprocess', 'local_render',
+    'base64_encode', 'json_encode', 'http_request', 'json_parse', 'base64_decode', 'postprocess',
+    'storage_write', 'db_write',
+)
+
+
+class StageTimer:
+    """
+    Records how long each stage of an image job takes, using a monotonic clock.
+    Repeated stages accumulate. Each stage is also traced as a span.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with tracing.start_span(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        """Stage durations in milliseconds, plus the total since the timer started"""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        timings['total'] = round(self.elapsed() * 1000, 2)
+        return timings
+
+    def slowest_stage(self):
+        if not self.stages:
+            return ''
+        return max(self.stages, key=self.stages.get)
+
+
+class NullTimer:
+    """Stand-in used when a caller does not pass a timer"""
+
+    def stage(self, name):
+        return nullcontext()
+
+    def add(self, name, seconds):
+        pass
+
+
+NULL_TIMER = NullTimer()
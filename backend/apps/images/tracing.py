@@ -0,0 +1,241 @@
+"""
+Lightweight span tracing for requests and the effect jobs they start.
+
+The current span lives in a ContextVar. The job runner copies the request's
+context into the worker thread, so job spans join the request's trace.
+"""
+import atexit
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+_current_span = ContextVar('current_span', default=None)
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class InMemoryExporter:
+    """Keeps the most recent spans in a bounded buffer"""
+
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+    def get_trace(self, trace_id):
+        return [span for span in list(self.spans) if span['trace_id'] == trace_id]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class JsonLinesExporter:
+    """
+    Appends one JSON object per span to a file.
+
+    export() only enqueues the span; a writer thread encodes queued spans and
+    appends them in batches, so ending a span never waits on the disk.
+    """
+
+    def __init__(self, path, maxsize=10000, batch_size=500):
+        self.path = path
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def export(self, span):
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            # Never block a request on tracing
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name='span-writer', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = ''.join(json.dumps(span.to_dict(), default=str) + '\n' for span in batch)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            except (OSError, ValueError):
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        """Wait until every exported span has been written"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def get_trace(self, trace_id):
+        self.flush()
+        if not os.path.exists(self.path):
+            return []
+        spans = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if trace_id in line:
+                    span = json.loads(line)
+                    if span['trace_id'] == trace_id:
+                        spans.append(span)
+        return spans
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                if getattr(settings, 'TRACING_EXPORTER', 'memory') == 'jsonl':
+                    _exporter = JsonLinesExporter(settings.TRACING_FILE)
+                else:
+                    _exporter = InMemoryExporter(getattr(settings, 'TRACING_MAX_SPANS', 10000))
+    return _exporter
+
+
+def tracing_enabled():
+    return getattr(settings, 'TRACING_ENABLED', True)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_span_id) from a W3C traceparent header, or (None, None)"""
+    match = TRACEPARENT_RE.match((header or '').strip().lower())
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+@contextmanager
+def start_span(name, trace_id=None, parent_id=None, **attributes):
+    """
+    Start a span as a child of the current span, or as the root of a new
+    trace. Yields None when tracing is disabled.
+    """
+    if not tracing_enabled():
+        yield None
+        return
+
+    parent = _current_span.get()
+    if trace_id is None:
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id = new_trace_id()
+
+    span = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.status = 'error'
+        span.set_attribute('error', str(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+        get_exporter().export(span)
+
+
+def set_attribute(key, value):
+    """Set an attribute on the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+class TracingMiddleware:
+    """
+    Opens a root span for every HTTP request and returns its trace id in the
+    X-Trace-Id response header. An incoming traceparent header is continued.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracing_enabled():
+            return self.get_response(request)
+
+        trace_id, parent_id = parse_traceparent(request.headers.get('traceparent'))
+        with start_span(f'{request.method} {request.path}', trace_id=trace_id, parent_id=parent_id,
+                        **{'http.method': request.method, 'http.path': request.path}) as span:
+            response = self.get_response(request)
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = 'error'
+        response['X-Trace-Id'] = span.trace_id
+        return response
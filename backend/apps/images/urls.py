@@ -2,9 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ImageUploadViewSet
 from .views_processed import ProcessedImageViewSet
+from .views_upload_sessions import UploadSessionViewSet
 
 router = DefaultRouter()
 router.register(r'images', ImageUploadViewSet)
 router.register(r'processed_images', ProcessedImageViewSet)
+router.register(r'upload_sessions', UploadSessionViewSet)
 
 urlpatterns = router.urls
\ No newline at end of file
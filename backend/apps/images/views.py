@@ -4,18 +4,214 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from PIL import Image
+from django.conf import settings
+import time
 import uuid
+import logging
+from apps.effects import usage
 from .models import ImageUpload, ProcessedImage
-from .serializers import ImageUploadSerializer, ProcessedImageSerializer
-from .services import GeminiImageProcessor
-from apps.effects.models import Effect
+from .serializers import ImageUploadSerializer, ProcessedImageSerializer, requested_fields, sparse_queryset
+from .services import STRATEGIES, get_strategy
+from .phash import find_near_duplicates
+from .ingest import UploadRejected, inspect_upload, ingest_files
+from .timing import StageTimer
+from .jobs import submit_job
+from .eta import estimate_completion, observe_finished, set_retry_after
+from .db import run_write
+from .idempotency import idempotent
+from .lifecycle import accepting_jobs, job_checkpoint, result_abandoned
+from .pagination import UploadedAtCursorPagination, owned_by
+from .replicas import ReplicaReadsMixin
+from . import quota
+from .effect_registry import effect_registry, compiled_prompts
+from .structured_logging import bind, log_event
+from . import metrics
+from . import tracing
 
-class ImageUploadViewSet(viewsets.ModelViewSet):
+logger = logging.getLogger(__name__)
+
+# Simulated extra processing time of process_async, in seconds
+ASYNC_DEMO_DELAY = 5
+
+def build_processing_params(effect, preview=False):
+    """
+    Snapshot the prompt and settings a job renders with, so a preview can
+    later be finalized with exactly the same inputs
+    """
+    prompt, preview_prompt = compiled_prompts(effect)
+    strategy = get_strategy(effect)
+    return {
+        'preview': preview,
+        'resolution': settings.PREVIEW_RESOLUTION if preview else effect.max_resolution,
+        'full_resolution': effect.max_resolution,
+        'effect_prompt': effect.hidden_prompt,
+        'strength': effect.strength,
+        'preserve_faces': effect.preserve_faces,
+        'strategy': strategy.name,
+        'model': strategy.model,
+        'prompt': prompt,
+        'preview_prompt': preview_prompt,
+        'effect_version': getattr(effect, 'version', None) or effect.updated_at.isoformat(),
+        'trace_id': tracing.current_trace_id(),
+    }
+
+
+def process_image_task(processed_id, upload_file, effect_obj, user=None, params=None, submitted_at=None):
+    """
+    Background job: run the effect and store the result on the ProcessedImage
+    
+    submitted_at is the time.monotonic() value when the job was queued; the
+    per-stage timing breakdown is stored in processing_params['timings_ms'].
+    The job is traced as a child of the request that submitted it.
+    """
+    # Jobs started outside the submitting request (e.g. re-queued ones)
+    # rejoin the trace recorded on the job
+    trace_id = None
+    if tracing.current_span() is None and params:
+        trace_id = params.get('trace_id')
+    
+    with tracing.start_span('process_image_task', trace_id=trace_id,
+                            processed_id=str(processed_id), effect=effect_obj.slug), \
+            bind(job_id=str(processed_id), effect=effect_obj.slug):
+        _run_image_task(processed_id, upload_file, effect_obj, user, params, submitted_at)
+
+
+def _run_image_task(processed_id, upload_file, effect_obj, user, params, submitted_at):
+    timer = StageTimer()
+    if submitted_at is not None:
+        timer.add('queue_wait', max(time.monotonic() - submitted_at, 0.0))
+    
+    params = params or build_processing_params(effect_obj)
+    preview = params.get('preview', False)
+    resolution = params.get('resolution', effect_obj.max_resolution)
+    # The strategy recorded at submission, so finalized previews match
+    strategy = STRATEGIES.get(params.get('strategy')) or get_strategy(effect_obj)
+    
+    try:
+        # Reset file pointer before processing
+        with timer.stage('file_open'):
+            upload_file.file.seek(0)
+        
+        # The effect's strategy picks the model, working resolution,
+        # prompt template, local stages and timeout
+        with tracing.start_span(f'strategy.{strategy.name}', preview=preview, resolution=resolution,
+                                model=strategy.model):
+            result = strategy.process(upload_file.file, effect_obj, params, timer=timer)
+        
+        # Update the processed image record
+        with timer.stage('db_read'):
+            processed_record = ProcessedImage.objects.get(id=processed_id)
+        if result['success']:
+            processed_record.status = 'completed'
+            processed_record.processing_time = result['processing_time']
+            processed_record.gemini_response_data = {
+                'response': result['gemini_response'],
+                'prompt_used': result['enhanced_prompt'],
+                'effect_type': result.get('effect_type', 'standard')
+            }
+            if result.get('image_analysis'):
+                processed_record.gemini_response_data['image_analysis'] = result['image_analysis']
+            
+            # Save the processed image if available
+            if 'edited_image_data' in result and result['edited_image_data']:
+                image_data = result['edited_image_data']
+                filename = f"processed_{processed_id}.{result.get('file_extension', 'png')}"
+                with timer.stage('storage_write'):
+                    processed_record.processed_image.save(
+                        filename,
+                        ContentFile(image_data),
+                        save=False
+                    )
+        else:
+            processed_record.status = 'failed'
+            processed_record.error_message = result['error']
+        
+        # A job checkpointed by a shutdown drain keeps its result only if no
+        # other process has picked it up again
+        if result_abandoned(processed_id):
+            return
+        
+        def write_result():
+            with timer.stage('db_write'):
+                processed_record.save()
+                # The quota slot reserved at submission is kept only on success
+                if result['success']:
+                    quota.commit(params.get('quota_reservation'))
+                # Previews are not counted towards trending
+                if not preview:
+                    usage.record_job(effect_obj.id, result['success'], result.get('processing_time', 0.0))
+            # The stored breakdown includes the write above, so it is added after it
+            ProcessedImage.objects.filter(id=processed_id).update(processing_params=record_timings(params, timer))
+        
+        # On SQLite, job writes are committed by the serialized writer
+        with tracing.start_span('processed_image.save', status=processed_record.status):
+            run_write(write_result)
+        if result['success']:
+            observe_finished(processed_record, preview, timer.elapsed())
+        else:
+            quota.release(params.get('quota_reservation'))
+        metrics.observe_job(timer, 'completed' if result['success'] else 'failed', result.get('effect_type', 'standard'),
+                            strategy.name)
+        if result['success']:
+            log_event(logger, 'job.completed', sampled=True, latency_ms=round(timer.elapsed() * 1000, 3),
+                      slowest_stage=timer.slowest_stage(), preview=preview)
+        else:
+            log_event(logger, 'job.failed', logging.WARNING, latency_ms=round(timer.elapsed() * 1000, 3),
+                      error=result['error'], preview=preview)
+    except Exception as e:
+        if result_abandoned(processed_id):
+            return
+        
+        # Update the processed image record with error
+        def mark_failed():
+            if ProcessedImage.objects.filter(id=processed_id).update(
+                status='failed',
+                error_message=str(e),
+                processing_params=record_timings(params, timer)
+            ):
+                metrics.PROCESSED_IMAGE_STATUS.inc(status='failed')
+            if not preview:
+                usage.record_job(effect_obj.id, False, timer.elapsed())
+        
+        # A record deleted meanwhile simply updates no rows
+        run_write(mark_failed)
+        quota.release(params.get('quota_reservation'))
+        metrics.observe_job(timer, 'error', 'unknown', strategy.name)
+        log_event(logger, 'job.error', logging.ERROR, exc_info=True,
+                  latency_ms=round(timer.elapsed() * 1000, 3))
+
+
+def record_timings(params, timer):
+    """Merge a job's stage timings into its processing params"""
+    return {
+        **params,
+        'timings_ms': timer.as_dict(),
+        'slowest_stage': timer.slowest_stage(),
+    }
+
+
+class ImageUploadViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = ImageUpload.objects.all()
     serializer_class = ImageUploadSerializer
+    pagination_class = UploadedAtCursorPagination
     parser_classes = (MultiPartParser, FormParser)
     
+    def get_queryset(self):
+        """Listings show the requester's own uploads, with ?fields= column pruning"""
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = owned_by(queryset, self.request.user)
+        if self.action in ('list', 'retrieve'):
+            fields = requested_fields(self.request)
+            if fields is not None:
+                queryset = sparse_queryset(queryset, ImageUploadSerializer, fields, always=('uploaded_at',))
+            else:
+                # Hash bands are only used for near-duplicate lookups
+                queryset = queryset.defer('perceptual_hash', 'phash_band_0', 'phash_band_1',
+                                          'phash_band_2', 'phash_band_3')
+        return queryset
+    
+    @idempotent
     def create(self, request):
         """
         Upload image endpoint
@@ -23,44 +219,105 @@ class ImageUploadViewSet(viewsets.ModelViewSet):
         try:
             uploaded_file = request.FILES['image']
             
-            # Validate file
-            if not self._is_valid_image(uploaded_file):
+            # Validate the file and read its dimensions and perceptual hash
+            try:
+                fields = inspect_upload(uploaded_file)
+            except UploadRejected as e:
+                metrics.UPLOADS.inc(outcome='rejected')
                 return Response({
-                    'error': 'Invalid image file. Please upload JPEG, PNG, or WebP.'
+                    'error': str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get image dimensions
-            # We need to reset the file pointer after validation
-            uploaded_file.seek(0)
-            image = Image.open(uploaded_file)
-            width, height = image.size
-            
-            # Reset the file pointer again before saving
-            uploaded_file.seek(0)
-            
             # Create upload record
             upload = ImageUpload.objects.create(
                 user=request.user if request.user.is_authenticated else None,
                 original_image=uploaded_file,
-                original_filename=uploaded_file.name,
-                file_size=uploaded_file.size,
-                image_width=width,
-                image_height=height
+                **fields
             )
             
+            metrics.UPLOADS.inc(outcome='accepted')
+            metrics.UPLOAD_BYTES.inc(uploaded_file.size)
+            
             serializer = self.get_serializer(upload)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
+            metrics.UPLOADS.inc(outcome='error')
+            log_event(logger, 'upload.error', logging.ERROR, exc_info=True)
             return Response({
                 'error': f'Upload failed: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """
+        Upload several images in one request (repeated `images` parts).
+        Files are validated, hashed and stored in parallel and inserted with
+        one bulk_create; the response has a result for every file.
+        """
+        files = request.FILES.getlist('images')
+        if not files:
+            return Response({
+                'error': 'images is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+            return Response({
+                'error': f'At most {settings.UPLOAD_BATCH_MAX_FILES} images can be uploaded at once'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        user = request.user if request.user.is_authenticated else None
+        results = []
+        uploads = []
+        for index, (uploaded_file, (fields, error)) in enumerate(zip(files, ingest_files(files))):
+            if error is not None:
+                metrics.UPLOADS.inc(outcome='rejected')
+                results.append({'index': index, 'filename': uploaded_file.name, 'status': 'rejected', 'error': error})
+            else:
+                uploads.append(ImageUpload(user=user, **fields))
+                results.append(None)
+        
+        try:
+            ImageUpload.objects.bulk_create(uploads)
+        except Exception:
+            # Nothing was inserted; don't leave the stored files behind
+            for upload in uploads:
+                default_storage.delete(upload.original_image.name)
+            metrics.UPLOADS.inc(len(uploads), outcome='error')
+            log_event(logger, 'upload.batch_error', logging.ERROR, exc_info=True, files=len(files))
+            return Response({
+                'error': 'Upload failed'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        created = iter(uploads)
+        for index, result in enumerate(results):
+            if result is None:
+                upload = next(created)
+                metrics.UPLOADS.inc(outcome='accepted')
+                metrics.UPLOAD_BYTES.inc(upload.file_size)
+                results[index] = {'index': index, 'filename': upload.original_filename, 'status': 'created',
+                                  'upload': self.get_serializer(upload).data}
+        
+        if not uploads:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(uploads) < len(files):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            'created': len(uploads),
+            'rejected': len(files) - len(uploads),
+            'results': results,
+        }, status=response_status)
+    
     @action(detail=True, methods=['post'])
+    @idempotent
+    @accepting_jobs
     def apply_effect(self, request, pk=None):
         """
         Apply effect to uploaded image
         """
+        reservation = None
         try:
             upload = self.get_object()
             effect_id = request.data.get('effect_id')
@@ -70,101 +327,62 @@ class ImageUploadViewSet(viewsets.ModelViewSet):
                     'error': 'effect_id is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get effect
-            try:
-                effect = Effect.objects.get(id=effect_id, is_active=True)
-            except Effect.DoesNotExist:
+            # Get effect from the in-memory registry (no catalog query)
+            effect = effect_registry.get(effect_id)
+            if effect is None:
                 return Response({
                     'error': 'Effect not found'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Check user limits (if authenticated)
+            # Offer an earlier result for a near-duplicate upload instead of
+            # paying for another Gemini call, unless the client forces a rerun
+            if not self._flag(request, 'force') and not self._flag(request, 'preview'):
+                earlier = self._find_reusable_result(upload, effect)
+                metrics.CACHE_REQUESTS.inc(cache='near_duplicate', result='miss' if earlier is None else 'hit')
+                if earlier is not None:
+                    data = ProcessedImageSerializer(earlier).data
+                    data['reused'] = True
+                    return Response(data, status=status.HTTP_200_OK)
+            
+            # Previews render at a small working resolution with a lighter
+            # prompt; they can be finalized later with the same settings
+            preview = self._flag(request, 'preview')
+            
+            # Check user limits (if authenticated). The job keeps or gives
+            # back the reserved slot; previews use their own allowance.
             if request.user.is_authenticated:
-                if not self._check_user_limits(request.user, effect):
+                reservation = quota.reserve(request.user, effect, preview=preview)
+                if reservation is None:
                     return Response({
                         'error': 'Usage limit exceeded. Please upgrade your plan.'
                     }, status=status.HTTP_403_FORBIDDEN)
             
+            params = build_processing_params(effect, preview)
+            params['quota_reservation'] = reservation
+            
             # Create processing record
             processed = ProcessedImage.objects.create(
                 original_upload=upload,
-                effect_applied=effect,
+                effect_applied=effect.instance,
                 user=request.user if request.user.is_authenticated else None,
-                status='processing'
+                status='processing',
+                is_preview=preview,
+                processing_params=params,
+                estimated_completion_at=estimate_completion(effect.id, preview)
             )
             
-            # Process the image asynchronously
-            from threading import Thread
-            import time
-            
-            def process_image_task(processed_id, upload_file, effect_obj, user=None):
-                try:
-                    # Choose processing method based on effect type
-                    processor = GeminiImageProcessor()
-                    
-                    if effect_obj.slug == 'center-stage':
-                        # Use specialized processing for Center Stage effect
-                        result = processor.process_center_stage_effect(
-                            upload_file.file,
-                            effect_obj.hidden_prompt
-                        )
-                    else:
-                        # Use standard processing with the effect's hidden prompt
-                        result = processor.process_image(
-                            upload_file.file,
-                            effect_obj.hidden_prompt,
-                            effect_obj.strength,
-                            effect_obj.preserve_faces
-                        )
-                    
-                    # Update the processed image record
-                    processed_record = ProcessedImage.objects.get(id=processed_id)
-                    if result['success']:
-                        processed_record.status = 'completed'
-                        processed_record.processing_time = result['processing_time']
-                        processed_record.gemini_response_data = {
-                            'response': result['gemini_response'],
-                            'prompt_used': result['enhanced_prompt'],
-                            'effect_type': result.get('effect_type', 'standard')
-                        }
-                        
-                        # Save the processed image if available
-                        if 'edited_image_data' in result and result['edited_image_data']:
-                            image_data = result['edited_image_data']
-                            filename = f"processed_{processed_id}.png"
-                            processed_record.processed_image.save(
-                                filename,
-                                ContentFile(image_data),
-                                save=True
-                            )
-                        
-                        # Update user usage
-                        if user and user.is_authenticated:
-                            self._update_user_usage(user, effect_obj)
-                    else:
-                        processed_record.status = 'failed'
-                        processed_record.error_message = result['error']
-                    
-                    processed_record.save()
-                except Exception as e:
-                    # Update the processed image record with error
-                    try:
-                        processed_record = ProcessedImage.objects.get(id=processed_id)
-                        processed_record.status = 'failed'
-                        processed_record.error_message = str(e)
-                        processed_record.save()
-                    except ProcessedImage.DoesNotExist:
-                        pass  # Record was deleted
+            # Queue processing on the background job pool
+            user = request.user if request.user.is_authenticated else None
+            submit_job(process_image_task, processed.id, upload.original_image, effect, user, params, time.monotonic(),
+                       checkpoint=job_checkpoint(processed.id))
             
-            # Start processing in background thread
-            thread = Thread(target=process_image_task, args=(processed.id, upload.original_image, effect, request.user))
-            thread.start()
-            
-            # Return immediately with processing status
+            # Return immediately with processing status and the ETA
             serializer = ProcessedImageSerializer(processed)
-            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+            return set_retry_after(Response(serializer.data, status=status.HTTP_202_ACCEPTED), processed)
                 
         except Exception as e:
+            quota.release(reservation)
+            log_event(logger, 'apply_effect.error', logging.ERROR, exc_info=True)
             return Response({
                 'error': f'Processing failed: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -175,10 +393,13 @@ class ImageUploadViewSet(viewsets.ModelViewSet):
         Get the processing status of an image
         """
         try:
-            # Get the processed image record
-            processed_image = ProcessedImage.objects.get(id=pk)
+            # Load only the serialized columns, not the large JSON ones
+            processed_image = sparse_queryset(
+                ProcessedImage.objects.all(), ProcessedImageSerializer,
+                set(ProcessedImageSerializer.Meta.fields), always=('status', 'estimated_completion_at')
+            ).get(id=pk)
             serializer = ProcessedImageSerializer(processed_image)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_retry_after(Response(serializer.data, status=status.HTTP_200_OK), processed_image)
         except ProcessedImage.DoesNotExist:
             return Response({
                 'error': 'Processed image not found'
@@ -189,10 +410,13 @@ class ImageUploadViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=True, methods=['post'])
+    @idempotent
+    @accepting_jobs
     def process_async(self, request, pk=None):
         """
         Process image with effect asynchronously
         """
+        reservation = None
         try:
             upload = self.get_object()
             effect_id = request.data.get('effect_id')
@@ -202,160 +426,81 @@ class ImageUploadViewSet(viewsets.ModelViewSet):
                     'error': 'effect_id is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get effect
-            try:
-                effect = Effect.objects.get(id=effect_id, is_active=True)
-            except Effect.DoesNotExist:
+            # Get effect from the in-memory registry (no catalog query)
+            effect = effect_registry.get(effect_id)
+            if effect is None:
                 return Response({
                     'error': 'Effect not found'
                 }, status=status.HTTP_404_NOT_FOUND)
             
             # Check user limits (if authenticated)
             if request.user.is_authenticated:
-                if not self._check_user_limits(request.user, effect):
+                reservation = quota.reserve(request.user, effect)
+                if reservation is None:
                     return Response({
                         'error': 'Usage limit exceeded. Please upgrade your plan.'
                     }, status=status.HTTP_403_FORBIDDEN)
+            params = build_processing_params(effect)
+            params['quota_reservation'] = reservation
             
             # Create processing record
             processed = ProcessedImage.objects.create(
                 original_upload=upload,
-                effect_applied=effect,
+                effect_applied=effect.instance,
                 user=request.user if request.user.is_authenticated else None,
-                status='processing'
+                status='processing',
+                processing_params=params,
+                estimated_completion_at=estimate_completion(effect.id, delay=ASYNC_DEMO_DELAY)
             )
             
             # Process the image asynchronously (in a real implementation, this would be done in a background task)
             # For now, we'll simulate async processing with a delay
-            from threading import Thread
-            import time
-            
-            def process_image_task(processed_id, upload_file, effect_obj):
-                try:
-                    # Simulate processing time
-                    time.sleep(5)  # Simulate 5 seconds of processing time
-                    
-                    # Choose processing method based on effect type
-                    processor = GeminiImageProcessor()
-                    
-                    if effect_obj.slug == 'center-stage':
-                        # Use specialized processing for Center Stage effect
-                        # Reset file pointer before processing
-                        upload_file.file.seek(0)
-                        result = processor.process_center_stage_effect(
-                            upload_file.file,
-                            effect_obj.hidden_prompt
-                        )
-                    else:
-                        # Use standard processing
-                        # Reset file pointer before processing
-                        upload_file.file.seek(0)
-                        result = processor.process_image(
-                            upload_file.file,
-                            effect_obj.hidden_prompt,
-                            effect_obj.strength,
-                            effect_obj.preserve_faces
-                        )
-                    
-                    # Update the processed image record
-                    processed_record = ProcessedImage.objects.get(id=processed_id)
-                    if result['success']:
-                        processed_record.status = 'completed'
-                        processed_record.processing_time = result['processing_time']
-                        processed_record.gemini_response_data = {
-                            'response': result['gemini_response'],
-                            'prompt_used': result['enhanced_prompt'],
-                            'effect_type': result.get('effect_type', 'standard'),
-                            'image_analysis': result.get('image_analysis', '')
-                        }
-                        
-                        # Save the processed image if available
-                        if 'edited_image_data' in result and result['edited_image_data']:
-                            image_data = result['edited_image_data']
-                            filename = f"processed_{processed_id}.png"
-                            processed_record.processed_image.save(
-                                filename,
-                                ContentFile(image_data),
-                                save=False
-                            )
-                        
-                        processed_record.save()
-                        
-                        # Update user usage
-                        if request.user.is_authenticated:
-                            self._update_user_usage(request.user, effect_obj)
-                    else:
-                        processed_record.status = 'failed'
-                        processed_record.error_message = result['error']
-                        processed_record.save()
-                except Exception as e:
-                    # Update the processed image record with error
-                    try:
-                        processed_record = ProcessedImage.objects.get(id=processed_id)
-                        processed_record.status = 'failed'
-                        processed_record.error_message = str(e)
-                        processed_record.save()
-                    except ProcessedImage.DoesNotExist:
-                        pass  # Record was deleted
+            def delayed_task(*args):
+                time.sleep(ASYNC_DEMO_DELAY)
+                process_image_task(*args)
             
-            # Start processing in background thread
-            thread = Thread(target=process_image_task, args=(processed.id, upload.original_image, effect))
-            thread.start()
+            # Queue processing on the background job pool
+            user = request.user if request.user.is_authenticated else None
+            submit_job(delayed_task, processed.id, upload.original_image, effect, user, params, time.monotonic(),
+                       checkpoint=job_checkpoint(processed.id))
             
-            # Return immediately with processing status
+            # Return immediately with processing status and the ETA
             serializer = ProcessedImageSerializer(processed)
-            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+            return set_retry_after(Response(serializer.data, status=status.HTTP_202_ACCEPTED), processed)
                 
         except Exception as e:
+            quota.release(reservation)
+            log_event(logger, 'process_async.error', logging.ERROR, exc_info=True)
             return Response({
                 'error': f'Processing failed: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def _is_valid_image(self, uploaded_file):
-        """Validate uploaded file is a valid image"""
-        try:
-            image = Image.open(uploaded_file)
-            return image.format.lower() in ['jpeg', 'jpg', 'png', 'webp']
-        except:
-            return False
-    
-    def _check_user_limits(self, user, effect):
-        """Check if user can use this effect"""
-        from datetime import datetime
-        from apps.images.models import UserUsage
-        
-        current_month = datetime.now().replace(day=1).date()
-        usage, created = UserUsage.objects.get_or_create(
-            user=user, 
-            month=current_month
-        )
-        
-        # Free tier limits
-        # Check if user has a profile with is_premium field
-        is_premium = False
-        if hasattr(user, 'userprofile'):
-            is_premium = user.userprofile.is_premium
-        
-        if not is_premium:  # Free tier
-            if usage.effects_used >= 5:  # Free limit
-                return False
-            if effect.is_premium:
-                return False
-        
-        return True
+    def _flag(self, request, name):
+        """Read a boolean flag from form or JSON request data"""
+        value = request.data.get(name, False)
+        if isinstance(value, str):
+            return value.lower() in ('1', 'true', 'yes', 'on')
+        return bool(value)
     
-    def _update_user_usage(self, user, effect):
-        """Update user's monthly usage"""
-        from datetime import datetime
-        from apps.images.models import UserUsage
+    def _find_reusable_result(self, upload, effect):
+        """Find a completed result of this effect on a near-duplicate upload"""
+        duplicates = find_near_duplicates(upload)
+        if not duplicates:
+            return None
         
-        current_month = datetime.now().replace(day=1).date()
-        usage, created = UserUsage.objects.get_or_create(
-            user=user, 
-            month=current_month
-        )
+        upload_ids = [duplicate.id for _, duplicate in duplicates]
+        candidates = {
+            processed.original_upload_id: processed
+            for processed in ProcessedImage.objects.filter(
+                original_upload_id__in=upload_ids,
+                effect_applied_id=effect.id,
+                status='completed',
+                is_preview=False
+            ).exclude(processed_image='').order_by('created_at')
+        }
         
-        usage.effects_used += 1
-        if effect.is_premium:
-            usage.premium_effects_used += 1
-        usage.save()
\ No newline at end of file
+        # Prefer the closest duplicate
+        for upload_id in upload_ids:
+            if upload_id in candidates:
+                return candidates[upload_id]
+        return None
@@ -0,0 +1,66 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.response import Response
+from .metrics import registry
+from . import profiling
+
+
+class CanScrapeMetrics(BasePermission):
+    """Staff users, or scrapers sending an "Authorization: Bearer <METRICS_TOKEN>" header"""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        supplied = request.headers.get('Authorization', '')
+        if token and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+@api_view(['GET'])
+@permission_classes([CanScrapeMetrics])
+def metrics_view(request):
+    """
+    Expose process metrics in the Prometheus text format
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_reports(request):
+    """
+    List recent profiled requests, newest first
+    """
+    summaries = [
+        {
+            'id': report['id'],
+            'method': report['method'],
+            'path': report['path'],
+            'status_code': report['status_code'],
+            'duration_ms': report['duration_ms'],
+            'sql_count': report['sql']['count'],
+            'sql_time_ms': report['sql']['time_ms'],
+            'sql_duplicates': report['sql']['duplicate_count'],
+            'has_profile': report['profile'] is not None,
+        }
+        for report in reversed(profiling.get_reports())
+    ]
+    return Response(summaries, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_report_detail(request, report_id):
+    """
+    Get the full report for one profiled request
+    """
+    report = profiling.get_report(report_id)
+    if report is None:
+        return Response({
+            'error': 'Profile report not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response(report, status=status.HTTP_200_OK)
@@ -1,16 +1,69 @@
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from datetime import datetime
+import time
 from .models import ProcessedImage
-from .serializers import ProcessedImageSerializer
+from .serializers import (
+    ProcessedImageSerializer, ProcessedImageListSerializer, requested_fields, sparse_queryset
+)
+from .views import process_image_task
+from .jobs import submit_job
+from .eta import estimate_completion, set_retry_after
+from .export import stream_zip
+from .idempotency import idempotent
+from .lifecycle import accepting_jobs, job_checkpoint
+from .pagination import CreatedAtCursorPagination, owned_by
+from .replicas import ReplicaReadsMixin
+from .effect_registry import effect_registry
+from . import quota
+from . import tracing
 
-class ProcessedImageViewSet(viewsets.ModelViewSet):
-    queryset = ProcessedImage.objects.all()
+# Columns read outside the serializer by sparse read paths
+SPARSE_ALWAYS = ('created_at', 'status', 'estimated_completion_at')
+
+
+class ProcessedImageViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
+    queryset = ProcessedImage.objects.select_related('effect_applied', 'original_upload')
     serializer_class = ProcessedImageSerializer
     lookup_field = 'id'  # Explicitly set the lookup field
+    pagination_class = CreatedAtCursorPagination
+    
+    # Read paths that only need the serialized columns
+    sparse_actions = ('list', 'retrieve', 'processing_status')
+    
+    def get_queryset(self):
+        """
+        Listings and finalize see the requester's own records. Read paths
+        load only the columns the response needs, never the large JSON columns.
+        """
+        queryset = super().get_queryset()
+        # Finalizing renders on the requester's quota, so only their own previews
+        if self.action in ('list', 'finalize'):
+            queryset = owned_by(queryset, self.request.user)
+        if self.action in self.sparse_actions:
+            fields = requested_fields(self.request)
+            if fields is None:
+                serializer_class = ProcessedImageListSerializer if self.action == 'list' else ProcessedImageSerializer
+                fields = set(serializer_class.Meta.fields)
+            # The cursor paginator reads created_at; Retry-After reads the ETA columns
+            queryset = sparse_queryset(queryset, ProcessedImageSerializer, fields, always=SPARSE_ALWAYS)
+        return queryset
+    
+    def get_serializer_class(self):
+        # ?fields= picks from the full representation; plain listings are compact
+        if self.action == 'list' and requested_fields(self.request) is None:
+            return ProcessedImageListSerializer
+        return super().get_serializer_class()
     
     @action(detail=True, methods=['get'])
-    def processing_status(self, request, pk=None):
+    def processing_status(self, request, id=None):
         """
         Get the processing status of an image
         """
@@ -18,7 +71,7 @@ class ProcessedImageViewSet(viewsets.ModelViewSet):
             # Get the processed image record
             processed_image = self.get_object()
             serializer = self.get_serializer(processed_image)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_retry_after(Response(serializer.data, status=status.HTTP_200_OK), processed_image)
         except ProcessedImage.DoesNotExist:
             return Response({
                 'error': 'Processed image not found'
@@ -26,4 +79,130 @@ class ProcessedImageViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({
                 'error': f'Error retrieving status: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=True, methods=['post'])
+    @idempotent
+    @accepting_jobs
+    def finalize(self, request, id=None):
+        """
+        Render a preview at full resolution with the same prompt and settings
+        """
+        reservation = None
+        preview = self.get_object()
+        try:
+            if not preview.is_preview:
+                return Response({
+                    'error': 'Only previews can be finalized'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            effect = effect_registry.get(preview.effect_applied_id)
+            if effect is None:
+                return Response({
+                    'error': 'Effect not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            # Check user limits (if authenticated)
+            if request.user.is_authenticated:
+                reservation = quota.reserve(request.user, effect)
+                if reservation is None:
+                    return Response({
+                        'error': 'Usage limit exceeded. Please upgrade your plan.'
+                    }, status=status.HTTP_403_FORBIDDEN)
+            
+            params = dict(preview.processing_params)
+            params.update({
+                'preview': False,
+                'resolution': params.get('full_resolution', effect.max_resolution),
+                'preview_id': str(preview.id),
+                'trace_id': tracing.current_trace_id(),
+                'quota_reservation': reservation,
+            })
+            
+            processed = ProcessedImage.objects.create(
+                original_upload=preview.original_upload,
+                effect_applied=effect.instance,
+                user=request.user if request.user.is_authenticated else None,
+                status='processing',
+                processing_params=params,
+                estimated_completion_at=estimate_completion(effect.id)
+            )
+            
+            # Queue processing on the background job pool
+            user = request.user if request.user.is_authenticated else None
+            submit_job(
+                process_image_task,
+                processed.id, preview.original_upload.original_image, effect, user, params, time.monotonic(),
+                checkpoint=job_checkpoint(processed.id)
+            )
+            
+            serializer = self.get_serializer(processed)
+            return set_retry_after(Response(serializer.data, status=status.HTTP_202_ACCEPTED), processed)
+        
+        except Exception as e:
+            quota.release(reservation)
+            return Response({
+                'error': f'Processing failed: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        Download the requester's completed results as a streamed ZIP.
+        ?since= (ISO date or datetime) limits it to newer results; pass the
+        previous response's X-Export-Cursor for incremental exports.
+        """
+        queryset = ProcessedImage.objects.filter(
+            user=request.user, status='completed', is_preview=False
+        ).exclude(processed_image='')
+        
+        since = request.query_params.get('since')
+        if since:
+            try:
+                parsed = parse_datetime(since)
+                if parsed is None and parse_date(since) is not None:
+                    parsed = datetime.combine(parse_date(since), datetime.min.time())
+            except ValueError:
+                # Well formed but out of range, e.g. month 13 or hour 25
+                parsed = None
+            if parsed is None:
+                return Response({
+                    'error': 'since must be an ISO 8601 date or datetime'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            queryset = queryset.filter(created_at__gt=parsed)
+        
+        # Pin the upper bound so the next export can start exactly here
+        cursor = queryset.aggregate(newest=Max('created_at'))['newest']
+        if cursor is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        entries = (
+            queryset.filter(created_at__lte=cursor)
+            .select_related('effect_applied')
+            .only('id', 'processed_image', 'created_at', 'effect_applied__slug')
+            .order_by('created_at')
+            .iterator(chunk_size=200)
+        )
+        
+        response = StreamingHttpResponse(
+            stream_zip(entries, settings.EXPORT_CHUNK_SIZE), content_type='application/zip'
+        )
+        response['Content-Disposition'] = f'attachment; filename="gallery-{cursor:%Y%m%d-%H%M%S}.zip"'
+        response['X-Export-Cursor'] = cursor.isoformat()
+        return response
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def trace(self, request, id=None):
+        """
+        Get the spans recorded for the request and job that produced this image
+        """
+        processed_image = self.get_object()
+        trace_id = processed_image.processing_params.get('trace_id')
+        if not trace_id:
+            return Response({
+                'error': 'No trace recorded for this image'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        spans = sorted(tracing.get_exporter().get_trace(trace_id), key=lambda span: span['start_time'])
+        return Response({'trace_id': trace_id, 'spans': spans}, status=status.HTTP_200_OK)
@@ -0,0 +1,159 @@
+import logging
+from django.conf import settings
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .ingest import UploadRejected
+from .models import UploadSession
+from .resumable import (
+    ChunkError, append_chunk, create_session, delete_session, finalize_session, parse_checksum, purge_expired
+)
+from .serializers import ImageUploadSerializer
+from .structured_logging import log_event
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+
+
+class UploadSessionViewSet(viewsets.GenericViewSet):
+    """
+    Resumable (tus-style) uploads: create a session, PATCH chunks at
+    Upload-Offset, HEAD to find where to resume, then finalize.
+
+    Offsets are always read from the primary database (this viewset does not
+    use replica reads), so a resuming client never sees a stale offset.
+    """
+    queryset = UploadSession.objects.all()
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        """Sessions belong to their user; anonymous sessions are reachable by id only"""
+        user = self.request.user
+        return super().get_queryset().filter(user=user if user.is_authenticated else None)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response['Tus-Resumable'] = TUS_VERSION
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def _describe(self, session, response_status=status.HTTP_200_OK):
+        response = Response({
+            'id': session.id,
+            'filename': session.filename,
+            'size': session.total_size,
+            'offset': session.offset,
+            'expires_at': session.expires_at,
+            'upload_id': session.upload_id,
+        }, status=response_status)
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.total_size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def create(self, request):
+        """
+        Start a resumable upload. Send `filename` and `size` (or an
+        Upload-Length header).
+        """
+        size = request.data.get('size') or request.headers.get('Upload-Length')
+        filename = request.data.get('filename') or 'upload'
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'size is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < size <= settings.UPLOAD_SESSION_MAX_SIZE:
+            return Response({
+                'error': f'size must be between 1 and {settings.UPLOAD_SESSION_MAX_SIZE} bytes'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        purge_expired()
+        session = create_session(request.user if request.user.is_authenticated else None, filename[:255], size)
+        response = self._describe(session, status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(f'{session.id}/')
+        return response
+
+    def retrieve(self, request, id=None):
+        """Where to resume: the bytes received so far (also answers HEAD)"""
+        return self._describe(self.get_object())
+
+    def partial_update(self, request, id=None):
+        """
+        Append a chunk. The raw request body is written at Upload-Offset;
+        Upload-Checksum (e.g. "sha256 <base64 digest>") is verified when sent.
+        """
+        session = self.get_object()
+        if session.upload_id is not None:
+            return Response({
+                'error': 'Upload is already finalized'
+            }, status=status.HTTP_409_CONFLICT)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            # Chunked transfer encoding sends no length; refuse it rather
+            # than read an empty body and report success
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            return Response({
+                'error': 'Upload-Offset and Content-Length headers are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response({
+                'error': f'Chunks must be at most {settings.UPLOAD_CHUNK_MAX_SIZE} bytes'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            checksum = parse_checksum(request.headers['Upload-Checksum']) if 'Upload-Checksum' in request.headers else None
+            # The body is streamed straight to disk; request.data is never parsed
+            append_chunk(session, request.stream, offset, length, checksum)
+        except ChunkError as e:
+            metrics.UPLOAD_CHUNKS.inc(outcome='rejected')
+            response = Response({'error': str(e)}, status=e.status)
+            response['Upload-Offset'] = str(UploadSession.objects.filter(pk=session.pk).values_list(
+                'offset', flat=True).first() or 0)
+            return response
+
+        metrics.UPLOAD_CHUNKS.inc(outcome='accepted')
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response['Upload-Offset'] = str(session.offset)
+        return response
+
+    def destroy(self, request, id=None):
+        """Abandon an upload and delete its received bytes"""
+        delete_session(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, id=None):
+        """Turn a complete upload into an image upload"""
+        session = self.get_object()
+        if session.offset < session.total_size:
+            response = Response({
+                'error': f'Upload is incomplete: {session.offset} of {session.total_size} bytes received'
+            }, status=status.HTTP_409_CONFLICT)
+            response['Upload-Offset'] = str(session.offset)
+            return response
+
+        finalized = session.upload_id is not None
+        try:
+            upload = finalize_session(session)
+        except UploadRejected as e:
+            metrics.UPLOADS.inc(outcome='rejected')
+            delete_session(session)
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            metrics.UPLOADS.inc(outcome='error')
+            log_event(logger, 'upload_session.finalize_error', logging.ERROR, exc_info=True,
+                      session_id=str(session.id))
+            return Response({
+                'error': f'Upload failed: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not finalized:
+            metrics.UPLOADS.inc(outcome='accepted')
+            metrics.UPLOAD_BYTES.inc(upload.file_size)
+        data = ImageUploadSerializer(upload, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_200_OK if finalized else status.HTTP_201_CREATED)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.images.tracing.TracingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.images.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'photo_effects.urls'
@@ -91,6 +94,32 @@ DATABASES = {
     }
 }
 
+# SQLite concurrency: WAL journaling and a busy timeout on every connection,
+# and background job writes committed in batches by a single writer thread
+SQLITE_WAL = os.environ.get('SQLITE_WAL', 'True') == 'True'
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_SERIALIZED_WRITES = os.environ.get('SQLITE_SERIALIZED_WRITES', 'True') == 'True'
+DB_WRITER_BATCH_SIZE = int(os.environ.get('DB_WRITER_BATCH_SIZE', 50))
+DB_WRITER_BATCH_DELAY_MS = int(os.environ.get('DB_WRITER_BATCH_DELAY_MS', 5))
+# Seconds a job waits for its write to commit before giving up
+DB_WRITER_TIMEOUT = float(os.environ.get('DB_WRITER_TIMEOUT', 30))
+
+# Read replicas: DATABASE_REPLICA_NAMES is a comma-separated list of SQLite
+# files kept in sync with the primary. Read-only API requests use them unless
+# the client wrote within REPLICA_PIN_SECONDS or the replica lags by more than
+# REPLICA_MAX_LAG_SECONDS (checked every REPLICA_LAG_CHECK_INTERVAL seconds)
+for index, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_NAMES', '').split(','))):
+    DATABASES[f'replica_{index + 1}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['apps.images.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -139,10 +168,144 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', 10 * 1024 * 1024))  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('DATA_UPLOAD_MAX_MEMORY_SIZE', 10 * 1024 * 1024))  # 10MB
 
+# Batch uploads: files per request, and threads validating and storing them
+UPLOAD_BATCH_MAX_FILES = int(os.environ.get('UPLOAD_BATCH_MAX_FILES', 50))
+UPLOAD_INGEST_WORKERS = int(os.environ.get('UPLOAD_INGEST_WORKERS', 4))
+
+# Resumable uploads: partial files live in UPLOAD_SESSION_DIR (keep it on the
+# same filesystem as MEDIA_ROOT so finalized files are moved, not copied)
+UPLOAD_SESSION_DIR = os.environ.get('UPLOAD_SESSION_DIR', os.path.join(BASE_DIR, 'upload_sessions'))
+UPLOAD_SESSION_MAX_SIZE = int(os.environ.get('UPLOAD_SESSION_MAX_SIZE', 100 * 1024 * 1024))  # 100MB
+UPLOAD_CHUNK_MAX_SIZE = int(os.environ.get('UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024))  # 8MB
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+
+# Gallery ZIP export: bytes read from storage per chunk
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 256 * 1024))
+
 # Gemini API
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# Gemini key pool: GEMINI_API_KEYS (comma-separated) replaces GEMINI_API_KEY.
+# Per-key requests per minute (0 = no limit) and base cooldowns after a 429 or
+# 403 when the response has no Retry-After
+GEMINI_API_KEYS = [key.strip() for key in os.environ.get('GEMINI_API_KEYS', '').split(',') if key.strip()]
+GEMINI_KEY_RPM = int(os.environ.get('GEMINI_KEY_RPM', 0))
+GEMINI_KEY_QUOTA_COOLDOWN = float(os.environ.get('GEMINI_KEY_QUOTA_COOLDOWN', 60))
+GEMINI_KEY_FORBIDDEN_COOLDOWN = float(os.environ.get('GEMINI_KEY_FORBIDDEN_COOLDOWN', 900))
+
+# /metrics/ is served to staff users and to scrapers sending
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token only staff can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request/job tracing ('memory' keeps recent spans in process, 'jsonl' appends to TRACING_FILE)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'True') == 'True'
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'memory')
+TRACING_FILE = os.environ.get('TRACING_FILE', os.path.join(BASE_DIR, 'traces.jsonl'))
+TRACING_MAX_SPANS = int(os.environ.get('TRACING_MAX_SPANS', 10000))
+
+# Structured JSON logs, written to stderr by a background thread.
+# Successful Gemini requests and jobs are logged at LOG_SUCCESS_SAMPLE_RATE.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SUCCESS_SAMPLE_RATE = float(os.environ.get('LOG_SUCCESS_SAMPLE_RATE', 0.1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'structured': {
+            '()': 'apps.images.structured_logging.BackgroundQueueHandler',
+        },
+    },
+    'loggers': {
+        'apps': {
+            'handlers': ['structured'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Shared cache. Quota counters and Idempotency-Key claims must be shared by
+# every server process, so deployments running more than one process set
+# REDIS_URL (`manage.py check --deploy` warns otherwise); without it each
+# process gets its own in-memory cache (enough for runserver and tests)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Monthly effect quota; counters are cached and written through to UserUsage
+FREE_MONTHLY_EFFECTS = int(os.environ.get('FREE_MONTHLY_EFFECTS', 5))
+# Previews are cheaper but still call Gemini, so they have their own allowance
+FREE_MONTHLY_PREVIEWS = int(os.environ.get('FREE_MONTHLY_PREVIEWS', 30))
+QUOTA_CACHE_TIMEOUT = int(os.environ.get('QUOTA_CACHE_TIMEOUT', 3600))
+
+# Effect catalog response cache; clients revalidate with If-None-Match
+EFFECT_CATALOG_CACHE_TIMEOUT = int(os.environ.get('EFFECT_CATALOG_CACHE_TIMEOUT', 3600))
+EFFECT_CATALOG_MAX_AGE = int(os.environ.get('EFFECT_CATALOG_MAX_AGE', 60))
+# Seconds a process trusts its last read of the shared catalog version
+EFFECT_CATALOG_VERSION_TTL = float(os.environ.get('EFFECT_CATALOG_VERSION_TTL', 1.0))
+
+# Trending effects: completions over the last TRENDING_WINDOW_HOURS from the
+# hourly usage rollups, halving in weight every TRENDING_HALF_LIFE_HOURS
+TRENDING_WINDOW_HOURS = int(os.environ.get('TRENDING_WINDOW_HOURS', 72))
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 12))
+TRENDING_LIMIT = int(os.environ.get('TRENDING_LIMIT', 10))
+TRENDING_CACHE_TIMEOUT = int(os.environ.get('TRENDING_CACHE_TIMEOUT', 120))
+
+# Opt-in request profiling (SQL capture, optional cProfile); reports at /profiling/
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.0))
+PROFILING_ALLOW_HEADER = os.environ.get('PROFILING_ALLOW_HEADER', str(DEBUG)) == 'True'
+PROFILING_BUFFER_SIZE = int(os.environ.get('PROFILING_BUFFER_SIZE', 100))
+
+# Background effect job pool size
+IMAGE_JOB_WORKERS = int(os.environ.get('IMAGE_JOB_WORKERS', 8))
+
+# Graceful shutdown: on SIGTERM, wait up to JOB_DRAIN_TIMEOUT seconds for
+# in-flight jobs (keep it below the orchestrator's kill grace period) and
+# answer new job requests with 503 and Retry-After: JOB_DRAIN_RETRY_AFTER
+JOB_GRACEFUL_SHUTDOWN = os.environ.get('JOB_GRACEFUL_SHUTDOWN', 'True') == 'True'
+JOB_DRAIN_TIMEOUT = float(os.environ.get('JOB_DRAIN_TIMEOUT', 25))
+JOB_DRAIN_RETRY_AFTER = int(os.environ.get('JOB_DRAIN_RETRY_AFTER', 10))
+
+# Completion estimates: recent job durations per effect (ETA_SAMPLE_WINDOW
+# kept, ETA_MIN_SAMPLES before they are trusted), else ETA_DEFAULT_SECONDS
+ETA_SAMPLE_WINDOW = int(os.environ.get('ETA_SAMPLE_WINDOW', 200))
+ETA_MIN_SAMPLES = int(os.environ.get('ETA_MIN_SAMPLES', 5))
+ETA_DEFAULT_SECONDS = float(os.environ.get('ETA_DEFAULT_SECONDS', 15))
+
+# Working resolution for low-cost effect previews
+PREVIEW_RESOLUTION = os.environ.get('PREVIEW_RESOLUTION', '512x512')
+
+# Local effects engine (process pool size; 0 renders inline, unset uses all CPUs)
+LOCAL_EFFECTS_WORKERS = int(os.environ['LOCAL_EFFECTS_WORKERS']) if os.environ.get('LOCAL_EFFECTS_WORKERS') else None
+LOCAL_EFFECTS_TIMEOUT = int(os.environ.get('LOCAL_EFFECTS_TIMEOUT', 30))
+
+# Near-duplicate uploads (perceptual hash Hamming distance in bits, 0-3: the
+# band index only finds every match up to 3; larger values are capped)
+PERCEPTUAL_HASH_MAX_DISTANCE = int(os.environ.get('PERCEPTUAL_HASH_MAX_DISTANCE', 3))
+
+# Stored responses for retried POSTs that send an Idempotency-Key header
+# (kept in the default cache, which must be shared: see REDIS_URL)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+# How long an unfinished request holds its key; keep it near the request timeout
+IDEMPOTENCY_CLAIM_TTL = int(os.environ.get('IDEMPOTENCY_CLAIM_TTL', 60))
+
 # CORS settings for frontend
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'tus-resumable', 'upload-length', 'upload-offset',
+                      'upload-checksum')
+CORS_EXPOSE_HEADERS = ['Location', 'Retry-After', 'Tus-Resumable', 'Upload-Length', 'Upload-Offset',
+                       'X-Export-Cursor']
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',') if os.environ.get('CORS_ALLOWED_ORIGINS') else []
 
 # REST Framework
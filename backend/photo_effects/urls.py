@@ -18,11 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from apps.images.views_metrics import metrics_view, profile_reports, profile_report_detail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/images/', include('apps.images.urls')),
     path('api/effects/', include('apps.effects.urls')),
+    path('metrics/', metrics_view, name='metrics'),
+    path('profiling/', profile_reports, name='profile-reports'),
+    path('profiling/<str:report_id>/', profile_report_detail, name='profile-report-detail'),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photo_effects.settings')
 
 application = get_wsgi_application()
+
+# Drain effect jobs on SIGTERM and pick up jobs a previous process checkpointed
+from apps.images import lifecycle  # noqa: E402
+
+lifecycle.start()